@@ -0,0 +1,196 @@
+"""
+End-to-end timings of the data pipeline and the dashboard tabs on a synthetic ledger.
+
+Every stage is timed cold, with all in-process caches dropped, and warm, called again
+right after. Results are written as JSON; `--compare` prints the ratio to an earlier
+result file and exits with status 1 when a stage got slower than `--threshold`.
+
+    python -m benchmarks.run --size medium
+    python -m benchmarks.run --size medium --compare benchmarks/results/medium-20260101-120000.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from benchmarks.synthetic_ledger import SIZES, generate_ledger
+from src import config
+
+BENCHMARKS_PATH = Path(__file__).parent
+DEFAULT_THRESHOLD = 1.25
+# Stages faster than this are timer noise and never reported as regressions.
+NOISE_SECONDS = 0.005
+
+
+def _stages(currency: str, year: str, month: str) -> dict:
+    from src.dashboard.investment_data import build_investment_dashboard_data
+    from src.dashboard.prewarm import dashboard_datasets
+    from src.data.get import get_assets, get_transactions
+    from src.data.proccess import get_transactions_in_currency
+    from src.model.create_tables import (get_asset_capital_by_month, get_balance_by_month, get_cost_distribution,
+                                         get_month_transactions)
+
+    return {
+        'get_transactions': get_transactions,
+        'get_assets': get_assets,
+        'transactions_in_currency': lambda: get_transactions_in_currency(currency),
+        'balance_by_month': lambda: get_balance_by_month(currency),
+        'asset_capital_by_month': lambda: get_asset_capital_by_month(currency),
+        'cost_distribution': lambda: get_cost_distribution(currency, year),
+        'month_transactions': lambda: get_month_transactions(currency, year, month),
+        'tab:main': lambda: dashboard_datasets('main', currency, year, month, None),
+        'tab:year': lambda: dashboard_datasets('year', currency, year, month, None),
+        'tab:month': lambda: dashboard_datasets('month', currency, year, month, None),
+        'tab:planning': lambda: dashboard_datasets('planning', currency, year, month, None),
+        'tab:investments': lambda: build_investment_dashboard_data(currency, fx_network_enabled=False),
+    }
+
+
+def _drop_caches() -> None:
+    from src.data import cache, get, get_finance
+    from src.model.create_tables import clear_table_cache
+
+    cache.clear()
+    clear_table_cache()
+    get._TRANSACTION_FILES_CACHE.clear()
+    get_finance._FX_CACHE_DF.clear()
+    get_finance._FX_RATE_STORE.clear()
+
+
+def run_benchmarks(data_root, currency: str = 'RUB', year: str | None = None, month: str | None = None,
+                   repeat: int = 3, stages: list[str] | None = None) -> dict:
+    """
+    Time every stage `repeat` times cold and warm against `data_root`; returns
+    {stage: {'cold': {...}, 'warm': {...}}} with min/median seconds. The data root and
+    cache settings are changed only for the run and restored afterwards.
+    """
+    from src.data import get_finance
+
+    settings = {'DATA_PATH': str(data_root), 'CACHE_PATH': str(Path(data_root) / '.cache'),
+                'SHARED_CACHE_ENABLED': False, 'SNAPSHOT_CACHE_ENABLED': False}
+    with patch.multiple(config, **settings):
+        previous_network = get_finance.set_fx_network_enabled(False)
+        try:
+            return _run_stages(data_root, currency, year, month, repeat, stages)
+        finally:
+            get_finance.set_fx_network_enabled(previous_network)
+            _drop_caches()
+
+
+def _run_stages(data_root, currency: str, year: str | None, month: str | None, repeat: int,
+                stages: list[str] | None) -> dict:
+    if year is None or month is None:
+        last_month = sorted(Path(data_root, 'transactions_info').glob('*/*.csv'))[-1].stem
+        year, month = year or last_month[:4], month or last_month[5:7]
+
+    all_stages = _stages(currency, year, month)
+    results = {}
+    with config.data_mode('live'):
+        for name in stages or all_stages:
+            cold, warm = [], []
+            for _ in range(repeat):
+                _drop_caches()
+                cold.append(_timed(all_stages[name]))
+                warm.append(_timed(all_stages[name]))
+            results[name] = {'cold': _summary(cold), 'warm': _summary(warm)}
+            print(f"{name:<26} cold {results[name]['cold']['median']:8.3f}s  warm {results[name]['warm']['median']:8.4f}s",
+                  file=sys.stderr)
+    return results
+
+
+def _timed(call) -> float:
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started
+
+
+def _summary(timings: list[float]) -> dict:
+    return {'min': min(timings), 'median': statistics.median(timings), 'runs': len(timings)}
+
+
+def compare(current: dict, previous: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """
+    Print current/previous median ratios; returns the 'stage (cold|warm)' entries slower
+    than `threshold`.
+    """
+    regressions = []
+    for stage, timings in current['results'].items():
+        for kind in ('cold', 'warm'):
+            before = previous.get('results', {}).get(stage, {}).get(kind)
+            if not before or not before['median']:
+                continue
+            ratio = timings[kind]['median'] / before['median']
+            flag = ''
+            if ratio > threshold and timings[kind]['median'] >= NOISE_SECONDS:
+                flag = '  REGRESSION'
+                regressions.append(f'{stage} ({kind})')
+            print(f"{stage:<26} {kind:<4} {before['median']:9.4f}s -> {timings[kind]['median']:9.4f}s  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=config.PROJECT_PATH,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the FinRep pipeline on a synthetic ledger.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', help='existing data directory; generated under benchmarks/.data/ when omitted')
+    parser.add_argument('--currency', default='RUB')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stage', action='append', dest='stages', help='run only this stage (repeatable)')
+    parser.add_argument('--output', help='result file; defaults to benchmarks/results/<size>-<timestamp>.json')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    dataset = None
+    data_root = Path(args.data) if args.data else BENCHMARKS_PATH / '.data' / f'{args.size}-seed{args.seed}'
+    if not args.data:
+        summary_path = data_root / 'ledger.json'
+        if summary_path.exists():
+            dataset = json.loads(summary_path.read_text(encoding='utf-8'))
+        else:
+            dataset = generate_ledger(data_root, args.size, seed=args.seed)
+            summary_path.write_text(json.dumps(dataset, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    result = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': None if args.data else args.size,
+        'dataset': dataset,
+        'currency': args.currency.upper(),
+        'repeat': args.repeat,
+        'results': run_benchmarks(data_root, args.currency.upper(), repeat=args.repeat, stages=args.stages),
+    }
+    output = Path(args.output) if args.output else (
+        BENCHMARKS_PATH / 'results' / f"{result['size'] or 'custom'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'results: {output}', file=sys.stderr)
+
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        regressions = compare(result, previous, args.threshold)
+        if regressions:
+            print('regressions: ' + ', '.join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
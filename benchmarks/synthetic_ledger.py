@@ -0,0 +1,251 @@
+"""
+Deterministic synthetic FinRep data for benchmarks.
+
+Writes the same layout as `sample_data/`: monthly transaction and asset CSVs, the FX
+cache, investments, debts, goals and import rules. The same seed and size give the same
+files, so timings of different commits are comparable.
+
+    python -m benchmarks.synthetic_ledger /tmp/finrep_large --size large
+"""
+
+import argparse
+import json
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_COST_CATEGORIES = ['Транспорт', 'Пища', 'На себя', 'Соц.жизнь', 'Связь', 'Поездки', 'Одежда',
+                        'Быт и товары для дома', 'Прочее', 'Жилье']
+INCOME_CATEGORIES = ['Доход', 'Сбережения', 'Инвестиции']
+DEBT_CATEGORIES = ['Дебиторская задолженность', 'Погашение деб. зад.',
+                   'Кредиторская задолженность', 'Погашение кред. зад.']
+CURRENCIES = ['RUB', 'USD', 'EUR', 'KZT', 'GBP']
+CURRENCY_WEIGHTS = [0.7, 0.1, 0.08, 0.08, 0.04]
+# USD per currency unit at the start of the ledger.
+START_USD_RATES = {'RUB': 0.016, 'EUR': 1.12, 'KZT': 0.0052, 'GBP': 1.45}
+COMMENTS = ['Groceries', 'Taxi', 'Dinner', 'Market', 'Subscription', 'Pharmacy', 'Gift', 'Repair',
+            'Tickets', 'Hotel', 'Books', 'Coffee', 'Fuel', 'Rent', 'Utilities']
+
+
+@dataclass(frozen=True)
+class LedgerSize:
+    years: int
+    categories: int
+    operations: int
+    accounts: int
+    tickers: int
+
+
+SIZES = {
+    'tiny': LedgerSize(years=2, categories=20, operations=15, accounts=4, tickers=3),
+    'small': LedgerSize(years=10, categories=60, operations=40, accounts=8, tickers=10),
+    'medium': LedgerSize(years=20, categories=200, operations=80, accounts=15, tickers=30),
+    'large': LedgerSize(years=30, categories=400, operations=150, accounts=30, tickers=60),
+}
+
+
+def generate_ledger(root, size: str | LedgerSize = 'small', end: str = '2026-05', seed: int = 0) -> dict:
+    """
+    Write a synthetic data directory under `root`; returns row counts of what was written.
+    `size` is a SIZES key or a LedgerSize; the ledger ends with the month `end`.
+    """
+    size = SIZES[size] if isinstance(size, str) else size
+    root = Path(root)
+    rng = np.random.default_rng(seed)
+    months = pd.period_range(end=pd.Period(end, 'M'), periods=size.years * 12, freq='M')
+    categories = _cost_categories(size.categories)
+
+    summary = {'size': asdict(size), 'end': end, 'seed': seed, 'months': len(months), 'categories': len(categories)}
+    summary['operations'] = _write_transactions(root, rng, months, categories, size)
+    summary['asset_rows'] = _write_assets(root, rng, months, size.accounts)
+    summary['fx_rows'] = _write_fx_rates(root, rng, months)
+    summary['investment_rows'] = _write_investments(root, rng, months, size.tickers)
+    summary['debts'] = _write_debts(root, rng, months)
+    _write_static_files(root, months)
+    return summary
+
+
+def _cost_categories(count: int) -> list[str]:
+    names = list(BASE_COST_CATEGORIES[:count])
+    for index in range(len(names), count):
+        names.append(f'{BASE_COST_CATEGORIES[index % len(BASE_COST_CATEGORIES)]} {index // len(BASE_COST_CATEGORIES)}')
+    return names
+
+
+def _write_transactions(root: Path, rng: np.random.Generator, months, categories: list[str], size: LedgerSize) -> int:
+    columns = INCOME_CATEGORIES + categories + DEBT_CATEGORIES
+    # A few categories take most of the spending, as in a real ledger.
+    weights = 1.0 / np.arange(1, len(categories) + 1) ** 0.8
+    weights /= weights.sum()
+    total = 0
+    for month in months:
+        days = pd.date_range(month.start_time, month.end_time.normalize(), freq='D')
+        dates = np.sort(rng.choice(days, size=min(len(days), int(rng.integers(8, 21))), replace=False))
+        cells: dict[tuple, list[str]] = {}
+
+        cells.setdefault((dates[0], 'Доход'), []).append(f'{_amount(rng, 250000, 0.1)}|RUB|Salary')
+        if rng.random() < 0.3:
+            cells.setdefault((dates[-1], 'Доход'), []).append(f'{_amount(rng, 800, 0.5)}|USD|Side project')
+        cells.setdefault((dates[0], 'Сбережения'), []).append(f'{_amount(rng, 30000, 0.3)}|RUB|Monthly saving')
+        if rng.random() < 0.25:
+            cells.setdefault((dates[-1], 'Инвестиции'), []).append(f'{_amount(rng, 500, 0.5)}|USD|Broker top-up')
+        if rng.random() < 0.1:
+            cells.setdefault((dates[-1], str(rng.choice(DEBT_CATEGORIES))), []).append(
+                f'{_amount(rng, 10000, 0.8)}|RUB|Friend')
+
+        for category, currency, date in zip(rng.choice(categories, size=size.operations, p=weights),
+                                            rng.choice(CURRENCIES, size=size.operations, p=CURRENCY_WEIGHTS),
+                                            rng.choice(dates, size=size.operations)):
+            amount = _amount(rng, 2500 if currency in {'RUB', 'KZT'} else 40, 1.0)
+            cells.setdefault((date, category), []).append(f'{amount}|{currency}|{rng.choice(COMMENTS)}')
+
+        frame = pd.DataFrame('0', index=pd.DatetimeIndex(dates).unique(), columns=columns)
+        for (date, category), values in cells.items():
+            frame.loc[date, category] = '#'.join(values)
+        total += sum(len(values) for values in cells.values())
+        frame.index = frame.index.strftime('%d.%m.%Y')
+        _write_csv(frame.rename_axis('Дата').reset_index(),
+                   root / 'transactions_info' / str(month.year) / f'{month.year}_{month.month:02d}.csv')
+    return total
+
+
+def _amount(rng: np.random.Generator, median: float, sigma: float) -> int:
+    return max(int(rng.lognormal(np.log(median), sigma)), 1)
+
+
+def _write_assets(root: Path, rng: np.random.Generator, months, accounts: int) -> int:
+    currencies = rng.choice(CURRENCIES, size=accounts, p=CURRENCY_WEIGHTS)
+    balances = rng.lognormal(np.log(100000), 1.0, size=accounts)
+    for month in months:
+        balances = np.maximum(balances * rng.normal(1.01, 0.05, size=accounts), 0)
+        frame = pd.DataFrame({
+            'Счет': [f'Account {index + 1}' for index in range(accounts)],
+            'Сумма': [f'{int(balance)}|{currency}' for balance, currency in zip(balances, currencies)],
+        })
+        _write_csv(frame, root / 'assets_info' / str(month.year) / f'{month.year}_{month.month:02d}.csv')
+    return accounts * len(months)
+
+
+def _write_fx_rates(root: Path, rng: np.random.Generator, months) -> int:
+    days = pd.bdate_range(months[0].start_time, months[-1].end_time.normalize())
+    frames = []
+    for currency, start_rate in START_USD_RATES.items():
+        rates = start_rate * np.exp(np.cumsum(rng.normal(0, 0.004, size=len(days))))
+        frames.append(pd.DataFrame({
+            'date': days.strftime('%Y-%m-%d'),
+            'currency': currency,
+            'usd_rate': rates.round(8),
+            'source': 'synthetic',
+            'fetched_at': f'{months[-1].end_time:%Y-%m-%d}T00:00:00',
+        }))
+    fx_rates = pd.concat(frames, ignore_index=True)
+    _write_csv(fx_rates, root / 'rates' / 'fx_rates.csv')
+    return len(fx_rates)
+
+
+def _write_investments(root: Path, rng: np.random.Generator, months, tickers: int) -> int:
+    asset_types = rng.choice(['stocks', 'funds', 'crypto'], size=tickers, p=[0.6, 0.3, 0.1])
+    names = [f'SYN{index:03d}' for index in range(tickers)]
+    prices = rng.lognormal(np.log(100), 1.0, size=tickers)
+    holdings = np.zeros(tickers)
+    legacy_types = {'stocks': 'Акции', 'funds': 'Фонды', 'crypto': 'Крипто'}
+    rows, cache_rows = [], []
+    for month in months:
+        prices = prices * np.exp(rng.normal(0.005, 0.06, size=tickers))
+        date = f'{month.start_time + pd.Timedelta(days=int(rng.integers(0, 27))):%Y-%m-%d}'
+        for index in rng.choice(tickers, size=min(tickers, 3), replace=False):
+            quantity = round(float(rng.uniform(0.1, 5)), 4)
+            operation = 'sell' if holdings[index] > quantity and rng.random() < 0.2 else 'buy'
+            holdings[index] += quantity if operation == 'buy' else -quantity
+            rows.append({'date': date, 'operation': operation, 'asset_type': asset_types[index], 'ticker': names[index],
+                         'quantity': quantity, 'price': round(float(prices[index]), 2), 'currency': 'USD', 'fee': 0.1,
+                         'account': 'Synthetic broker', 'comment': ''})
+        cache_rows.extend({'date': f'{month.end_time:%Y-%m-%d}', 'ticker': ticker, 'price': round(float(price), 2),
+                           'currency': 'USD', 'source': 'synthetic', 'fetched_at': f'{month.end_time:%Y-%m-%d}T00:00:00'}
+                          for ticker, price in zip(names, prices))
+
+    transactions = pd.DataFrame(rows)
+    _write_csv(transactions, root / 'investments' / 'transactions.csv')
+    _write_csv(pd.DataFrame({
+        'Тип_транзакции': transactions['operation'].map({'buy': 'Покупка', 'sell': 'Продажа'}),
+        'Актив': transactions['asset_type'].map(legacy_types),
+        'Тикер': transactions['ticker'],
+        'Количество': transactions['quantity'],
+        'Дата': transactions['date'],
+        'Цена': transactions['price'].astype(str) + '|USD',
+    }), root / 'investments' / 'investments.csv')
+    _write_csv(pd.DataFrame({'ticker': names, 'name': [f'Synthetic {name}' for name in names], 'asset_type': asset_types,
+                             'currency': 'USD', 'provider': 'manual', 'exchange': 'synthetic'}),
+               root / 'investments' / 'instruments.csv')
+    _write_csv(pd.DataFrame(cache_rows), root / 'investments' / 'price_cache.csv')
+    return len(transactions)
+
+
+def _write_debts(root: Path, rng: np.random.Generator, months) -> int:
+    debts, payments = [], []
+    for index in range(max(len(months) // 6, 1)):
+        opened = months[int(rng.integers(0, len(months)))].start_time
+        currency = str(rng.choice(CURRENCIES, p=CURRENCY_WEIGHTS))
+        principal = _amount(rng, 50000 if currency in {'RUB', 'KZT'} else 500, 0.8)
+        debt_id = f'debt-{index:04d}'
+        debts.append({'debt_id': debt_id, 'type': str(rng.choice(['receivable', 'liability'])),
+                      'counterparty': f'Person {index % 25}', 'opened_date': f'{opened:%Y-%m-%d}',
+                      'principal_amount': principal, 'principal_currency': currency, 'cash_amount': principal,
+                      'cash_currency': currency, 'comment': '', 'status': 'active'})
+        if rng.random() < 0.5:
+            paid = round(principal * float(rng.uniform(0.1, 0.6)), 2)
+            payments.append({'payment_id': f'payment-{index:04d}', 'debt_id': debt_id,
+                             'date': f'{opened + pd.Timedelta(days=int(rng.integers(10, 60))):%Y-%m-%d}',
+                             'amount': paid, 'cash_amount': paid, 'cash_currency': currency, 'comment': '',
+                             'status': 'posted'})
+    _write_csv(pd.DataFrame(debts), root / 'debts' / 'debts.csv', encoding='utf-8-sig')
+    payment_columns = ['payment_id', 'debt_id', 'date', 'amount', 'cash_amount', 'cash_currency', 'comment', 'status']
+    _write_csv(pd.DataFrame(payments, columns=payment_columns), root / 'debts' / 'debt_payments.csv', encoding='utf-8-sig')
+    return len(debts)
+
+
+def _write_static_files(root: Path, months) -> None:
+    years = sorted({month.year for month in months})
+    _write_csv(pd.DataFrame({'year': years, 'currency': 'RUB', 'target_capital': 1500000,
+                             'target_monthly_income': 330000, 'target_monthly_expense': 130000, 'notes': ''}),
+               root / 'plans' / 'goals.csv')
+    _write_csv(pd.DataFrame({'pattern': ['grocery', 'taxi', 'pharmacy'], 'category': ['Пища', 'Транспорт', 'На себя']}),
+               root / 'import_rules' / 'categories.csv')
+    headers = {
+        'staging/transaction_drafts.csv': 'date;category;currency;amount;comment;source;source_id;status',
+        'investments/crypto_wallets.csv': 'account;chain;asset;address;token_contract;enabled;label',
+        'investments/crypto_balances.csv': 'fetched_at;account;chain;asset;address;balance;source',
+        'investments/crypto_refresh_status.csv': 'fetched_at;row_number;account;chain;asset;address;status;message',
+        'investments/crypto_transactions.csv':
+            'date;account;chain;asset;address;tx_id;operation;quantity;fee;counterparty;source;comment',
+    }
+    for relative_path, header in headers.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(header + '\n', encoding='utf-8')
+
+
+def _write_csv(frame: pd.DataFrame, path: Path, encoding: str = 'utf-8') -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_csv(path, sep=';', index=False, encoding=encoding)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Write a synthetic FinRep data directory.')
+    parser.add_argument('root', help='output directory, e.g. /tmp/finrep_large')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--years', type=int, help='override the number of years of the size')
+    parser.add_argument('--categories', type=int, help='override the number of cost categories')
+    parser.add_argument('--end', default='2026-05', help='last month of the ledger (YYYY-MM)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    size = SIZES[args.size]
+    size = replace(size, years=args.years or size.years, categories=args.categories or size.categories)
+    print(json.dumps(generate_ledger(args.root, size, end=args.end, seed=args.seed), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
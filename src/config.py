@@ -1,4 +1,6 @@
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 
 UNIQUE_TICKERS = {'RUB': '₽', 'USD': '$', 'EUR': '€', 'KZT': '₸', 'GBP': '£'}
@@ -42,10 +44,23 @@ TRANSACTION_DRAFTS_PATH = os.path.join(STAGING_PATH, 'transaction_drafts.csv')
 DEBTS_PATH = os.path.join(DATA_PATH, 'debts')
 DEBTS_CSV_PATH = os.path.join(DEBTS_PATH, 'debts.csv')
 DEBT_PAYMENTS_CSV_PATH = os.path.join(DEBTS_PATH, 'debt_payments.csv')
+CACHE_PATH = os.path.join(DATA_PATH, '.cache')
+_DEFAULT_CACHE_PATH = CACHE_PATH
+SNAPSHOT_CACHE_ENABLED = os.environ.get('FINREP_SNAPSHOT_CACHE', '0') == '1'
+TABLE_CACHE_MAX_BYTES = int(os.environ.get('FINREP_TABLE_CACHE_MB', '256')) * 1024 * 1024
+SHARED_CACHE_ENABLED = os.environ.get('FINREP_SHARED_CACHE', '0') == '1'
+PREWARM_WORKERS = int(os.environ.get('FINREP_PREWARM_WORKERS', '2'))
+JOB_WORKERS = int(os.environ.get('FINREP_JOB_WORKERS', '2'))
+REPLAY_PATH = _project_path_from_env('FINREP_REPLAY_DIR', os.path.join('tests', 'fixtures', 'replay'))
+REPLAY_LATENCY_MS = float(os.environ.get('FINREP_REPLAY_LATENCY_MS', '0'))
+REPLAY_FAILURE_RATE = float(os.environ.get('FINREP_REPLAY_FAILURE_RATE', '0'))
+TIMING_ENABLED = os.environ.get('FINREP_TIMING', '0') == '1'
+PROFILE_CALLBACKS_MS = float(os.environ.get('FINREP_PROFILE_CALLBACKS_MS', '0'))
 
 STOCK_API = 'yf'  # yf, td
 FX_BASE_CURRENCY = 'USD'
-FX_PROVIDER_ORDER = ['yfinance', 'cbr']
+FX_PROVIDER_ORDER = [name.strip() for name in os.environ.get('FINREP_FX_PROVIDERS', 'yfinance,cbr').split(',')
+                     if name.strip()]
 
 NOT_COST_COLS = ['Доход', 'Сбережения', 'Инвестиции',
                  'Дебиторская задолженность', 'Погашение деб. зад.',
@@ -58,8 +73,13 @@ TRANSACTIONS_COLUMNS = ['Дата', 'Категория', 'Валюта', 'Зн
 ASSETS_COLUMNS = ['Счет', 'Валюта', 'Значение', 'Год', 'Месяц']
 
 
+_DATA_MODE_OVERRIDE: ContextVar[str | None] = ContextVar('finrep_data_mode', default=None)
+
+
 def get_data_mode() -> str:
     """Return the signed session's data mode, falling back to live for CLI use."""
+    if _DATA_MODE_OVERRIDE.get() is not None:
+        return _DATA_MODE_OVERRIDE.get()
     try:
         from flask import has_request_context, session
 
@@ -74,11 +94,30 @@ def is_test_mode() -> bool:
     return get_data_mode() == "test"
 
 
+@contextmanager
+def data_mode(mode: str):
+    """Run background work outside a request in the given data mode ("test" or "live")."""
+    token = _DATA_MODE_OVERRIDE.set("test" if mode == "test" else "live")
+    try:
+        yield
+    finally:
+        _DATA_MODE_OVERRIDE.reset(token)
+
+
 def active_data_path(*parts: str) -> Path:
     root = Path(SAMPLE_DATA_PATH if is_test_mode() else DATA_PATH)
     return root.joinpath(*parts)
 
 
+def cache_path(*parts: str) -> Path:
+    """
+    Host-local cache directory: CACHE_PATH, or `.cache` under DATA_PATH when only the
+    data root was changed, so a relocated data root does not share the default cache.
+    """
+    root = CACHE_PATH if CACHE_PATH != _DEFAULT_CACHE_PATH else os.path.join(DATA_PATH, '.cache')
+    return Path(root).joinpath(*parts)
+
+
 def require_writable_mode() -> None:
     if is_test_mode():
         raise PermissionError("Test mode работает только на чтение.")
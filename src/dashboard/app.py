@@ -9,10 +9,10 @@ import dash_ag_grid as dag
 import dash_bootstrap_components as dbc
 import pandas as pd
 from dash.exceptions import PreventUpdate
-from flask import request
 
 from src import config
-from src.data.get import clear_data_cache, get_transactions
+from src.data.cache import invalidate, invalidate_versions
+from src.data.get import get_transactions
 from src.data.assets_editor import read_asset_snapshot, write_asset_snapshot
 from src.data.crypto import read_crypto_wallets, refresh_crypto_balances, refresh_crypto_price_cache
 from src.data.debts import (
@@ -22,8 +22,6 @@ from src.data.debts import (
     create_debt_payment_from_cash,
     migrate_legacy_debts,
 )
-from src.data.importers.bank_pdf import parse_bank_upload_contents
-from src.data.importers.kaspi_pdf import save_kaspi_import_to_staging
 from src.data.staging import (
     DRAFT_COLUMNS,
     DRAFT_STATUSES,
@@ -35,15 +33,17 @@ from src.data.staging import (
     read_monthly_transaction_csv,
     read_transaction_drafts,
 )
-from src.dashboard.export import export_dashboard_page
 from src.dashboard.auth import configure_auth
 from src.dashboard.investment_data import build_investment_dashboard_data
-from src.dashboard.main_data import DashboardDataset, build_main_dashboard_data, clear_main_dashboard_cache
+from src.dashboard.jobs import LocalJobManager
+from src.dashboard.main_data import DashboardDataset, apply_theme_to_datasets, build_main_dashboard_data
 from src.dashboard.month_data import build_month_dashboard_data, get_day_transaction_details
 from src.dashboard.planning_data import build_planning_dashboard_data, save_goal_targets
+from src.dashboard.prewarm import dashboard_datasets, prewarm_status, schedule_prewarm, start_prewarm
+from src.dashboard.profiling import install_callback_profiler
 from src.dashboard.year_data import build_year_dashboard_data
-from src.model.create_tables import clear_table_cache
-from src import utils
+from src import metrics, utils
+from src.timing import install_request_timing, span, timed
 
 
 DEFAULT_CURRENCY = "RUB"
@@ -373,10 +373,14 @@ def create_app() -> Dash:
         meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1, viewport-fit=cover"}],
         title="FinRep Dashboard",
         suppress_callback_exceptions=True,
+        background_callback_manager=LocalJobManager(),
     )
+    install_request_timing(app.server)
     configure_auth(app.server)
     app.index_string = _app_index_string()
     app.server.add_url_rule("/healthz", "healthz", _healthcheck)
+    app.server.add_url_rule("/healthz/prewarm", "healthz_prewarm", _prewarm_healthcheck)
+    app.server.add_url_rule("/metrics", "metrics", _metrics_endpoint)
     app.layout = create_layout
     app.validation_layout = _callback_validation_layout(create_layout())
     register_callbacks(app)
@@ -387,6 +391,27 @@ def _healthcheck():
     return {"status": "ok"}, 200
 
 
+def _prewarm_healthcheck():
+    return prewarm_status(), 200
+
+
+def _metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def start_dashboard_prewarm(app: Dash) -> None:
+    """Warm the default report datasets of every reachable data mode in the background."""
+    modes = ["test", "live"] if app.server.config.get("FINREP_LIVE_AUTH_ENABLED") else ["test"]
+    selections = []
+    for mode in modes:
+        with config.data_mode(mode):
+            if not config.active_data_path("transactions_info").exists():
+                continue
+            year, month = _default_dashboard_period()
+        selections.append((mode, DEFAULT_CURRENCY, year, month))
+    start_prewarm(selections)
+
+
 def _default_dashboard_period() -> tuple[str, str]:
     if not config.is_test_mode():
         return DEFAULT_YEAR, DEFAULT_MONTH
@@ -508,6 +533,8 @@ def create_layout():
                                 dbc.Button("Светлая", id="theme-toggle", color="secondary", outline=True),
                                 dbc.Button("PNG", id="export-png", color="primary", outline=True),
                                 dbc.Button("PDF", id="export-pdf", color="primary", outline=True),
+                                html.Small(id="background-job-status", className="text-muted"),
+                                dbc.Button("Отменить", id="cancel-background-job", color="secondary", outline=True, disabled=True),
                                 dbc.Badge(
                                     "TEST MODE" if test_mode else "LIVE",
                                     id="dashboard-mode-badge",
@@ -560,6 +587,8 @@ def create_layout():
 
 
 def register_callbacks(app: Dash) -> None:
+    install_callback_profiler(app)
+
     @app.callback(
         Output("dashboard-refresh-token", "data"),
         Input("refresh-reports", "n_clicks"),
@@ -569,9 +598,8 @@ def register_callbacks(app: Dash) -> None:
     def refresh_reports(n_clicks: int | None, current_token: int | None):
         if not n_clicks:
             raise PreventUpdate
-        clear_data_cache()
-        clear_table_cache()
-        clear_main_dashboard_cache()
+        # Cached tables re-check their source files; only tables over edited files are rebuilt.
+        invalidate_versions()
         return int(current_token or 0) + 1
 
     @app.callback(
@@ -579,13 +607,19 @@ def register_callbacks(app: Dash) -> None:
         Output("crypto-refresh-status", "data"),
         Input("crypto-refresh-button", "n_clicks", allow_optional=True),
         State("dashboard-refresh-token", "data"),
+        background=True,
+        running=_background_job_running(),
+        progress=Output("background-job-status", "children"),
+        progress_default="",
+        cancel=Input("cancel-background-job", "n_clicks"),
         prevent_initial_call=True,
     )
-    def refresh_crypto_data(n_clicks: int | None, current_token: int | None):
+    def refresh_crypto_data(set_progress, n_clicks: int | None, current_token: int | None):
         if not n_clicks:
             raise PreventUpdate
         try:
             config.require_writable_mode()
+            set_progress("Crypto: балансы кошельков…")
             wallets = read_crypto_wallets()
             enabled_assets = sorted(
                 {
@@ -595,11 +629,11 @@ def register_callbacks(app: Dash) -> None:
                 }
             )
             balances = refresh_crypto_balances()
+            invalidate("crypto")
             if enabled_assets:
+                set_progress("Crypto: цены…")
                 refresh_crypto_price_cache(enabled_assets)
-            clear_data_cache()
-            clear_table_cache()
-            clear_main_dashboard_cache()
+                invalidate("crypto")
             errors = balances.attrs.get("errors", [])
             statuses = balances.attrs.get("statuses", [])
             message = f"Crypto обновлено: {len(balances)} balance row(s), assets: {', '.join(enabled_assets) or 'нет включенных кошельков'}."
@@ -629,9 +663,7 @@ def register_callbacks(app: Dash) -> None:
             raise PreventUpdate
         config.require_writable_mode()
         save_goal_targets(year, currency, row_data or [])
-        clear_data_cache()
-        clear_table_cache()
-        clear_main_dashboard_cache()
+        invalidate("goals")
         return int(current_token or 0) + 1
 
     @app.callback(
@@ -707,99 +739,112 @@ def register_callbacks(app: Dash) -> None:
         Input("dashboard-tabs", "active_tab"),
         Input("dashboard-theme", "data"),
         Input("dashboard-refresh-token", "data"),
-        Input("refresh-fx-rates", "n_clicks"),
         State("crypto-refresh-status", "data"),
     )
-    def render_dashboard_content(currency: str, year: str, month: str, active_tab: str, theme: str, refresh_token: int, fx_refresh_clicks: int | None, crypto_status: dict | None):
-        fx_network_enabled = ctx.triggered_id == "refresh-fx-rates" and not config.is_test_mode()
-        if fx_network_enabled:
-            clear_table_cache()
-            clear_main_dashboard_cache()
+    @metrics.observe_tab_callback
+    @timed("render_dashboard_content")
+    def render_dashboard_content(currency: str, year: str, month: str, active_tab: str, theme: str, refresh_token: int, crypto_status: dict | None):
+        if ctx.triggered_id == "dashboard-refresh-token":
+            default_year, default_month = _default_dashboard_period()
+            schedule_prewarm(config.get_data_mode(),
+                             [(currency, year, month), (DEFAULT_CURRENCY, default_year, default_month)], theme)
 
         if active_tab == "year":
             try:
-                datasets = build_year_dashboard_data(
-                    year,
-                    currency,
-                    fx_network_enabled=fx_network_enabled,
-                )
+                with span("datasets.year"):
+                    datasets = dashboard_datasets("year", currency, year, month, theme)
             except Exception as exc:
                 return _error_state("Не удалось загрузить данные годового отчета.", exc)
 
-            _apply_theme_to_datasets(datasets, theme)
-            return _year_report_layout(datasets, theme)
+            with span("layout.year"):
+                return _year_report_layout(datasets, theme)
 
         if active_tab == "planning":
             try:
-                datasets = build_planning_dashboard_data(
-                    year,
-                    currency,
-                    fx_network_enabled=fx_network_enabled,
-                )
+                with span("datasets.planning"):
+                    datasets = dashboard_datasets("planning", currency, year, month, theme)
             except Exception as exc:
                 return _error_state("Не удалось загрузить данные плана и прогноза.", exc)
 
-            _apply_theme_to_datasets(datasets, theme)
-            return _planning_report_layout(datasets, theme, read_only=config.is_test_mode())
+            with span("layout.planning"):
+                return _planning_report_layout(datasets, theme, read_only=config.is_test_mode())
 
         if active_tab == "month":
             try:
-                datasets = build_month_dashboard_data(
-                    year,
-                    month,
-                    currency,
-                    fx_network_enabled=fx_network_enabled,
-                )
+                with span("datasets.month"):
+                    datasets = dashboard_datasets("month", currency, year, month, theme)
             except Exception as exc:
                 return _error_state("Не удалось загрузить данные месячного отчета.", exc)
 
-            _apply_theme_to_datasets(datasets, theme)
-            return _month_report_layout(datasets, theme)
+            with span("layout.month"):
+                return _month_report_layout(datasets, theme)
 
         if active_tab == "investments":
             try:
-                datasets = build_investment_dashboard_data(
-                    currency,
-                    fx_network_enabled=fx_network_enabled,
-                )
+                with span("datasets.investments"):
+                    datasets = build_investment_dashboard_data(currency, fx_network_enabled=False)
             except Exception as exc:
                 return _error_state("Не удалось загрузить инвестиционный отчет.", exc)
 
-            _apply_theme_to_datasets(datasets, theme)
-            return _investment_report_layout(datasets, theme, crypto_status, read_only=config.is_test_mode())
+            apply_theme_to_datasets(datasets, theme)
+            with span("layout.investments"):
+                return _investment_report_layout(datasets, theme, crypto_status, read_only=config.is_test_mode())
 
         if active_tab == "debts":
-            return _debt_report_layout(currency, theme, read_only=config.is_test_mode())
+            with span("layout.debts"):
+                return _debt_report_layout(currency, theme, read_only=config.is_test_mode())
 
         if active_tab == "input":
-            return _input_report_layout(currency, year, month, theme, read_only=config.is_test_mode())
+            with span("layout.input"):
+                return _input_report_layout(currency, year, month, theme, read_only=config.is_test_mode())
 
         try:
-            datasets = build_main_dashboard_data(
-                currency,
-                fx_network_enabled=fx_network_enabled,
-                year=year,
-                month=month,
-            )
+            with span("datasets.main"):
+                datasets = dashboard_datasets("main", currency, year, month, theme)
         except Exception as exc:
             return _error_state("Не удалось загрузить данные основного отчета.", exc)
 
-        _apply_theme_to_datasets(datasets, theme)
-        return html.Div(
-            [
-                _cockpit_section(datasets["cockpit_metrics"], theme=theme),
-                _grid_section(datasets["yearly_stats"], height="300px", theme=theme),
-                _grid_section(datasets["fx_rates"], height="260px", theme=theme),
-                _graph_section(datasets["income_expense"], theme=theme),
-                _graph_section(datasets["delta"], theme=theme),
-                _graph_section(datasets["savings_rate"], theme=theme),
-                _graph_section(datasets["capital"], height="640px", theme=theme),
-                _graph_section(datasets["fx_revaluation"], height="420px", theme=theme),
-                _graph_section(datasets["asset_currency_allocation"], height="520px", theme=theme),
-                _graph_section(datasets["fx_changes"], theme=theme),
-            ],
-            className="d-grid gap-4",
-        )
+        with span("layout.main"):
+            return html.Div(
+                [
+                    _cockpit_section(datasets["cockpit_metrics"], theme=theme),
+                    _grid_section(datasets["yearly_stats"], height="300px", theme=theme),
+                    _grid_section(datasets["fx_rates"], height="260px", theme=theme),
+                    _graph_section(datasets["income_expense"], theme=theme),
+                    _graph_section(datasets["delta"], theme=theme),
+                    _graph_section(datasets["savings_rate"], theme=theme),
+                    _graph_section(datasets["capital"], height="640px", theme=theme),
+                    _graph_section(datasets["fx_revaluation"], height="420px", theme=theme),
+                    _graph_section(datasets["asset_currency_allocation"], height="520px", theme=theme),
+                    _graph_section(datasets["fx_changes"], theme=theme),
+                ],
+                className="d-grid gap-4",
+            )
+
+    @app.callback(
+        Output("dashboard-refresh-token", "data", allow_duplicate=True),
+        Input("refresh-fx-rates", "n_clicks"),
+        State("dashboard-currency", "value"),
+        State("dashboard-year", "value"),
+        State("dashboard-month", "value"),
+        State("dashboard-tabs", "active_tab"),
+        State("dashboard-refresh-token", "data"),
+        background=True,
+        running=_background_job_running("refresh-fx-rates"),
+        progress=Output("background-job-status", "children"),
+        progress_default="",
+        cancel=Input("cancel-background-job", "n_clicks"),
+        prevent_initial_call=True,
+    )
+    def refresh_fx_rates(set_progress, n_clicks: int | None, currency: str, year: str, month: str, active_tab: str, current_token: int | None):
+        if not n_clicks or config.is_test_mode():
+            raise PreventUpdate
+        set_progress("Курсы: загрузка…")
+        invalidate("rates")
+        _refresh_fx_rates(active_tab, currency, year, month)
+        # Tables built during the refresh saw the old rates file; the render rebuilds them offline.
+        invalidate("rates")
+        return int(current_token or 0) + 1
 
     @app.callback(
         Output("month-transaction-modal", "is_open"),
@@ -833,6 +878,7 @@ def register_callbacks(app: Dash) -> None:
         State("dashboard-tabs", "active_tab"),
         prevent_initial_call=True,
     )
+    @metrics.observe_tab_callback
     def download_dataset(
         n_clicks: int,
         button_id: dict,
@@ -862,9 +908,15 @@ def register_callbacks(app: Dash) -> None:
         State("dashboard-month", "value"),
         State("dashboard-tabs", "active_tab"),
         State("dashboard-location", "href"),
+        background=True,
+        running=_background_job_running("export-png", "export-pdf"),
+        progress=Output("background-job-status", "children"),
+        progress_default="",
+        cancel=Input("cancel-background-job", "n_clicks"),
         prevent_initial_call=True,
     )
     def export_page(
+        set_progress,
         png_clicks: int,
         pdf_clicks: int,
         currency: str,
@@ -876,7 +928,13 @@ def register_callbacks(app: Dash) -> None:
         if not png_clicks and not pdf_clicks:
             raise PreventUpdate
 
+        # Playwright is loaded only when a page is exported.
+        from src.dashboard.export import export_dashboard_page
+
         export_format = "png" if ctx.triggered_id == "export-png" else "pdf"
+        set_progress(f"Экспорт {export_format.upper()}…")
+        # set_progress raises once the job is cancelled, which closes the browser mid-export.
+        export_steps = {"browser": "запуск браузера", "page": "загрузка страницы", "render": "рендер"}
         export_path = export_dashboard_page(
             href,
             currency,
@@ -884,8 +942,9 @@ def register_callbacks(app: Dash) -> None:
             export_format,
             year=year,
             month=month if active_tab == "month" else None,
-            session_cookie=request.cookies.get(app.server.config.get("SESSION_COOKIE_NAME", "session")),
+            session_cookie=ctx.cookies.get(app.server.config.get("SESSION_COOKIE_NAME", "session")),
             session_cookie_name=app.server.config.get("SESSION_COOKIE_NAME", "session"),
+            on_step=lambda step: set_progress(f"Экспорт {export_format.upper()}: {export_steps[step]}…"),
         )
         return dcc.send_file(str(export_path))
 
@@ -896,12 +955,21 @@ def register_callbacks(app: Dash) -> None:
         Output("kaspi-import-message", "color"),
         Input("kaspi-upload", "contents", allow_optional=True),
         State("kaspi-upload", "filename", allow_optional=True),
+        background=True,
+        running=_background_job_running(),
+        progress=Output("background-job-status", "children"),
+        progress_default="",
+        cancel=Input("cancel-background-job", "n_clicks"),
         prevent_initial_call=True,
     )
-    def preview_kaspi_pdf(contents, filename):
+    def preview_kaspi_pdf(set_progress, contents, filename):
         if not contents:
             raise PreventUpdate
+        # pdfplumber is loaded only when a statement is uploaded.
+        from src.data.importers.bank_pdf import parse_bank_upload_contents
+
         try:
+            set_progress(f"{filename or 'PDF'}: разбор…")
             data = parse_bank_upload_contents(contents)
             internal_count = int(data["skip_reason"].eq("internal_transfer").sum()) if "skip_reason" in data else 0
             message = (
@@ -931,6 +999,8 @@ def register_callbacks(app: Dash) -> None:
             raise PreventUpdate
         try:
             config.require_writable_mode()
+            from src.data.importers.kaspi_pdf import save_kaspi_import_to_staging
+
             result = save_kaspi_import_to_staging(row_data or [])
             message = f"Сохранено в staging: {result['accepted_rows']}. Пропущено дублей/skip: {result['skipped_rows']}."
             color = "success"
@@ -1030,6 +1100,7 @@ def register_callbacks(app: Dash) -> None:
             if trigger == "transaction-confirm-export-button":
                 config.require_writable_mode()
                 result = export_monthly_transaction_drafts(year, month, preview_rows=preview_rows or None)
+                invalidate("transactions")
                 preview = read_monthly_transaction_csv(year, month)
                 message = (
                     f"Экспортировано строк: {result['exported_rows']}. "
@@ -1132,9 +1203,7 @@ def register_callbacks(app: Dash) -> None:
                     cash_currency=cash_currency,
                     comment=comment or "",
                 )
-                clear_data_cache()
-                clear_table_cache()
-                clear_main_dashboard_cache()
+                invalidate("debts")
                 token += 1
                 message = f"Долг создан: {result['debt_id']}. Черновик транзакции добавлен."
                 color = "success"
@@ -1149,16 +1218,13 @@ def register_callbacks(app: Dash) -> None:
                     cash_currency=payment_cash_currency,
                     comment=payment_comment or "",
                 )
-                clear_data_cache()
-                clear_table_cache()
-                clear_main_dashboard_cache()
+                invalidate("debts")
                 token += 1
                 message = f"Погашение создано: {result['payment_id']}. Черновик транзакции добавлен во вкладку Ввод данных."
                 color = "success"
             elif trigger == "debt-migrate-button":
                 result = migrate_legacy_debts()
-                clear_table_cache()
-                clear_main_dashboard_cache()
+                invalidate("debts")
                 token += 1
                 if result.get("skipped"):
                     message = f"Миграция пропущена: {result['skipped']}."
@@ -1217,9 +1283,7 @@ def register_callbacks(app: Dash) -> None:
 
             if trigger == "assets-apply-button":
                 result = write_asset_snapshot(row_data or [], year, month)
-                clear_data_cache()
-                clear_table_cache()
-                clear_main_dashboard_cache()
+                invalidate("assets")
                 message = (
                     f"Активы сохранены: {result['rows']} строк. "
                     f"Файл: {result['path']}. "
@@ -1238,6 +1302,27 @@ def register_callbacks(app: Dash) -> None:
             return row_data or [], str(exc), "danger"
 
 
+def _background_job_running(*button_ids: str) -> list:
+    """Disable the job's buttons and enable the shared cancel button while a background job runs."""
+    return [(Output(button_id, "disabled"), True, False) for button_id in button_ids] + [
+        (Output("cancel-background-job", "disabled"), False, True),
+    ]
+
+
+def _refresh_fx_rates(tab: str, currency: str, year: str, month: str) -> None:
+    """Build the open tab with network FX lookups, which fetch and store the missing rates."""
+    if tab == "year":
+        build_year_dashboard_data(year, currency, fx_network_enabled=True)
+    elif tab == "planning":
+        build_planning_dashboard_data(year, currency, fx_network_enabled=True)
+    elif tab == "month":
+        build_month_dashboard_data(year, month, currency, fx_network_enabled=True)
+    elif tab == "investments":
+        build_investment_dashboard_data(currency, fx_network_enabled=True)
+    else:
+        build_main_dashboard_data(currency, fx_network_enabled=True, year=year, month=month)
+
+
 def _ag_grid_changed_column(change_event, column_name: str) -> bool:
     if not change_event:
         return False
@@ -1263,31 +1348,6 @@ def _section_style(theme: str | None) -> dict:
     return {}
 
 
-def _apply_theme_to_datasets(datasets: dict[str, DashboardDataset], theme: str | None) -> None:
-    if theme != "dark":
-        return
-    for dataset in datasets.values():
-        if dataset.figure is None:
-            continue
-        dataset.figure.update_layout(
-            paper_bgcolor="#2b2b2b",
-            plot_bgcolor="#3c3f41",
-            font=dict(color="#a9b7c6"),
-            title=dict(font=dict(color="#f3f4f6")),
-            legend=dict(font=dict(color="#a9b7c6")),
-            xaxis=dict(
-                color="#d1d5db",
-                gridcolor="#555555",
-                zerolinecolor="#646464",
-            ),
-            yaxis=dict(
-                color="#d1d5db",
-                gridcolor="#555555",
-                zerolinecolor="#646464",
-            ),
-        )
-
-
 def _placeholder_report(title: str):
     return html.Section(
         [
@@ -2218,6 +2278,7 @@ def _error_state(message: str, exc: Exception):
     )
 
 
+@timed()
 def _graph_section(dataset: DashboardDataset, height: str = "520px", theme: str | None = None):
     if dataset.dataframe.empty:
         return _empty_section(dataset)
@@ -2556,6 +2617,7 @@ def _report_cell_style(column: str, row: dict, style_maps: dict, theme: str | No
     return {}
 
 
+@timed()
 def _grid_row_data(dataset: DashboardDataset, data: pd.DataFrame) -> list[dict]:
     display_data = _fill_zero_display_cells(data) if dataset.id in {"month_transactions", "month_summary"} else data
     records = display_data.to_dict("records")
@@ -3229,6 +3291,7 @@ if __name__ == "__main__":
     port = int(os.environ.get("FINREP_DASH_PORT", "8050"))
     debug = os.environ.get("FINREP_DASH_DEBUG", "1") == "1"
     hot_reload = os.environ.get("FINREP_DASH_HOT_RELOAD", "1") == "1"
+    start_dashboard_prewarm(app)
     app.run(
         host=host,
         port=port,
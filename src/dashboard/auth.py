@@ -142,6 +142,7 @@ def configure_auth(server: Flask) -> None:
     if password and not secret_key:
         raise RuntimeError("FINREP_DASH_SECRET_KEY is required when FINREP_DASH_PASSWORD is configured")
 
+    metrics_token = os.environ.get("FINREP_METRICS_TOKEN")
     live_enabled = bool(password)
     server.secret_key = secret_key or secrets.token_hex(32)
     server.config["FINREP_LIVE_AUTH_ENABLED"] = live_enabled
@@ -157,6 +158,11 @@ def configure_auth(server: Flask) -> None:
             return None
         if session.get("authenticated") is True:
             return None
+        if request.path in {"/healthz/prewarm", "/metrics"}:
+            # Scrapers have no session; they send FINREP_METRICS_TOKEN as a bearer token.
+            if metrics_token and _bearer_token_matches(metrics_token):
+                return None
+            return {"error": "authentication required"}, 401
         if request.path.startswith("/_dash-"):
             return {"error": "authentication required"}, 401
         return redirect("/login")
@@ -190,12 +196,17 @@ def configure_auth(server: Flask) -> None:
         return redirect("/login")
 
 
+def _bearer_token_matches(token: str) -> bool:
+    scheme, _, supplied = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(supplied.strip().encode("utf-8"), token.encode("utf-8"))
+
+
 def _load_dashboard_secrets_from_dotenv() -> None:
     """Load only FinRep auth secrets without evaluating unrelated .env content."""
     env_path = Path.cwd() / ".env"
     if not env_path.is_file():
         return
-    wanted = {"FINREP_DASH_PASSWORD", "FINREP_DASH_SECRET_KEY"}
+    wanted = {"FINREP_DASH_PASSWORD", "FINREP_DASH_SECRET_KEY", "FINREP_METRICS_TOKEN"}
     for raw_line in env_path.read_text(encoding="utf-8").splitlines():
         line = raw_line.strip()
         if not line or line.startswith("#") or "=" not in line:
@@ -1,7 +1,10 @@
+import time
+from collections.abc import Callable
 from pathlib import Path
 from urllib.parse import urlencode, urlsplit, urlunsplit
 
 from playwright.sync_api import Error as PlaywrightError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
 
 from src import config
@@ -9,8 +12,24 @@ from src import config
 
 EXPORT_VIEWPORT = {"width": 1440, "height": 1200}
 EXPORT_READY_TIMEOUT_MS = 90_000
+# The ready wait is split into slices so a cancelled export stops within one slice.
+EXPORT_READY_POLL_MS = 2_000
 EXPORT_SETTLE_MS = 1_000
 
+_DASHBOARD_READY_SCRIPT = """() => {
+    const content = document.querySelector("#dashboard-content");
+    if (!content || document.querySelector('[data-dash-is-loading="true"]')) {
+        return false;
+    }
+    const visibleChild = Array.from(content.children).some((element) => {
+        const style = window.getComputedStyle(element);
+        return style.visibility !== "hidden"
+            && style.display !== "none"
+            && element.getBoundingClientRect().height > 0;
+    });
+    return visibleChild && content.textContent.trim().length > 0;
+}"""
+
 
 def build_dashboard_url(
     base_url: str,
@@ -38,7 +57,15 @@ def export_dashboard_page(
     month: str | None = None,
     session_cookie: str | None = None,
     session_cookie_name: str = "session",
+    on_step: Callable[[str], None] | None = None,
 ) -> Path:
+    """
+    Render the dashboard page in headless Chromium and save it as PNG or PDF.
+    `on_step` is called with "browser", "page" and "render" between the Playwright
+    steps and while waiting for the page; an exception it raises aborts the export
+    and closes the browser.
+    """
+    on_step = on_step or (lambda step: None)
     export_format = export_format.lower()
     if export_format not in {"png", "pdf"}:
         raise ValueError("export_format must be 'png' or 'pdf'")
@@ -50,6 +77,7 @@ def export_dashboard_page(
 
     try:
         with sync_playwright() as playwright:
+            on_step("browser")
             browser = playwright.chromium.launch()
             context = browser.new_context(viewport=EXPORT_VIEWPORT)
             if session_cookie:
@@ -65,8 +93,10 @@ def export_dashboard_page(
                     }
                 ])
             page = context.new_page()
+            on_step("page")
             page.goto(dashboard_url, wait_until="domcontentloaded")
-            _wait_for_dashboard_ready(page)
+            _wait_for_dashboard_ready(page, on_step)
+            on_step("render")
             if export_format == "png":
                 page.screenshot(path=export_path, full_page=True)
             else:
@@ -87,23 +117,16 @@ def export_dashboard_page(
     return export_path
 
 
-def _wait_for_dashboard_ready(page) -> None:
-    page.wait_for_function(
-        """() => {
-            const content = document.querySelector("#dashboard-content");
-            if (!content || document.querySelector('[data-dash-is-loading="true"]')) {
-                return false;
-            }
-            const visibleChild = Array.from(content.children).some((element) => {
-                const style = window.getComputedStyle(element);
-                return style.visibility !== "hidden"
-                    && style.display !== "none"
-                    && element.getBoundingClientRect().height > 0;
-            });
-            return visibleChild && content.textContent.trim().length > 0;
-        }""",
-        timeout=EXPORT_READY_TIMEOUT_MS,
-    )
+def _wait_for_dashboard_ready(page, on_step: Callable[[str], None]) -> None:
+    deadline = time.monotonic() + EXPORT_READY_TIMEOUT_MS / 1000
+    while True:
+        try:
+            page.wait_for_function(_DASHBOARD_READY_SCRIPT, timeout=EXPORT_READY_POLL_MS)
+            break
+        except PlaywrightTimeoutError:
+            if time.monotonic() >= deadline:
+                raise
+            on_step("page")
     page.evaluate("() => document.fonts ? document.fonts.ready : Promise.resolve()")
     page.wait_for_timeout(EXPORT_SETTLE_MS)
 
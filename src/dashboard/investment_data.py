@@ -6,8 +6,10 @@ from src.dashboard.main_data import DashboardDataset, _apply_dashboard_chart_lay
 from src.data.crypto import read_crypto_balances, read_crypto_refresh_status, read_crypto_wallets, validate_crypto_wallets
 from src.data.investment_calculations import calculate_portfolio
 from src.data.investments import latest_cached_prices
+from src.timing import timed
 
 
+@timed()
 def build_investment_dashboard_data(
     currency: str,
     fx_network_enabled: bool = True,
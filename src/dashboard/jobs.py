@@ -0,0 +1,240 @@
+"""
+Local job queue for Dash background callbacks.
+
+Page export, crypto and FX refreshes and the PDF import preview can take many seconds.
+As background callbacks they run in a small thread pool instead of holding a gunicorn
+request thread, so tab switching stays responsive while they work. Results, progress
+and cancel flags live in a SQLite file under the cache directory, so whichever worker
+receives the renderer's polling request can answer it. Cancellation is cooperative:
+a cancelled job stops at its next progress report and its result is dropped.
+
+The job function mirrors Dash's own DiskcacheManager and imports the same private
+helpers (callback context, AttributeDict, ProxySetProps). They are not a stable API,
+so pyproject.toml pins dash to the range tested with this module (4.1 to 4.4); check
+this file against dash/background_callback/managers before raising the pin.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from pathlib import Path
+
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.background_callback.managers import BaseBackgroundCallbackManager
+from dash.background_callback._proxy_set_props import ProxySetProps
+from dash.exceptions import PreventUpdate
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+# Rows of jobs whose result was never collected (closed tab, restarted worker).
+STALE_SECONDS = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a job by its progress setter once the job was cancelled. Like
+    KeyboardInterrupt it is not an Exception, so callbacks that report their own
+    errors do not swallow it.
+    """
+
+
+class LocalJobManager(BaseBackgroundCallbackManager):
+    """
+    Background callback manager backed by a thread pool and a SQLite key-value store.
+    Jobs run in the data mode of the request that started them.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max(max_workers or config.JOB_WORKERS, 1)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        super().__init__(cache_by=None)
+
+    def make_job_fn(self, fn, progress, key=None):
+        return self._make_job_fn(fn, progress)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._prune()
+        self._delete(key, self._make_progress_key(key), self._make_set_props_key(key))
+        self._set(_state_key(job), RUNNING)
+        self._pool().submit(job_fn, key, self._make_progress_key(key), args, context, job, config.get_data_mode())
+        return job
+
+    def job_running(self, job):
+        if not job or self._get(_state_key(job)) != RUNNING:
+            return False
+        return _process_alive(job)
+
+    def terminate_job(self, job):
+        if job and self._get(_state_key(job)) == RUNNING:
+            self._set(_state_key(job), CANCELLED)
+
+    def terminate_unhealthy_job(self, job):
+        if job and self._get(_state_key(job)) == RUNNING and not _process_alive(job):
+            self._delete(_state_key(job))
+            return True
+        return False
+
+    def get_progress(self, key):
+        progress_key = self._make_progress_key(key)
+        progress = self._get(progress_key)
+        if progress:
+            self._delete(progress_key)
+        return progress
+
+    def result_ready(self, key):
+        return self._get(key) is not None
+
+    def get_result(self, key, job):
+        result = self._get(key, self.UNDEFINED)
+        if result is self.UNDEFINED:
+            return self.UNDEFINED
+        self._delete(key, self._make_progress_key(key))
+        if job:
+            self._delete(_state_key(job))
+        return result
+
+    def get_updated_props(self, key):
+        set_props_key = self._make_set_props_key(key)
+        result = self._get(set_props_key, self.UNDEFINED)
+        if result is self.UNDEFINED:
+            return {}
+        self._delete(set_props_key)
+        return result
+
+    def clear_cache_entry(self, key):
+        self._delete(key)
+
+    def get_or_create_signing_secret(self, generate):
+        self._connection().execute(
+            "INSERT OR IGNORE INTO jobs (key, value, updated) VALUES (?, ?, ?)",
+            (self.SIGNING_SECRET_KEY, pickle.dumps(generate()), float("inf")),
+        )
+        return self._get(self.SIGNING_SECRET_KEY)
+
+    def database_path(self) -> Path:
+        return config.cache_path("jobs.sqlite")
+
+    def _make_job_fn(self, fn, progress):
+        def job_fn(result_key, progress_key, user_callback_args, context, job, mode):
+            def _set_progress(progress_value):
+                if self._get(_state_key(job)) == CANCELLED:
+                    raise JobCancelled(job)
+                if not isinstance(progress_value, (list, tuple)):
+                    progress_value = [progress_value]
+                self._set(progress_key, progress_value)
+
+            def _set_props(_id, props):
+                self._set(self._make_set_props_key(result_key), {_id: props})
+
+            maybe_progress = [_set_progress] if progress else []
+
+            def run():
+                c = AttributeDict(**context)
+                c.ignore_register_page = False
+                c.updated_props = ProxySetProps(_set_props)
+                context_value.set(c)
+                try:
+                    with config.data_mode(mode):
+                        if isinstance(user_callback_args, dict):
+                            output = fn(*maybe_progress, **user_callback_args)
+                        elif isinstance(user_callback_args, (list, tuple)):
+                            output = fn(*maybe_progress, *user_callback_args)
+                        else:
+                            output = fn(*maybe_progress, user_callback_args)
+                except JobCancelled:
+                    return
+                except PreventUpdate:
+                    output = {"_dash_no_update": "_dash_no_update"}
+                except Exception as err:
+                    output = {"background_callback_error": {"msg": str(err), "tb": traceback.format_exc()}}
+                if self._get(_state_key(job)) == CANCELLED:
+                    return
+                self._set(result_key, output)
+
+            try:
+                copy_context().run(run)
+            except Exception as exc:
+                logger.warning("Background job %s failed: %s", job, exc)
+            finally:
+                if self._get(_state_key(job)) == RUNNING:
+                    self._set(_state_key(job), FINISHED)
+
+        return job_fn
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="finrep-job")
+            return self._executor
+
+    def _get(self, key: str, default=None):
+        row = self._connection().execute("SELECT value FROM jobs WHERE key = ?", (key,)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def _set(self, key: str, value) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO jobs (key, value, updated) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time()),
+        )
+
+    def _delete(self, *keys: str) -> None:
+        self._connection().executemany("DELETE FROM jobs WHERE key = ?", [(key,) for key in keys])
+
+    def _prune(self) -> None:
+        try:
+            self._connection().execute("DELETE FROM jobs WHERE updated < ?", (time.time() - STALE_SECONDS,))
+        except sqlite3.Error as exc:
+            logger.warning("Could not prune background jobs: %s", exc)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process, as in src.data.shared_cache.
+        path = self.database_path()
+        cached = getattr(self._local, "connection", None)
+        if cached is not None and cached[0] == (os.getpid(), path):
+            return cached[1]
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(_SCHEMA)
+        self._local.connection = ((os.getpid(), path), connection)
+        return connection
+
+
+def _state_key(job: str) -> str:
+    return f"job-{job}"
+
+
+def _process_alive(job: str) -> bool:
+    # A job dies with the worker that ran it; other workers only see its state row.
+    try:
+        os.kill(int(str(job).split("-", 1)[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
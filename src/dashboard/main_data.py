@@ -1,14 +1,16 @@
-from dataclasses import dataclass
-from functools import lru_cache
+import json
+from dataclasses import dataclass, replace
 
 import pandas as pd
 import plotly.graph_objects as go
 
 from src import config, utils
+from src.data.cache import versioned_cache
 from src.data.get import get_assets
 from src.data.exchange_rates_info import get_exchange_rates_info
-from src.data.get_finance import get_fallback_rate, get_fx_rates, set_fx_network_enabled
+from src.data.get_finance import convert_as_of, get_fx_rates, set_fx_network_enabled
 from src.model.create_tables import get_balance_by_month
+from src.timing import timed
 
 
 CHART_FONT_SIZE = 13
@@ -36,10 +38,39 @@ class DashboardDataset:
     graph_config: dict | None = None
 
 
+class FrozenFigure:
+    """
+    Immutable stand-in for the go.Figure of a cached dataset. Dash serialises it like the
+    figure it was made from; every caller gets its own copy of the figure data.
+    """
+
+    __slots__ = ("_json",)
+
+    def __init__(self, figure: go.Figure):
+        self._json = figure.to_json()
+
+    def to_plotly_json(self) -> dict:
+        return json.loads(self._json)
+
+    def to_figure(self) -> go.Figure:
+        return go.Figure(self.to_plotly_json())
+
+
+def freeze_datasets(datasets: dict[str, DashboardDataset]) -> dict[str, DashboardDataset]:
+    """
+    Datasets with their figures replaced by FrozenFigure, for sharing through the table cache.
+    """
+    return {
+        name: dataset if dataset.figure is None else replace(dataset, figure=FrozenFigure(dataset.figure))
+        for name, dataset in datasets.items()
+    }
+
+
 def clear_main_dashboard_cache() -> None:
     _asset_currency_allocation_data_cached.cache_clear()
 
 
+@timed()
 def build_main_dashboard_data(
     currency: str,
     fx_network_enabled: bool = True,
@@ -450,10 +481,10 @@ def _fx_changes_data(balance: pd.DataFrame, currency: str) -> pd.DataFrame:
 
 
 def _asset_currency_allocation_data(currency: str) -> pd.DataFrame:
-    return _asset_currency_allocation_data_cached(str(config.active_data_path()), str(currency).upper()).copy(deep=True)
+    return _asset_currency_allocation_data_cached(str(config.active_data_path()), str(currency).upper())
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('assets_info', 'rates', node='asset_allocation')
 def _asset_currency_allocation_data_cached(data_root: str, currency: str) -> pd.DataFrame:
     assets = get_assets()
     if assets.empty:
@@ -485,25 +516,8 @@ def _asset_currency_allocation_data_cached(data_root: str, currency: str) -> pd.
 
 def _convert_asset_allocation_values(assets: pd.DataFrame, currency: str) -> pd.Series:
     values = assets["Значение"].copy()
-    for (from_currency, snapshot_date), index in assets.groupby(["Валюта", "Дата"]).groups.items():
-        from_currency = str(from_currency).upper()
-        if from_currency == currency:
-            continue
-        rate = _fx_rate_as_of(from_currency, currency, snapshot_date)
-        if rate is None:
-            continue
-        values.loc[index] = values.loc[index] * rate
-    return values
-
-
-def _fx_rate_as_of(from_currency: str, to_currency: str, as_of_date) -> float | None:
-    rates = get_fx_rates(from_currency, to_currency, as_of_date, as_of_date)
-    if rates.empty:
-        return get_fallback_rate(from_currency, to_currency)
-    values = pd.to_numeric(rates.iloc[:, 0], errors="coerce").dropna()
-    if values.empty:
-        return get_fallback_rate(from_currency, to_currency)
-    return float(values.iloc[-1])
+    converted = convert_as_of(values, assets["Валюта"], assets["Дата"], currency)
+    return converted.where(converted.notna(), values)
 
 
 def _asset_currency_allocation_figure(data: pd.DataFrame) -> go.Figure:
@@ -700,6 +714,31 @@ def _important_delta_annotations(data: pd.DataFrame, currency: str, max_labels:
     return annotations
 
 
+def apply_theme_to_datasets(datasets: dict[str, DashboardDataset], theme: str | None) -> None:
+    if theme != "dark":
+        return
+    for dataset in datasets.values():
+        if dataset.figure is None:
+            continue
+        dataset.figure.update_layout(
+            paper_bgcolor="#2b2b2b",
+            plot_bgcolor="#3c3f41",
+            font=dict(color="#a9b7c6"),
+            title=dict(font=dict(color="#f3f4f6")),
+            legend=dict(font=dict(color="#a9b7c6")),
+            xaxis=dict(
+                color="#d1d5db",
+                gridcolor="#555555",
+                zerolinecolor="#646464",
+            ),
+            yaxis=dict(
+                color="#d1d5db",
+                gridcolor="#555555",
+                zerolinecolor="#646464",
+            ),
+        )
+
+
 def _apply_dashboard_chart_layout(fig: go.Figure, title: str, range_slider: bool = False) -> None:
     xaxis = dict(
         tickfont=dict(size=CHART_FONT_SIZE),
@@ -5,9 +5,10 @@ from src import config, utils
 from src.dashboard.main_data import DashboardDataset, _apply_dashboard_chart_layout
 from src.dashboard.year_data import _format_cost_distribution
 from src.data.exchange_rates_info import get_exchange_rates_info
-from src.data.get import clear_data_cache, get_transactions
+from src.data.cache import invalidate
+from src.data.get import get_transactions
 from src.data.get_finance import set_fx_network_enabled
-from src.data.proccess import convert_transaction
+from src.data.proccess import convert_transaction, get_transactions_in_currency
 from src.data.staging import ensure_monthly_transaction_csv
 from src.model.create_tables import (
     get_act_liabilities,
@@ -16,8 +17,10 @@ from src.model.create_tables import (
     get_balance_by_month,
     get_month_transactions,
 )
+from src.timing import timed
 
 
+@timed()
 def build_month_dashboard_data(
     year: str,
     month: str,
@@ -33,7 +36,7 @@ def build_month_dashboard_data(
     set_fx_network_enabled(fx_network_enabled)
     created_info = ensure_monthly_transaction_csv(year, month)
     if created_info["created"]:
-        clear_data_cache()
+        invalidate("transactions")
 
     transactions = get_month_transactions(currency, year, month)
     fx_info = get_exchange_rates_info(currency)
@@ -226,13 +229,11 @@ def _to_number(value) -> float:
 
 
 def _cost_distribution(year: str, month: str, currency: str) -> pd.DataFrame:
-    transactions = get_transactions()
+    transactions = get_transactions_in_currency(currency)
     sample = transactions[
         (transactions["Год"].astype(str) == str(year))
         & (transactions["Месяц"].astype(int).astype(str) == str(int(month)))
     ].reset_index(drop=True)
-    if not config.DEBUG:
-        sample = convert_transaction(sample, to_curr=currency, target_col="Значение")
 
     costs = sample[~sample["Категория"].isin(config.NOT_COST_COLS)]
     if costs.empty:
@@ -8,6 +8,7 @@ from src.dashboard.main_data import DashboardDataset, _apply_dashboard_chart_lay
 from src.data.get import get_assets
 from src.data.get_finance import get_actual_fx_rate, set_fx_network_enabled
 from src.model.create_tables import get_balance_by_month
+from src.timing import timed
 
 GOALS_COLUMNS = [
     "year",
@@ -29,6 +30,7 @@ GOAL_LABEL_TO_COLUMN = {
 FX_SHOCKS = [-20, -10, 0, 10, 20]
 
 
+@timed()
 def build_planning_dashboard_data(
     year: str,
     currency: str,
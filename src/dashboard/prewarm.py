@@ -0,0 +1,142 @@
+"""
+Background warm-up of the dashboard datasets.
+
+Renders of the main, year, month and planning tabs read `dashboard_datasets`, which
+caches the themed datasets per data root, currency and period, with their figures
+frozen so that renders cannot change the shared copy. The scheduler builds
+them in a thread pool when a worker starts and after each refresh, so the first click
+on a tab finds them ready instead of running the whole pipeline.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import config
+from src.dashboard.main_data import DashboardDataset, apply_theme_to_datasets, build_main_dashboard_data, freeze_datasets
+from src.dashboard.month_data import build_month_dashboard_data
+from src.dashboard.planning_data import build_planning_dashboard_data
+from src.dashboard.year_data import build_year_dashboard_data
+from src.data.cache import versioned_cache
+
+logger = logging.getLogger(__name__)
+
+WARM_TABS = ("main", "year", "month", "planning")
+DEFAULT_THEME = "dark"
+# Finished jobs kept for /healthz/prewarm; every refresh queues new ones.
+MAX_FINISHED_JOBS = 64
+
+_LOCK = threading.Lock()
+_EXECUTOR: ThreadPoolExecutor | None = None
+_JOBS: dict[tuple, dict] = {}
+
+
+def dashboard_datasets(tab: str, currency: str, year: str, month: str, theme: str | None) -> dict[str, DashboardDataset]:
+    """
+    Themed datasets of a report tab, built without network FX lookups and cached until
+    their source files change.
+    """
+    builder = _CACHED_BUILDERS[tab]
+    return builder(str(config.active_data_path()), str(currency).upper(), str(year), str(month), theme or DEFAULT_THEME)
+
+
+@versioned_cache('transactions_info', 'rates', 'assets_info', 'investments', node='main', shared=False)
+def _main_datasets_cached(data_root: str, currency: str, year: str, month: str, theme: str):
+    datasets = build_main_dashboard_data(currency, fx_network_enabled=False, year=year, month=month)
+    apply_theme_to_datasets(datasets, theme)
+    return freeze_datasets(datasets)
+
+
+@versioned_cache('transactions_info', 'rates', 'assets_info', 'investments', node='year', shared=False)
+def _year_datasets_cached(data_root: str, currency: str, year: str, month: str, theme: str):
+    datasets = build_year_dashboard_data(year, currency, fx_network_enabled=False)
+    apply_theme_to_datasets(datasets, theme)
+    return freeze_datasets(datasets)
+
+
+@versioned_cache('transactions_info', 'rates', 'assets_info', 'investments', 'debts', node='month', shared=False)
+def _month_datasets_cached(data_root: str, currency: str, year: str, month: str, theme: str):
+    datasets = build_month_dashboard_data(year, month, currency, fx_network_enabled=False)
+    apply_theme_to_datasets(datasets, theme)
+    return freeze_datasets(datasets)
+
+
+@versioned_cache('transactions_info', 'rates', 'assets_info', 'investments', 'plans', node='planning', shared=False)
+def _planning_datasets_cached(data_root: str, currency: str, year: str, month: str, theme: str):
+    datasets = build_planning_dashboard_data(year, currency, fx_network_enabled=False)
+    apply_theme_to_datasets(datasets, theme)
+    return freeze_datasets(datasets)
+
+
+_CACHED_BUILDERS = {
+    "main": _main_datasets_cached,
+    "year": _year_datasets_cached,
+    "month": _month_datasets_cached,
+    "planning": _planning_datasets_cached,
+}
+
+
+def start_prewarm(selections: list[tuple[str, str, str, str]]) -> None:
+    """
+    Start the warm-up pool and queue every tab for each (mode, currency, year, month).
+    """
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max(config.PREWARM_WORKERS, 1),
+                                           thread_name_prefix="finrep-prewarm")
+    for mode, currency, year, month in selections:
+        schedule_prewarm(mode, [(currency, year, month)])
+
+
+def schedule_prewarm(mode: str, selections: list[tuple[str, str, str]], theme: str | None = None) -> None:
+    """
+    Queue every warm tab of each (currency, year, month) selection. Does nothing until
+    `start_prewarm` ran, and skips jobs that are already queued or running.
+    """
+    if _EXECUTOR is None:
+        return
+    keys = dict.fromkeys(
+        (mode, tab, str(currency).upper(), str(year), str(month), theme or DEFAULT_THEME)
+        for currency, year, month in selections
+        for tab in WARM_TABS
+    )
+    for key in keys:
+        with _LOCK:
+            if _JOBS.get(key, {}).get("status") in {"queued", "running"}:
+                continue
+            _JOBS[key] = {"status": "queued", "queued_at": time.time()}
+        _EXECUTOR.submit(_run_job, key)
+
+
+def prewarm_status() -> dict:
+    with _LOCK:
+        jobs = [
+            {"mode": key[0], "tab": key[1], "currency": key[2], "year": key[3], "month": key[4], **job}
+            for key, job in _JOBS.items()
+        ]
+    counts = {status: sum(job["status"] == status for job in jobs) for status in ["queued", "running", "done", "failed"]}
+    state = "idle" if _EXECUTOR is None else ("warming" if counts["queued"] or counts["running"] else "ready")
+    return {"state": state, "total": len(jobs), **counts, "jobs": jobs}
+
+
+def _run_job(key: tuple) -> None:
+    mode, tab, currency, year, month, theme = key
+    started = time.perf_counter()
+    with _LOCK:
+        _JOBS[key] = {**_JOBS[key], "status": "running"}
+    try:
+        with config.data_mode(mode):
+            dashboard_datasets(tab, currency, year, month, theme)
+    except Exception as exc:
+        logger.warning("Prewarm of %s failed: %s", key, exc)
+        result = {"status": "failed", "error": str(exc)}
+    else:
+        result = {"status": "done"}
+    with _LOCK:
+        # Re-inserted so that _JOBS lists finished jobs in the order they finished.
+        _JOBS[key] = {**_JOBS.pop(key), **result, "seconds": round(time.perf_counter() - started, 3)}
+        finished = [job_key for job_key, job in _JOBS.items() if job["status"] in {"done", "failed"}]
+        for job_key in finished[:-MAX_FINISHED_JOBS]:
+            del _JOBS[job_key]
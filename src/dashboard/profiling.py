@@ -0,0 +1,110 @@
+"""
+Profiles of slow dashboard callbacks.
+
+With FINREP_PROFILE_CALLBACKS_MS set, every callback registered by register_callbacks
+runs under cProfile. Calls that take longer than the threshold are written to
+reports/profiles/ while the server keeps running:
+
+    <callback>_<timestamp>.prof  pstats data, e.g. for `python -m pstats` or snakeviz
+    <callback>_<timestamp>.txt   the 40 slowest functions by cumulative time
+    <callback>_<timestamp>.json  duration, data mode, triggering component and the
+                                 currency/year/month/tab the callback was called with
+
+Faster calls discard their profile. cProfile slows the profiled calls down noticeably,
+so the mode is meant for chasing a slowdown, not for permanent use.
+"""
+
+import cProfile
+import inspect
+import io
+import json
+import logging
+import pstats
+import re
+import time
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+from dash import ctx
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Callback arguments recorded next to a profile; other arguments may hold form input.
+RECORDED_ARGUMENTS = ("currency", "year", "month", "active_tab", "theme")
+REPORT_LINES = 40
+
+
+def install_callback_profiler(app) -> None:
+    """
+    Profile every callback registered on `app` from now on when
+    FINREP_PROFILE_CALLBACKS_MS is above zero.
+    """
+    if config.PROFILE_CALLBACKS_MS <= 0:
+        return
+    register = app.callback
+
+    @wraps(register)
+    def profiled_callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda func: decorator(profile_slow_calls(func, config.PROFILE_CALLBACKS_MS / 1000))
+
+    app.callback = profiled_callback
+
+
+def profile_slow_calls(func, threshold: float):
+    """
+    Run `func` under cProfile and write the profile of calls slower than `threshold` seconds.
+    """
+    parameters = list(inspect.signature(func).parameters)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            if elapsed >= threshold:
+                arguments = {**dict(zip(parameters, args)), **kwargs}
+                _write_profile(func.__name__, profiler, elapsed, arguments)
+
+    return wrapper
+
+
+def _write_profile(callback: str, profiler: cProfile.Profile, elapsed: float, arguments: dict) -> Path | None:
+    profiles_dir = Path(config.REPORTS_PATH) / "profiles"
+    stem = f"{re.sub(r'[^A-Za-z0-9_-]', '_', callback)}_{datetime.now():%Y%m%d-%H%M%S-%f}"
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(REPORT_LINES)
+    details = {
+        "callback": callback,
+        "duration_seconds": round(elapsed, 4),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "data_mode": config.get_data_mode(),
+        "triggered_id": _triggered_id(),
+        "inputs": {name: arguments[name] for name in RECORDED_ARGUMENTS if name in arguments},
+    }
+    try:
+        profiles_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(profiles_dir / f"{stem}.prof")
+        (profiles_dir / f"{stem}.txt").write_text(report.getvalue(), encoding="utf-8")
+        (profiles_dir / f"{stem}.json").write_text(
+            json.dumps(details, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    except OSError as exc:
+        logger.warning("Could not write the profile of %s: %s", callback, exc)
+        return None
+    logger.info("Slow callback %s took %.2fs; profile: %s", callback, elapsed, profiles_dir / f"{stem}.prof")
+    return profiles_dir / f"{stem}.prof"
+
+
+def _triggered_id():
+    try:
+        return ctx.triggered_id
+    except Exception:
+        return None
@@ -1,3 +1,4 @@
-from src.dashboard.app import app
+from src.dashboard.app import app, start_dashboard_prewarm
 
 server = app.server
+start_dashboard_prewarm(app)
@@ -5,12 +5,13 @@ import plotly.graph_objects as go
 from src import config, utils
 from src.dashboard.main_data import DashboardDataset, _apply_dashboard_chart_layout
 from src.data.exchange_rates_info import get_exchange_rates_info
-from src.data.get import get_transactions
 from src.data.get_finance import set_fx_network_enabled
-from src.data.proccess import convert_transaction
+from src.data.proccess import get_transactions_in_currency
 from src.model.create_tables import get_balance_by_month
+from src.timing import timed
 
 
+@timed()
 def build_year_dashboard_data(
     year: str,
     currency: str,
@@ -155,10 +156,8 @@ def _quarter_stats(year_balance: pd.DataFrame) -> pd.DataFrame:
 
 
 def _cost_distribution(year: str, currency: str) -> pd.DataFrame:
-    transactions = get_transactions()
+    transactions = get_transactions_in_currency(currency)
     sample = transactions[transactions["Год"].astype(str) == str(year)].reset_index(drop=True)
-    if not config.DEBUG:
-        sample = convert_transaction(sample, to_curr=currency, target_col="Значение")
 
     costs = sample[~sample["Категория"].isin(config.NOT_COST_COLS)]
     if costs.empty:
@@ -0,0 +1,318 @@
+"""
+Bounded in-process cache for parsed and derived tables.
+
+Entries are keyed by call arguments and by a data version token built from the stats
+of their source files, evicted least-recently-used under a byte budget, and returned
+as read-only views instead of defensive deep copies.
+
+Cached functions belong to nodes of DEPENDENCIES, so a write to one source invalidates
+only the tables downstream of it.
+"""
+
+import dataclasses
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.data import shared_cache
+
+# Source versions are re-read at most this often; writes through the app invalidate them at once.
+VERSION_TTL_SECONDS = 1.0
+
+_LOCK = threading.RLock()
+_ENTRIES: OrderedDict = OrderedDict()
+_VERSIONS: dict[str, tuple[float, tuple]] = {}
+_STATS = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+_NODE_FUNCTIONS: dict[str, list] = {}
+# Per cached function ('module.qualname'): hits, shared_hits and misses since start.
+_FUNCTION_STATS: dict[str, dict[str, int]] = {}
+
+# Source or table -> nodes computed from it. Dataset nodes (main, year, planning, month)
+# cache the rendered datasets; investment has no cache and is rebuilt on every render.
+DEPENDENCIES = {
+    'transactions': ('ledger', 'month'),
+    'rates': ('ledger', 'asset_capital', 'asset_allocation', 'debts', 'portfolio', 'main', 'year', 'planning'),
+    'assets': ('asset_capital', 'asset_allocation', 'planning'),
+    'investments': ('portfolio',),
+    'crypto': ('portfolio',),
+    'debts': ('month',),
+    'goals': ('planning',),
+    'ledger': ('balance', 'cost_distribution', 'month_transactions', 'year', 'month'),
+    'asset_capital': ('balance',),
+    'balance': ('main', 'year', 'planning'),
+    'asset_allocation': ('main',),
+    'cost_distribution': (),
+    'month_transactions': ('month',),
+    'portfolio': ('main', 'year', 'planning', 'investment'),
+    'main': (),
+    'year': (),
+    'planning': (),
+    'month': (),
+    'investment': (),
+}
+
+
+def versioned_cache(*sources: str, node: str | None = None, shared: bool = True):
+    """
+    Cache a function whose first argument is a data root.
+
+    `sources` are paths relative to that root (files or directories); the entry is
+    recomputed whenever any file under them changes. Without sources the root itself
+    is the source. `node` registers the function for `invalidate`. `shared=False` keeps
+    values that are cheaper to rebuild than to unpickle out of the shared cache.
+    """
+    sources = sources or ('',)
+    if node is not None and node not in DEPENDENCIES:
+        raise ValueError(f"unknown cache node: {node}")
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(data_root, *args):
+            key = (func.__module__, func.__qualname__, str(data_root), args)
+            version = data_version(str(data_root), sources)
+            with _LOCK:
+                entry = _ENTRIES.get(key)
+                if entry is not None and entry[0] == version:
+                    _ENTRIES.move_to_end(key)
+                    _STATS['hits'] += 1
+                    _count(key, 'hits')
+                    return readonly_view(entry[1])
+
+            if shared:
+                value, shared_hit = shared_cache.load_or_build(_function_name(func), key, version,
+                                                               lambda: func(data_root, *args))
+            else:
+                value, shared_hit = func(data_root, *args), False
+            value = _frozen(value)
+            _store(key, version, value, shared_hit)
+            return readonly_view(value)
+
+        def cache_clear():
+            clear(func)
+
+        wrapper.cache_clear = cache_clear
+        if node is not None:
+            _NODE_FUNCTIONS.setdefault(node, []).append(func)
+        return wrapper
+
+    return decorator
+
+
+def data_version(data_root: str, sources) -> tuple:
+    """
+    Version token of `sources` under `data_root`: (path, mtime_ns, size) of every file.
+    """
+    return tuple(_source_version(os.path.join(data_root, source)) for source in sources)
+
+
+def downstream(*nodes: str) -> set[str]:
+    """
+    `nodes` and every node computed from them.
+    """
+    unknown = set(nodes) - DEPENDENCIES.keys()
+    if unknown:
+        raise ValueError(f"unknown cache node: {', '.join(sorted(unknown))}")
+    affected, pending = set(), list(nodes)
+    while pending:
+        node = pending.pop()
+        if node not in affected:
+            affected.add(node)
+            pending.extend(DEPENDENCIES[node])
+    return affected
+
+
+def invalidate(*nodes: str) -> set[str]:
+    """
+    Drop cached entries of `nodes` and of their downstream nodes after a write; other
+    entries stay cached. Returns the affected nodes.
+    """
+    affected = downstream(*nodes)
+    with _LOCK:
+        functions = [func for node in affected for func in _NODE_FUNCTIONS.get(node, ())]
+    for func in functions:
+        clear(func)
+    invalidate_versions()
+    return affected
+
+
+def invalidate_versions() -> None:
+    """
+    Forget memoized source versions so the next lookup re-reads file stats.
+    """
+    with _LOCK:
+        _VERSIONS.clear()
+
+
+def clear(func=None) -> None:
+    """
+    Drop cached entries of `func`, or of every function when omitted, in this process
+    and in the shared cache.
+    """
+    with _LOCK:
+        keys = [key for key in _ENTRIES
+                if func is None or key[:2] == (func.__module__, func.__qualname__)]
+        for key in keys:
+            _STATS['bytes'] -= _ENTRIES.pop(key)[2]
+        _VERSIONS.clear()
+    if func is None:
+        shared_cache.clear()
+    else:
+        shared_cache.delete([_function_name(func)])
+
+
+def cache_stats() -> dict:
+    with _LOCK:
+        return {**_STATS, 'entries': len(_ENTRIES), 'max_bytes': config.TABLE_CACHE_MAX_BYTES}
+
+
+def function_stats() -> dict[str, dict[str, int]]:
+    """
+    Hits, shared hits, misses, entries and bytes of every cached function that was called.
+    """
+    with _LOCK:
+        stats = {name: {**counts, 'entries': 0, 'bytes': 0} for name, counts in _FUNCTION_STATS.items()}
+        for key, (_, _, size) in _ENTRIES.items():
+            counts = stats[f'{key[0]}.{key[1]}']
+            counts['entries'] += 1
+            counts['bytes'] += size
+    return stats
+
+
+def readonly_view(value):
+    """
+    Shallow view of a cached value: numeric and datetime arrays are shared read-only,
+    object columns are copied, and containers and dataclasses are rebuilt around views
+    of their items. Any other value is shared as it is, so it must be immutable.
+    """
+    if isinstance(value, pd.DataFrame):
+        view = value.copy(deep=False)
+        # Object columns cannot be frozen (see _frozen_array); copying them copies pointers only.
+        for column in view.columns[view.dtypes == object].unique():
+            view[column] = view[column].copy()
+        view.index = view.index.view()
+        view.columns = view.columns.view()
+        return view
+    if isinstance(value, pd.Series):
+        view = value.copy(deep=value.dtype == object)
+        view.index = view.index.view()
+        return view
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.replace(value, **{field.name: readonly_view(getattr(value, field.name))
+                                             for field in dataclasses.fields(value) if field.init})
+    if isinstance(value, (tuple, list, set)):
+        return type(value)(readonly_view(item) for item in value)
+    if isinstance(value, dict):
+        return {name: readonly_view(item) for name, item in value.items()}
+    return value
+
+
+def _source_version(path: str) -> tuple:
+    now = time.monotonic()
+    with _LOCK:
+        memo = _VERSIONS.get(path)
+        if memo is not None and now - memo[0] < VERSION_TTL_SECONDS:
+            return memo[1]
+
+    if os.path.isdir(path):
+        stats = []
+        for folder, _, file_names in os.walk(path):
+            for file_name in file_names:
+                file_path = os.path.join(folder, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                stats.append((os.path.relpath(file_path, path), stat.st_mtime_ns, stat.st_size))
+        version = tuple(sorted(stats))
+    else:
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = ()
+
+    with _LOCK:
+        _VERSIONS[path] = (now, version)
+    return version
+
+
+def _function_name(func) -> str:
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def _store(key, version, value, shared_hit: bool = False) -> None:
+    size = _estimate_bytes(value)
+    with _LOCK:
+        previous = _ENTRIES.pop(key, None)
+        if previous is not None:
+            _STATS['bytes'] -= previous[2]
+        _STATS['shared_hits' if shared_hit else 'misses'] += 1
+        _count(key, 'shared_hits' if shared_hit else 'misses')
+        if size > config.TABLE_CACHE_MAX_BYTES:
+            return
+        _ENTRIES[key] = (version, value, size)
+        _STATS['bytes'] += size
+        while _STATS['bytes'] > config.TABLE_CACHE_MAX_BYTES and _ENTRIES:
+            _, (_, _, evicted_size) = _ENTRIES.popitem(last=False)
+            _STATS['bytes'] -= evicted_size
+            _STATS['evictions'] += 1
+
+
+def _count(key, outcome: str) -> None:
+    counts = _FUNCTION_STATS.setdefault(f'{key[0]}.{key[1]}', {'hits': 0, 'shared_hits': 0, 'misses': 0})
+    counts[outcome] += 1
+
+
+def _estimate_bytes(value) -> int:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sum(_estimate_bytes(getattr(value, field.name)) for field in dataclasses.fields(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(_estimate_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_estimate_bytes(item) for item in value.values())
+    return 0
+
+
+def _frozen(value):
+    """
+    Copy of a value about to be cached whose numeric and datetime arrays are read-only,
+    so views handed out by `readonly_view` cannot write into the cached entry.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.replace(value, **{field.name: _frozen(getattr(value, field.name))
+                                             for field in dataclasses.fields(value) if field.init})
+    if isinstance(value, pd.DataFrame):
+        frozen = pd.DataFrame({position: _frozen_array(value.iloc[:, position]) for position in range(value.shape[1])},
+                              index=value.index, copy=False)
+        frozen.columns = value.columns
+        frozen.attrs = dict(value.attrs)
+        return frozen
+    if isinstance(value, pd.Series):
+        frozen = pd.Series(_frozen_array(value), index=value.index, name=value.name, copy=False)
+        frozen.attrs = dict(value.attrs)
+        return frozen
+    if isinstance(value, (tuple, list)):
+        return type(value)(_frozen(item) for item in value)
+    if isinstance(value, dict):
+        return {name: _frozen(item) for name, item in value.items()}
+    return value
+
+
+def _frozen_array(series: pd.Series):
+    # pandas 2.1 object-dtype kernels reject read-only buffers, so only numeric and
+    # datetime columns are frozen; other columns keep their array.
+    if not isinstance(series.dtype, np.dtype) or series.dtype == object:
+        return series.array
+    array = series.to_numpy(copy=True)
+    array.flags.writeable = False
+    return array
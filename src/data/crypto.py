@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
+import json
 import re
+import threading
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
-from src import config
+from src import config, metrics
+from src.data import replay
 from src.data.get_finance import get_actual_fx_rate, get_fallback_rate
-from src.data.investments import latest_cached_prices, read_price_cache, write_price_cache
+from src.data.investments import append_price_cache, latest_cached_prices, read_price_cache
 
 
 WALLET_COLUMNS = ["account", "chain", "asset", "address", "token_contract", "enabled", "label"]
@@ -76,6 +82,16 @@ TON_JETTONS = {
     },
 }
 EVM_ADDRESS_RE = re.compile(r"^0x[a-fA-F0-9]{40}$")
+# Wallets are fetched in parallel over pooled keep-alive sessions, at most
+# HOST_CONCURRENCY requests per provider host, within one overall deadline.
+# EVM wallets of one chain share a single JSON-RPC batch request.
+REFRESH_WORKERS = 8
+HOST_CONCURRENCY = 4
+REFRESH_DEADLINE_SECONDS = 60
+
+_HTTP_LOCK = threading.Lock()
+_HTTP_SESSIONS: dict[str, requests.Session] = {}
+_HOST_SLOTS: dict[str, threading.BoundedSemaphore] = {}
 
 
 @dataclass(frozen=True)
@@ -206,13 +222,20 @@ def refresh_crypto_balances(
     wallets_path: str | Path | None = None,
     balances_path: str | Path | None = None,
     timeout: int = 20,
+    deadline: float = REFRESH_DEADLINE_SECONDS,
+    max_workers: int = REFRESH_WORKERS,
 ) -> pd.DataFrame:
+    """
+    Fetch every enabled wallet concurrently. Wallets still pending when `deadline`
+    seconds have passed get an error status row; the balances fetched so far are written.
+    """
     wallets = read_crypto_wallets(wallets_path)
     fetched_at = datetime.now().isoformat(timespec="seconds")
     rows = []
     errors = []
     statuses = []
     status_rows = []
+    pending = []
     for index, wallet in wallets.iterrows():
         if _is_disabled(wallet):
             continue
@@ -223,8 +246,36 @@ def refresh_crypto_balances(
             for issue in row_issues:
                 status_rows.append(_refresh_status_row(fetched_at, wallet, row_number, "error", issue.message))
             continue
+        pending.append((row_number, wallet))
+
+    groups = _balance_fetch_groups(pending)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups) or 1)), thread_name_prefix="crypto-refresh")
+    futures = [executor.submit(_fetch_balance_group, [wallet for _, wallet in group], timeout) for group in groups]
+    wait(futures, timeout=deadline)
+    # Requests still in flight finish in the background; their results are dropped.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    outcomes = {}
+    for group, future in zip(groups, futures):
+        if not future.done() or future.cancelled():
+            values = [None] * len(group)
+        else:
+            try:
+                values = future.result()
+            except Exception as exc:
+                values = [exc] * len(group)
+        outcomes.update({row_number: value for (row_number, _), value in zip(group, values)})
+
+    for row_number, wallet in pending:
+        balance = outcomes[row_number]
+        if balance is None:
+            message = f"{wallet['chain']}/{wallet['asset']} balance refresh timed out after {deadline:g}s"
+            errors.append(f"row {row_number}: {message}")
+            status_rows.append(_refresh_status_row(fetched_at, wallet, row_number, "error", message))
+            continue
         try:
-            balance = _fetch_wallet_balance(wallet, timeout=timeout)
+            if isinstance(balance, Exception):
+                raise balance
             rows.append(
                 {
                     "fetched_at": fetched_at,
@@ -244,6 +295,7 @@ def refresh_crypto_balances(
             errors.append(f"row {row_number}: {message}")
             status_rows.append(_refresh_status_row(fetched_at, wallet, row_number, "error", message))
 
+    status_rows.sort(key=lambda row: row["row_number"])
     balances = pd.DataFrame(rows, columns=BALANCE_COLUMNS)
     if not balances.empty:
         write_crypto_balances(balances, balances_path)
@@ -292,53 +344,81 @@ def refresh_crypto_price_cache(
 ) -> pd.DataFrame:
     assets = sorted({str(asset).upper() for asset in (assets or SUPPORTED_ASSETS)})
     fetched_at = datetime.now().isoformat(timespec="seconds")
-    rows = []
-    for asset in assets:
-        price, source = _fetch_crypto_price(asset, currency, timeout)
-        if price is None:
-            continue
-        rows.append(
-            {
-                "date": datetime.now().date().isoformat(),
-                "ticker": asset,
-                "price": str(float(price)),
-                "currency": currency.upper(),
-                "source": source,
-                "fetched_at": fetched_at,
-            }
-        )
-    cache = read_price_cache(price_cache_path)
+    prices = _fetch_crypto_prices(assets, currency, timeout)
+    rows = [
+        {
+            "date": datetime.now().date().isoformat(),
+            "ticker": asset,
+            "price": str(float(price)),
+            "currency": currency.upper(),
+            "source": source,
+            "fetched_at": fetched_at,
+        }
+        for asset, (price, source) in sorted(prices.items())
+    ]
     if rows:
-        cache = pd.concat([cache, pd.DataFrame(rows)], ignore_index=True)
-        write_price_cache(cache, price_cache_path)
+        append_price_cache(pd.DataFrame(rows), price_cache_path)
     return read_price_cache(price_cache_path)
 
 
-def _fetch_crypto_price(asset: str, currency: str, timeout: int) -> tuple[float | None, str]:
-    price = _fetch_coingecko_price(asset, currency, timeout)
-    if price is not None:
-        return price, "coingecko"
-    price = _fetch_binance_price(asset, currency, timeout)
-    if price is not None:
-        return price, "binance"
-    return None, ""
+def _fetch_crypto_prices(assets: list[str], currency: str, timeout: int) -> dict[str, tuple[float, str]]:
+    """One CoinGecko request for every asset, then one Binance request for the assets it missed."""
+    prices = {asset: (price, "coingecko") for asset, price in _fetch_coingecko_prices(assets, currency, timeout).items()}
+    missing = [asset for asset in assets if asset not in prices]
+    if missing:
+        prices.update({asset: (price, "binance") for asset, price in _fetch_binance_prices(missing, currency, timeout).items()})
+    return prices
 
 
-def _fetch_coingecko_price(asset: str, currency: str, timeout: int) -> float | None:
-    coin_id = COINGECKO_IDS.get(asset)
-    if not coin_id:
-        return None
+def _fetch_coingecko_prices(assets: list[str], currency: str, timeout: int) -> dict[str, float]:
+    coin_ids = {COINGECKO_IDS[asset]: asset for asset in assets if asset in COINGECKO_IDS}
+    if not coin_ids:
+        return {}
     try:
-        response = requests.get(
+        response = _http_get(
             "https://api.coingecko.com/api/v3/simple/price",
-            params={"ids": coin_id, "vs_currencies": currency.lower()},
+            params={"ids": ",".join(sorted(coin_ids)), "vs_currencies": currency.lower()},
             timeout=timeout,
         )
         response.raise_for_status()
-        price = response.json().get(coin_id, {}).get(currency.lower())
+        payload = response.json()
     except Exception:
-        return None
-    return None if price is None else float(price)
+        return {}
+    prices = {}
+    for coin_id, asset in coin_ids.items():
+        price = payload.get(coin_id, {}).get(currency.lower())
+        if price is not None:
+            prices[asset] = float(price)
+    return prices
+
+
+def _fetch_binance_prices(assets: list[str], currency: str, timeout: int) -> dict[str, float]:
+    if currency.upper() != "USD":
+        return {}
+    prices = {"USDT": 1.0} if "USDT" in assets else {}
+    symbols = {BINANCE_SYMBOLS[asset]: asset for asset in assets if asset in BINANCE_SYMBOLS and asset != "USDT"}
+    if not symbols:
+        return prices
+    try:
+        response = _http_get(
+            "https://api.binance.com/api/v3/ticker/price",
+            params={"symbols": json.dumps(sorted(symbols), separators=(",", ":"))},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        payload = response.json()
+    except Exception:
+        # The bulk endpoint rejects the whole request for one unknown symbol.
+        for asset in symbols.values():
+            price = _fetch_binance_price(asset, currency, timeout)
+            if price is not None:
+                prices[asset] = price
+        return prices
+    for item in payload:
+        asset = symbols.get(item.get("symbol"))
+        if asset and item.get("price") is not None:
+            prices[asset] = float(item["price"])
+    return prices
 
 
 def _fetch_binance_price(asset: str, currency: str, timeout: int) -> float | None:
@@ -350,7 +430,7 @@ def _fetch_binance_price(asset: str, currency: str, timeout: int) -> float | Non
     if not symbol:
         return None
     try:
-        response = requests.get(
+        response = _http_get(
             "https://api.binance.com/api/v3/ticker/price",
             params={"symbol": symbol},
             timeout=timeout,
@@ -438,6 +518,28 @@ def _fetch_wallet_balance(wallet: pd.Series, timeout: int) -> str:
     raise ValueError(f"balance provider is not implemented for {chain}/{asset}")
 
 
+def _balance_fetch_groups(pending: list[tuple[int, pd.Series]]) -> list[list[tuple[int, pd.Series]]]:
+    """One group per EVM chain, batched into a single RPC request; one group per other wallet."""
+    groups = []
+    evm_groups: dict[str, list] = {}
+    for row_number, wallet in pending:
+        if wallet["chain"] in EVM_RPC_URLS:
+            if wallet["chain"] not in evm_groups:
+                evm_groups[wallet["chain"]] = []
+                groups.append(evm_groups[wallet["chain"]])
+            evm_groups[wallet["chain"]].append((row_number, wallet))
+        else:
+            groups.append([(row_number, wallet)])
+    return groups
+
+
+def _fetch_balance_group(wallets: list[pd.Series], timeout: int) -> list[str | Exception]:
+    chain = wallets[0]["chain"]
+    if chain in EVM_RPC_URLS:
+        return _fetch_evm_balances(chain, wallets, timeout)
+    return [_fetch_wallet_balance(wallets[0], timeout)]
+
+
 def _fetch_wallet_transactions(wallet: pd.Series, timeout: int) -> list[dict]:
     if wallet["chain"] == "bitcoin" and wallet["asset"] == "BTC":
         return _fetch_bitcoin_transactions(wallet, timeout)
@@ -445,7 +547,7 @@ def _fetch_wallet_transactions(wallet: pd.Series, timeout: int) -> list[dict]:
 
 
 def _fetch_bitcoin_balance(address: str, timeout: int) -> str:
-    response = requests.get(f"https://blockstream.info/api/address/{address}", timeout=timeout)
+    response = _http_get(f"https://blockstream.info/api/address/{address}", timeout=timeout)
     response.raise_for_status()
     payload = response.json()
     chain_stats = payload.get("chain_stats", {})
@@ -460,7 +562,7 @@ def _fetch_bitcoin_balance(address: str, timeout: int) -> str:
 
 
 def _fetch_bitcoin_transactions(wallet: pd.Series, timeout: int) -> list[dict]:
-    response = requests.get(f"https://blockstream.info/api/address/{wallet['address']}/txs", timeout=timeout)
+    response = _http_get(f"https://blockstream.info/api/address/{wallet['address']}/txs", timeout=timeout)
     response.raise_for_status()
     rows = []
     for tx in response.json():
@@ -487,21 +589,39 @@ def _fetch_bitcoin_transactions(wallet: pd.Series, timeout: int) -> list[dict]:
 
 
 def _fetch_evm_balance(wallet: pd.Series, timeout: int) -> str:
-    chain = wallet["chain"]
-    asset = wallet["asset"]
-    address = wallet["address"]
-    if asset in {"ETH"}:
-        result = _evm_rpc(chain, "eth_getBalance", [address, "latest"], timeout)
-        return str(int(result, 16) / 10**18)
-    token_contract = _token_contract(wallet)
-    decimals = TOKEN_DECIMALS.get(asset, 18)
-    data = "0x70a08231" + address.lower().replace("0x", "").rjust(64, "0")
-    result = _evm_rpc(chain, "eth_call", [{"to": token_contract, "data": data}, "latest"], timeout)
-    return str(int(result, 16) / 10**decimals)
+    balance = _fetch_evm_balances(wallet["chain"], [wallet], timeout)[0]
+    if isinstance(balance, Exception):
+        raise balance
+    return balance
+
+
+def _fetch_evm_balances(chain: str, wallets: list[pd.Series], timeout: int) -> list[str | Exception]:
+    calls = []
+    decimals = []
+    for wallet in wallets:
+        address = wallet["address"]
+        if wallet["asset"] in {"ETH"}:
+            calls.append(("eth_getBalance", [address, "latest"]))
+            decimals.append(18)
+            continue
+        data = "0x70a08231" + address.lower().replace("0x", "").rjust(64, "0")
+        calls.append(("eth_call", [{"to": _token_contract(wallet), "data": data}, "latest"]))
+        decimals.append(TOKEN_DECIMALS.get(wallet["asset"], 18))
+
+    balances = []
+    for result, wallet_decimals in zip(_evm_rpc_batch(chain, calls, timeout), decimals):
+        if isinstance(result, Exception):
+            balances.append(result)
+            continue
+        try:
+            balances.append(str(int(result, 16) / 10**wallet_decimals))
+        except (TypeError, ValueError) as exc:
+            balances.append(ValueError(f"unexpected RPC result {result!r}: {exc}"))
+    return balances
 
 
 def _fetch_solana_balance(address: str, timeout: int) -> str:
-    response = requests.post(
+    response = _http_post(
         "https://api.mainnet-beta.solana.com",
         json={"jsonrpc": "2.0", "id": 1, "method": "getBalance", "params": [address]},
         timeout=timeout,
@@ -511,7 +631,7 @@ def _fetch_solana_balance(address: str, timeout: int) -> str:
 
 
 def _fetch_ton_balance(address: str, timeout: int) -> str:
-    response = requests.get(
+    response = _http_get(
         "https://toncenter.com/api/v2/getAddressBalance",
         params={"address": address},
         timeout=timeout,
@@ -524,7 +644,7 @@ def _fetch_ton_balance(address: str, timeout: int) -> str:
 
 
 def _fetch_ton_jetton_balance(address: str, asset: str, timeout: int) -> str:
-    response = requests.get(
+    response = _http_get(
         f"https://tonapi.io/v2/accounts/{address}/jettons",
         timeout=timeout,
     )
@@ -543,7 +663,7 @@ def _fetch_ton_jetton_balance(address: str, asset: str, timeout: int) -> str:
 
 
 def _fetch_kaspa_balance(address: str, timeout: int) -> str:
-    response = requests.get(f"https://api.kaspa.org/addresses/{address}/balance", timeout=timeout)
+    response = _http_get(f"https://api.kaspa.org/addresses/{address}/balance", timeout=timeout)
     response.raise_for_status()
     payload = response.json()
     sompi = payload.get("balance", payload.get("balanceSompi", 0))
@@ -551,7 +671,7 @@ def _fetch_kaspa_balance(address: str, timeout: int) -> str:
 
 
 def _fetch_xrp_balance(address: str, timeout: int) -> str:
-    response = requests.post(
+    response = _http_post(
         "https://s1.ripple.com:51234/",
         json={
             "method": "account_info",
@@ -569,23 +689,95 @@ def _fetch_xrp_balance(address: str, timeout: int) -> str:
     return str(float(drops) / 1_000_000)
 
 
-def _evm_rpc(chain: str, method: str, params: list, timeout: int):
-    errors = []
+def _evm_rpc_batch(chain: str, calls: list[tuple[str, list]], timeout: int) -> list:
+    """
+    Send `calls` as one JSON-RPC batch. A provider that answers the batch with anything
+    but a list gets the calls one by one instead. Calls that fail on a provider are
+    retried on the next one; a call that fails everywhere is returned as its exception.
+    """
+    results: dict[int, object] = {}
+    errors: dict[int, list[str]] = {index: [] for index in range(len(calls))}
     for url in EVM_RPC_URLS[chain]:
+        pending = [index for index in range(len(calls)) if index not in results]
+        if not pending:
+            break
         try:
-            response = requests.post(
-                url,
-                json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
-                timeout=timeout,
-            )
-            response.raise_for_status()
-            payload = response.json()
-            if "error" in payload:
-                raise ValueError(payload["error"])
-            return payload["result"]
+            payload = _evm_rpc_post(url, [_evm_rpc_request(index, calls[index]) for index in pending], timeout)
         except Exception as exc:
-            errors.append(f"{url}: {exc}")
-    raise ValueError("all EVM RPC providers failed: " + " | ".join(errors))
+            for index in pending:
+                errors[index].append(f"{url}: {exc}")
+            continue
+        if isinstance(payload, list):
+            replies = {reply.get("id"): reply for reply in payload if isinstance(reply, dict)}
+        else:
+            # Batches are unsupported or refused by this provider (e.g. a batch size limit).
+            replies = {index: _evm_rpc_single(url, index, calls[index], timeout) for index in pending}
+        for index in pending:
+            reply = replies.get(index)
+            if reply is None:
+                errors[index].append(f"{url}: missing batch reply")
+            elif "error" in reply:
+                errors[index].append(f"{url}: {reply['error']}")
+            else:
+                results[index] = reply.get("result")
+    return [
+        results[index] if index in results else ValueError("all EVM RPC providers failed: " + " | ".join(errors[index]))
+        for index in range(len(calls))
+    ]
+
+
+def _evm_rpc_single(url: str, index: int, call: tuple[str, list], timeout: int) -> dict:
+    try:
+        reply = _evm_rpc_post(url, _evm_rpc_request(index, call), timeout)
+    except Exception as exc:
+        return {"error": str(exc)}
+    return reply if isinstance(reply, dict) else {"error": f"unexpected reply {reply!r}"}
+
+
+def _evm_rpc_request(index: int, call: tuple[str, list]) -> dict:
+    return {"jsonrpc": "2.0", "id": index, "method": call[0], "params": call[1]}
+
+
+def _evm_rpc_post(url: str, payload, timeout: int):
+    response = _http_post(url, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def _http_get(url: str, **kwargs) -> requests.Response:
+    return _http_request("get", url, **kwargs)
+
+
+def _http_post(url: str, **kwargs) -> requests.Response:
+    return _http_request("post", url, **kwargs)
+
+
+def _http_request(method: str, url: str, **kwargs) -> requests.Response:
+    with _host_slot(url), metrics.provider_request("crypto", urlsplit(url).netloc) as request:
+        response = _http_session(url).request(method, url, **kwargs)
+        if response.status_code >= 400:
+            request.failed()
+        return response
+
+
+def _http_session(url: str) -> requests.Session:
+    host = urlsplit(url).netloc
+    with _HTTP_LOCK:
+        session = _HTTP_SESSIONS.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HOST_CONCURRENCY)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.mount(replay.SCHEME, replay.ReplayAdapter())
+            _HTTP_SESSIONS[host] = session
+        return session
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    with _HTTP_LOCK:
+        return _HOST_SLOTS.setdefault(host, threading.BoundedSemaphore(HOST_CONCURRENCY))
 
 
 def _conversion_rate(from_currency: str, to_currency: str) -> float:
@@ -1,21 +1,62 @@
 import pandas as pd
 import numpy as np
 import os
+import threading
 import warnings
-from functools import lru_cache
 
 warnings.filterwarnings('ignore')
 
 from src import config
+from src.timing import timed
+from src.data import snapshot
+from src.data.cache import invalidate_versions, versioned_cache
 
+# Parsed month frames keyed by file path; reused while (mtime_ns, size) is unchanged.
+_TRANSACTION_FILES_CACHE: dict[str, tuple[tuple[int, int], pd.DataFrame]] = {}
+_TRANSACTION_FILES_LOCK = threading.Lock()
 
+
+@timed()
 def get_transactions():
-    return _get_transactions_cached(str(config.active_data_path("transactions_info"))).copy(deep=True)
+    return _get_transactions_cached(str(config.active_data_path("transactions_info")))
 
 
-@lru_cache(maxsize=1)
+@versioned_cache(node='transactions')
 def _get_transactions_cached(transactions_root: str):
-    transactions_df = pd.DataFrame()
+    month_paths = _transaction_month_paths(transactions_root)
+    return snapshot.cached_frame('transactions', transactions_root, month_paths,
+                                 lambda: _parse_transactions(transactions_root, month_paths))
+
+
+@timed()
+def _parse_transactions(transactions_root: str, month_paths: list[str]) -> pd.DataFrame:
+    signatures = {path: _file_signature(path) for path in month_paths}
+    # Held while parsing: two threads refreshing the same month would parse it twice.
+    with _TRANSACTION_FILES_LOCK:
+        stale_paths = [path for path in month_paths
+                       if path not in _TRANSACTION_FILES_CACHE or _TRANSACTION_FILES_CACHE[path][0] != signatures[path]]
+        if stale_paths:
+            raw_df = pd.concat([_read_transactions_month(path).assign(_path=path) for path in stale_paths],
+                               axis=0, ignore_index=True)
+            for path, month_df in _parse_transaction_cells(raw_df).groupby('_path', sort=False):
+                _TRANSACTION_FILES_CACHE[path] = (signatures[path], month_df.drop('_path', axis=1))
+            for path in set(stale_paths) - set(raw_df['_path']):
+                _TRANSACTION_FILES_CACHE[path] = (signatures[path], _parse_transaction_cells(raw_df.iloc[0:0]).drop('_path', axis=1))
+
+        removed_paths = [path for path in _TRANSACTION_FILES_CACHE
+                         if path.startswith(os.path.join(transactions_root, '')) and path not in signatures]
+        for path in removed_paths:
+            del _TRANSACTION_FILES_CACHE[path]
+        month_frames = [_TRANSACTION_FILES_CACHE[path][1] for path in month_paths]
+
+    if not month_frames:
+        return pd.DataFrame()
+    transactions_df = pd.concat(month_frames, axis=0)
+    return transactions_df.reset_index().drop('index', axis=1)
+
+
+def _transaction_month_paths(transactions_root: str) -> list[str]:
+    month_paths = []
     for folder_name in os.listdir(transactions_root):
         if folder_name == '.DS_Store':
             continue
@@ -23,52 +64,76 @@ def _get_transactions_cached(transactions_root: str):
             # print(file_name)
             if file_name == '.DS_Store' or '.backup_' in file_name:
                 continue
-            month_df = pd.read_csv(os.path.join(transactions_root, folder_name, file_name), sep=';',
-                                   decimal=',',
-                                   parse_dates=True,
-                                   dayfirst=True,
-                                   index_col='Дата',
-                                   infer_datetime_format=True)
-            month_df = month_df.rename(columns={'Долги (у меня)': 'Дебиторская задолженность',
-                                                'Крупные покупки/ Поездки': 'Поездки'},
-                                       errors='ignore')
-            month_df = month_df.reset_index().melt(id_vars='Дата', var_name='Категория')
-
-            month_df['value'] = month_df['value'].astype(str).apply(lambda x: x.split('#'))
-            month_df = month_df.explode('value')
-            month_df['value'] = (month_df['value'].astype(str)
-                                 .str.replace(',', '.')
-                                 .str.replace('\\xa0', '')
-                                 .str.replace('\xa0', '')
-                                 .str.replace(' ₽', '')
-                                 .apply(lambda x: x.split('|') if len(x.split('|')) == 3 else [x, 'RUB', np.nan])
-                                 .apply(lambda x: {'Значение': float(x[0]),
-                                                   'Валюта': x[1].upper(),
-                                                   'Комментарий': x[2]})
-                                 )
-
-            month_df['Валюта'] = month_df['value'].apply(lambda x: x['Валюта'])
-            month_df['Значение'] = month_df['value'].apply(lambda x: x['Значение'])
-            month_df['Комментарий'] = month_df['value'].apply(lambda x: x['Комментарий'])
-            month_df.drop('value', axis=1, inplace=True)
-
-            month_df['Год'] = month_df['Дата'].apply(lambda x: x.year).astype(str)
-            month_df['Квартал'] = month_df['Дата'].apply(lambda x: x.quarter).astype(str)
-            month_df['Месяц'] = month_df['Дата'].apply(lambda x: x.month).astype(str)
-
-            assert len(
-                set(month_df['Валюта'].unique()) - config.UNIQUE_TICKERS.keys()) == 0, 'Есть недопустимые тикеры валют'
-            transactions_df = pd.concat([transactions_df, month_df], axis=0)
-    return transactions_df.reset_index().drop('index', axis=1)
-
-
+            month_paths.append(os.path.join(transactions_root, folder_name, file_name))
+    return month_paths
+
+
+def _file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_transactions_month(path: str) -> pd.DataFrame:
+    """
+    Read one month file and melt it to raw `Дата/Категория/value` cells.
+    """
+    month_df = pd.read_csv(path, sep=';',
+                           decimal=',',
+                           parse_dates=True,
+                           dayfirst=True,
+                           index_col='Дата',
+                           infer_datetime_format=True)
+    month_df = month_df.rename(columns={'Долги (у меня)': 'Дебиторская задолженность',
+                                        'Крупные покупки/ Поездки': 'Поездки'},
+                               errors='ignore')
+    return month_df.reset_index().melt(id_vars='Дата', var_name='Категория')
+
+
+def _parse_transaction_cells(month_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expand melted `value|currency|comment#...` cells into one row per operation.
+    Cells without exactly three `|` parts are plain RUB amounts without a comment.
+    """
+    if month_df.empty:
+        columns = [column for column in month_df.columns if column != 'value']
+        return pd.DataFrame(columns=columns + ['Валюта', 'Значение', 'Комментарий', 'Год', 'Квартал', 'Месяц'])
+
+    month_df = month_df.assign(value=month_df['value'].astype(str).str.split('#')).explode('value')
+    cells = (month_df['value'].astype(str)
+             .str.replace(',', '.', regex=False)
+             .str.replace('\\xa0', '', regex=False)
+             .str.replace('\xa0', '', regex=False)
+             .str.replace(' ₽', '', regex=False))
+    parts = cells.str.extract(r'^([^|]*)\|([^|]*)\|([^|]*)$').to_numpy()
+    has_parts = pd.notna(parts[:, 0])
+
+    month_df = month_df.drop('value', axis=1)
+    month_df['Валюта'] = pd.Series(np.where(has_parts, parts[:, 1], 'RUB'), index=month_df.index).str.upper()
+    month_df['Значение'] = np.where(has_parts, parts[:, 0], cells.to_numpy()).astype(float)
+    month_df['Комментарий'] = np.where(has_parts, parts[:, 2], np.nan)
+
+    month_df['Год'] = month_df['Дата'].dt.year.astype(str)
+    month_df['Квартал'] = month_df['Дата'].dt.quarter.astype(str)
+    month_df['Месяц'] = month_df['Дата'].dt.month.astype(str)
+
+    assert len(
+        set(month_df['Валюта'].unique()) - config.UNIQUE_TICKERS.keys()) == 0, 'Есть недопустимые тикеры валют'
+    return month_df
+
+
+@timed()
 def get_assets():
-    return _get_assets_cached(str(config.active_data_path("assets_info"))).copy(deep=True)
+    return _get_assets_cached(str(config.active_data_path("assets_info")))
 
 
-@lru_cache(maxsize=1)
+@versioned_cache(node='assets')
 def _get_assets_cached(assets_root: str):
-    assets_df = pd.DataFrame()
+    month_paths = _asset_month_paths(assets_root)
+    return snapshot.cached_frame('assets', assets_root, month_paths, lambda: _parse_assets(month_paths))
+
+
+def _asset_month_paths(assets_root: str) -> list[str]:
+    month_paths = []
     for folder_name in os.listdir(assets_root):
         if folder_name == '.DS_Store':
             continue
@@ -76,40 +141,49 @@ def _get_assets_cached(assets_root: str):
             # print(file_name)
             if file_name == '.DS_Store':
                 continue
-            month_df = pd.read_csv(os.path.join(assets_root, folder_name, file_name),
-                                   sep=';', decimal=',', index_col='Счет')
-
-            for col_name in month_df.columns:
-                month_df[col_name] = (month_df[col_name].astype(str)
-                                      .str.replace(',', '.')
-                                      .str.replace('\\xa0', '')
-                                      .str.replace('\xa0', '')
-                                      .apply(lambda x: x.split('|') if len(x.split('|')) == 2 else [x, 'RUB'])
-                                      .apply(lambda x: {'Значение': float(x[0]),
-                                                        'Валюта': x[1].upper()})
-                                      )
-            month_df = month_df.reset_index()
-            month_df['Дата'] = pd.Period(file_name.split('.')[0].replace('_', '-'))
-            month_df['Валюта'] = month_df['Сумма'].apply(lambda x: x['Валюта'])
-            month_df['Значение'] = month_df['Сумма'].apply(lambda x: x['Значение'])
-
-            month_df['Год'] = month_df['Дата'].apply(lambda x: x.year).astype(str)
-            month_df['Квартал'] = month_df['Дата'].apply(lambda x: x.quarter).astype(str)
-            month_df['Месяц'] = month_df['Дата'].apply(lambda x: x.month).astype(str)
-            month_df.drop(['Сумма', 'Дата'], axis=1, inplace=True)
-
-            assert len(
-                set(month_df['Валюта'].unique()) - config.UNIQUE_TICKERS.keys()) == 0, 'Есть недопустимые тикеры валют'
-
-            assets_df = pd.concat([assets_df, month_df], axis=0)
+            month_paths.append(os.path.join(assets_root, folder_name, file_name))
+    return month_paths
+
+
+@timed()
+def _parse_assets(month_paths: list[str]) -> pd.DataFrame:
+    assets_df = pd.DataFrame()
+    for month_path in month_paths:
+        file_name = os.path.basename(month_path)
+        month_df = pd.read_csv(month_path, sep=';', decimal=',', index_col='Счет')
+
+        for col_name in month_df.columns:
+            month_df[col_name] = (month_df[col_name].astype(str)
+                                  .str.replace(',', '.')
+                                  .str.replace('\\xa0', '')
+                                  .str.replace('\xa0', '')
+                                  .apply(lambda x: x.split('|') if len(x.split('|')) == 2 else [x, 'RUB'])
+                                  .apply(lambda x: {'Значение': float(x[0]),
+                                                    'Валюта': x[1].upper()})
+                                  )
+        month_df = month_df.reset_index()
+        month_df['Дата'] = pd.Period(file_name.split('.')[0].replace('_', '-'))
+        month_df['Валюта'] = month_df['Сумма'].apply(lambda x: x['Валюта'])
+        month_df['Значение'] = month_df['Сумма'].apply(lambda x: x['Значение'])
+
+        month_df['Год'] = month_df['Дата'].apply(lambda x: x.year).astype(str)
+        month_df['Квартал'] = month_df['Дата'].apply(lambda x: x.quarter).astype(str)
+        month_df['Месяц'] = month_df['Дата'].apply(lambda x: x.month).astype(str)
+        month_df.drop(['Сумма', 'Дата'], axis=1, inplace=True)
+
+        assert len(
+            set(month_df['Валюта'].unique()) - config.UNIQUE_TICKERS.keys()) == 0, 'Есть недопустимые тикеры валют'
+
+        assets_df = pd.concat([assets_df, month_df], axis=0)
     return assets_df.reset_index().drop('index', axis=1)
 
 
+@timed()
 def get_investments():
-    return _get_investments_cached(str(config.active_data_path("investments", "investments.csv"))).copy(deep=True)
+    return _get_investments_cached(str(config.active_data_path("investments", "investments.csv")))
 
 
-@lru_cache(maxsize=1)
+@versioned_cache(node='investments')
 def _get_investments_cached(investments_path: str):
     data = pd.read_csv(investments_path, sep=';', decimal=',')
     data['Дата'] = data['Дата'].astype('datetime64[ns]')
@@ -122,6 +196,7 @@ def clear_data_cache():
     _get_transactions_cached.cache_clear()
     _get_assets_cached.cache_clear()
     _get_investments_cached.cache_clear()
+    invalidate_versions()
 
 if __name__ == '__main__':
     tmp_df = get_transactions()
@@ -1,26 +1,55 @@
 import logging
-from contextvars import ContextVar
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
 import xml.etree.ElementTree as ET
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import requests
-import yfinance as yf
-from bs4 import BeautifulSoup
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from src import config
+from src import config, metrics
+from src.data import replay, snapshot
+from src.timing import timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 FX_CACHE_COLUMNS = ['date', 'currency', 'usd_rate', 'source', 'fetched_at']
 _FX_NETWORK_ENABLED = ContextVar("finrep_fx_network_enabled", default=False)
-_FX_CACHE_DF: dict[str, pd.DataFrame] = {}
+# Parsed FX cache and rate store per cache path, with the (mtime_ns, size) of the base
+# file and the journal they were read from: other workers append to the same files.
+_FX_CACHE_DF: dict[str, tuple[tuple, pd.DataFrame]] = {}
+_FX_RATE_STORE: dict[str, tuple[tuple, dict[str, '_CurrencyRates']]] = {}
 _CBR_SERIES_CACHE = {}
+# Provider requests of one refresh run in parallel. yf.download keeps module-level
+# state between calls, so yfinance requests go one at a time; a refresh downloads
+# all its yfinance tickers in one call up front and providers read the split result.
+FX_FETCH_WORKERS = 4
+_FX_GAP_MERGE_DAYS = 7
+_YF_LOCK = threading.Lock()
+_YF_PREFETCHED: ContextVar[dict | None] = ContextVar("finrep_yf_prefetched", default=None)
+# New rates are appended to a journal next to fx_rates.csv; once it grows past this
+# size (about 5000 rows) it is merged into the sorted base file by atomic rename.
+FX_JOURNAL_COMPACT_BYTES = 256 * 1024
+_JOURNAL_TAIL_BYTES = 4096
+# Years the recurring FX holidays are expanded for in the provider business-day calendars.
+_FX_CALENDAR_YEARS = range(1990, 2101)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
 _CBR_VALUTE_IDS = {
     'USD': 'R01235',
     'EUR': 'R01239',
@@ -49,8 +78,9 @@ def _build_retry_session():
     return session
 
 
-_HTTP_SESSION = _build_retry_session()
-logger.info("FX network mode: offline")
+@lru_cache(maxsize=None)
+def _http_session():
+    return _build_retry_session()
 
 
 def set_fx_network_enabled(enabled: bool):
@@ -63,6 +93,7 @@ def set_fx_network_enabled(enabled: bool):
     return prev_value
 
 
+@timed()
 def get_usd_rates(currencies, min_date, max_date) -> pd.DataFrame:
     """
     Return daily rates where each value means: 1 currency = N USD.
@@ -75,8 +106,7 @@ def get_usd_rates(currencies, min_date, max_date) -> pd.DataFrame:
         start, end = end, start
 
     _ensure_cache_file()
-    for currency in currencies:
-        _ensure_currency_cached(currency, start, end)
+    _ensure_currencies_cached([(currency, start, end) for currency in currencies])
 
     out = pd.DataFrame(index=pd.date_range(start, end, freq='D'))
     for currency in currencies:
@@ -193,9 +223,11 @@ def update_fx_cache_interactive(currencies, min_date, max_date, tolerance_pct=1.
     _ensure_cache_file()
     previous_network_mode = set_fx_network_enabled(True)
     try:
+        fetched = _fetch_provider_series_many([(currency, start, end) for currency in currencies], provider_names)
         results = []
+        batches = []
         for currency in currencies:
-            provider_series = _fetch_provider_series(currency, start, end, provider_names)
+            provider_series = fetched[(currency, start, end)]
             summary = _compare_provider_series(provider_series)
             _print_provider_summary(currency, provider_series, summary, tolerance_pct)
 
@@ -212,10 +244,11 @@ def update_fx_cache_interactive(currencies, min_date, max_date, tolerance_pct=1.
                 continue
 
             selected = provider_series[choice]
-            _append_cache_rows(currency, selected, choice)
+            batches.append((currency, selected, choice))
             results.append({'currency': currency, 'source': choice, 'rows': len(selected), 'status': 'updated'})
-            print(f"{currency}: cached {len(selected)} rows from {choice}.")
+            print(f"{currency}: selected {len(selected)} rows from {choice}.")
 
+        _append_cache_batches(batches)
         return pd.DataFrame(results)
     finally:
         set_fx_network_enabled(previous_network_mode)
@@ -264,6 +297,7 @@ def get_actual_rates(tickers, max_retries=3):
     if not isinstance(tickers, list):
         tickers = [tickers]
 
+    market_prices = _download_latest_market_prices([ticker for ticker in tickers if not _is_fx_ticker(ticker)])
     rows = []
     for ticker in tickers:
         try:
@@ -271,7 +305,7 @@ def get_actual_rates(tickers, max_retries=3):
                 from_curr, to_curr = _parse_fx_ticker(ticker)
                 rate = get_actual_fx_rate(from_curr, to_curr)
             else:
-                rate = _download_latest_market_price(ticker)
+                rate = market_prices.get(ticker)
             if rate is not None and not pd.isna(rate):
                 rows.append({'ticker_': ticker, f'Актуальная_цена_{config.STOCK_API}': float(rate)})
         except Exception as e:
@@ -325,66 +359,217 @@ def is_problematic_ticker(ticker):
     return _is_fx_ticker(ticker)
 
 
-def _ensure_currency_cached(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp):
-    currency = currency.upper()
-    if currency == config.FX_BASE_CURRENCY:
-        return
+@timed()
+def get_usd_rates_as_of(currencies, dates) -> np.ndarray:
+    """
+    Return the last cached USD rate on or before each date for (currency, date) pairs.
+    Pairs without such a rate, or without a date, are NaN.
+    """
+    currencies = pd.Series(np.asarray(currencies, dtype=object)).astype(str).str.upper().to_numpy()
+    dates = pd.to_datetime(pd.Series(np.asarray(dates, dtype=object)), errors='coerce').dt.normalize()
+    valid_dates = dates.notna().to_numpy()
+    dates = dates.to_numpy(dtype='datetime64[ns]')
+
+    if _FX_NETWORK_ENABLED.get():
+        _ensure_cache_file()
+        pairs = pd.DataFrame({'currency': currencies[valid_dates], 'date': dates[valid_dates]}).drop_duplicates()
+        _ensure_currencies_cached([
+            (currency, pd.Timestamp(date) - timedelta(days=7), pd.Timestamp(date))
+            for currency, date in pairs.itertuples(index=False)
+        ])
+
+    store = _rate_store()
+    out = np.full(len(currencies), np.nan)
+    for currency in np.unique(currencies):
+        mask = (currencies == currency) & valid_dates
+        if currency == config.FX_BASE_CURRENCY:
+            out[mask] = 1.0
+            continue
+        currency_rates = store.get(currency)
+        if currency_rates is None or not mask.any():
+            continue
+        positions = np.searchsorted(currency_rates.dates, dates[mask], side='right') - 1
+        out[mask] = np.where(positions >= 0, currency_rates.rates[np.maximum(positions, 0)], np.nan)
+    return out
+
+
+@timed()
+def convert_as_of(values, from_currencies, dates, to_currency) -> pd.Series:
+    """
+    Convert every value from its own currency to `to_currency` at its own date.
+    Pairs without a cached rate on or before the date use the latest cached pair rate;
+    values that still have no rate are returned as NaN.
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    values = pd.to_numeric(pd.Series(np.asarray(values), index=index), errors='coerce')
+    from_currencies = pd.Series(np.asarray(from_currencies, dtype=object)).astype(str).str.upper().to_numpy()
+    to_currency = str(to_currency).upper()
+    dates = np.asarray(dates, dtype=object)
+
+    from_usd = get_usd_rates_as_of(from_currencies, dates)
+    to_usd = get_usd_rates_as_of(np.full(len(from_currencies), to_currency, dtype=object), dates)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = from_usd / to_usd
+    rates[~np.isfinite(rates)] = np.nan
 
-    missing_dates = _missing_dates(currency, min_date, max_date)
-    if not missing_dates:
+    same_currency = from_currencies == to_currency
+    rates[same_currency] = 1.0
+    fallback_mask = np.isnan(rates) & pd.notna(pd.to_datetime(pd.Series(dates), errors='coerce')).to_numpy()
+    for from_curr in np.unique(from_currencies[fallback_mask]):
+        fallback_rate = get_fallback_rate(from_curr, to_currency)
+        if fallback_rate is not None:
+            rates[fallback_mask & (from_currencies == from_curr)] = fallback_rate
+    return values * rates
+
+
+@dataclass(frozen=True)
+class _FxGap:
+    """
+    Spans of fetchable days of one currency without an exact cached rate, fetched as one range.
+    """
+    currency: str
+    start: pd.Timestamp
+    end: pd.Timestamp
+    spans: tuple
+
+
+def _ensure_currencies_cached(windows: list[tuple[str, pd.Timestamp, pd.Timestamp]]):
+    """
+    Fill the cache gaps of every (currency, start, end) window. With network FX enabled,
+    all gaps are fetched concurrently, falling back through the providers in
+    FX_PROVIDER_ORDER, and stored with one cache write.
+    """
+    if not _FX_NETWORK_ENABLED.get():
+        return
+    gaps = _plan_fx_gaps(windows)
+    if not gaps:
         return
 
-    fetch_dates = _fetchable_missing_dates(currency, missing_dates)
-    if _FX_NETWORK_ENABLED.get() and fetch_dates:
-        fetched = _fetch_missing_usd_rates(currency, min(fetch_dates), max(fetch_dates))
-        if not fetched.empty:
-            fetched = fetched.loc[(fetched.index >= min_date) & (fetched.index <= max_date)]
-            if not fetched.empty:
-                _append_cache_rows(currency, fetched, fetched.name or 'provider')
-                missing_dates = _missing_dates(currency, min_date, max_date)
-                fetch_dates = _fetchable_missing_dates(currency, missing_dates)
-                if not fetch_dates:
-                    return
-
-    if _FX_NETWORK_ENABLED.get() and fetch_dates:
-        preview_dates = ", ".join(date.date().isoformat() for date in fetch_dates[:5])
-        suffix = "..." if len(fetch_dates) > 5 else ""
+    fetched = _fetch_provider_series_many([(gap.currency, gap.start, gap.end) for gap in gaps], config.FX_PROVIDER_ORDER,
+                                          fallback=True)
+    batches = []
+    for gap in gaps:
+        for provider_name, series in fetched[(gap.currency, gap.start, gap.end)].items():
+            if series.empty:
+                continue
+            series = series.loc[(series.index >= gap.start) & (series.index <= gap.end)]
+            if not series.empty:
+                batches.append((gap.currency, series, provider_name))
+                break
+    _append_cache_batches(batches)
+
+    for gap in _plan_fx_gaps(windows):
+        preview_dates = ", ".join(_format_span(start, end) for start, end in gap.spans[:5])
+        suffix = "..." if len(gap.spans) > 5 else ""
         logger.warning(
             "No exact FX cache/provider rows for %s/USD on fetchable dates %s%s; calculations will use nearest cached values where possible",
-            currency,
+            gap.currency,
             preview_dates,
             suffix,
         )
 
 
-def _fetch_missing_usd_rates(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
-    for provider_name in config.FX_PROVIDER_ORDER:
-        provider = _PROVIDERS.get(provider_name)
-        if provider is None:
-            logger.warning("Unknown FX provider configured: %s", provider_name)
+def _plan_fx_gaps(windows: list[tuple[str, pd.Timestamp, pd.Timestamp]]) -> list[_FxGap]:
+    """
+    Missing fetchable ranges of every window; ranges of one currency that overlap or lie
+    within a week of each other are fetched together.
+    """
+    gaps = []
+    for currency, min_date, max_date in windows:
+        currency = str(currency).upper()
+        if currency == config.FX_BASE_CURRENCY:
             continue
+        spans = _missing_fx_spans(currency, min_date, max_date)
+        if spans:
+            gaps.append(_FxGap(currency, spans[0][0], spans[-1][1], tuple(spans)))
+
+    merged = []
+    for gap in sorted(gaps, key=lambda gap: (gap.currency, gap.start)):
+        previous = merged[-1] if merged else None
+        if previous and previous.currency == gap.currency and gap.start <= previous.end + timedelta(days=_FX_GAP_MERGE_DAYS):
+            spans = _union_spans(previous.spans + gap.spans)
+            merged[-1] = _FxGap(gap.currency, previous.start, max(previous.end, gap.end), spans)
+        else:
+            merged.append(gap)
+    return merged
+
+
+def _union_spans(spans) -> tuple:
+    union = []
+    for start, end in sorted(spans):
+        if union and start <= union[-1][1] + timedelta(days=1):
+            union[-1] = (union[-1][0], max(union[-1][1], end))
+        else:
+            union.append((start, end))
+    return tuple(union)
+
+
+def _format_span(start: pd.Timestamp, end: pd.Timestamp) -> str:
+    if start == end:
+        return start.date().isoformat()
+    return f"{start.date().isoformat()}..{end.date().isoformat()}"
+
+
+def _fetch_provider_series_many(ranges: list[tuple[str, pd.Timestamp, pd.Timestamp]], provider_names,
+                                fallback: bool = False) -> dict[tuple, dict[str, pd.Series]]:
+    """
+    Fetch every (currency, start, end) range from every provider, FX_FETCH_WORKERS at a
+    time. Results keep the order of `provider_names`; failed providers give empty series.
+    With `fallback`, providers are asked one after another, each only for the ranges the
+    earlier ones returned nothing for; the ranges of one provider are fetched in parallel.
+    """
+    provider_names = list(provider_names)
+    for provider_name in provider_names:
+        if provider_name not in _PROVIDERS:
+            logger.warning("Unknown FX provider configured: %s", provider_name)
+    provider_names = [name for name in provider_names if name in _PROVIDERS]
+    fetched = {key: {} for key in ranges}
+    pending = list(fetched)
+    for stage in ([name] for name in provider_names) if fallback else [provider_names]:
+        tasks = [(key, name) for key in pending for name in stage]
+        if not tasks:
+            break
+        prefetched = _prefetch_yfinance(pending) if 'yfinance' in stage else None
+        token = _YF_PREFETCHED.set(prefetched)
         try:
-            series = provider(currency, min_date, max_date)
-            series = _clean_rate_series(series)
-            if not series.empty:
-                series.name = provider_name
-                return series
+            with ThreadPoolExecutor(max_workers=min(FX_FETCH_WORKERS, len(tasks)), thread_name_prefix="fx-fetch") as executor:
+                # Each task runs in a copy of this context: it sees the network mode, the data
+                # root and the prefetched yfinance series.
+                futures = [executor.submit(copy_context().run, _fetch_provider_range, name, *key) for key, name in tasks]
+                for (key, name), future in zip(tasks, futures):
+                    fetched[key][name] = future.result()
+        finally:
+            _YF_PREFETCHED.reset(token)
+        pending = [key for key in pending if all(series.empty for series in fetched[key].values())]
+    return fetched
+
+
+def _prefetch_yfinance(ranges: list[tuple[str, pd.Timestamp, pd.Timestamp]]) -> dict[str, pd.Series] | None:
+    """
+    Download the direct and inverse USD tickers of every currency in one yfinance call
+    covering all ranges.
+    """
+    currencies = sorted({str(currency).upper() for currency, _, _ in ranges} - {config.FX_BASE_CURRENCY})
+    if not currencies or not _FX_NETWORK_ENABLED.get():
+        return None
+    tickers = [ticker for currency in currencies for ticker in (f'{currency}{config.FX_BASE_CURRENCY}=X', f'{currency}=X')]
+    with metrics.provider_request("fx", "yfinance-batch") as request:
+        try:
+            return _yf_close_many(tickers, min(start for _, start, _ in ranges), max(end for _, _, end in ranges))
         except Exception as e:
-            logger.warning("FX provider %s failed for %s/USD: %s", provider_name, currency, e)
-    return pd.Series(dtype=float)
+            request.failed()
+            logger.warning("yfinance batch download failed for %s: %s", ", ".join(tickers), e)
+            return None
 
 
-def _fetch_provider_series(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp, provider_names):
-    provider_series = {}
-    for provider_name in provider_names:
-        provider = _PROVIDERS[provider_name]
+def _fetch_provider_range(provider_name: str, currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
+    with metrics.provider_request("fx", provider_name) as request:
         try:
-            series = _clean_rate_series(provider(currency, min_date, max_date))
+            return _clean_rate_series(_PROVIDERS[provider_name](currency, min_date, max_date))
         except Exception as e:
+            request.failed()
             logger.warning("FX provider %s failed for %s/USD: %s", provider_name, currency, e)
-            series = pd.Series(dtype=float)
-        provider_series[provider_name] = series
-    return provider_series
+            return pd.Series(dtype=float)
 
 
 def _compare_provider_series(provider_series: dict[str, pd.Series]) -> dict:
@@ -455,18 +640,19 @@ def _ask_provider_choice(currency: str, available: list[str], default_choice: st
         print(f"Unknown choice: {raw_choice}")
 
 
-def _fetch_yfinance_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
+def _fetch_yfinance_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp, close=None) -> pd.Series:
     currency = currency.upper()
     if currency == config.FX_BASE_CURRENCY:
         return pd.Series(1.0, index=pd.date_range(min_date, max_date, freq='D'))
 
-    direct = _yf_close(f'{currency}{config.FX_BASE_CURRENCY}=X', min_date, max_date)
+    close = close or _yf_close
+    direct = close(f'{currency}{config.FX_BASE_CURRENCY}=X', min_date, max_date)
     if not direct.empty:
         return direct
 
-    inverse = _yf_close(f'{currency}=X', min_date, max_date)
+    inverse = close(f'{currency}=X', min_date, max_date)
     if inverse.empty:
-        inverse = _yf_close(f'{config.FX_BASE_CURRENCY}{currency}=X', min_date, max_date)
+        inverse = close(f'{config.FX_BASE_CURRENCY}{currency}=X', min_date, max_date)
     if inverse.empty:
         return pd.Series(dtype=float)
 
@@ -474,12 +660,12 @@ def _fetch_yfinance_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd
         return 1.0 / inverse
 
 
-def _fetch_cbr_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
+def _fetch_cbr_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp, session=None) -> pd.Series:
     currency = currency.upper()
     if currency == config.FX_BASE_CURRENCY:
         return pd.Series(1.0, index=pd.date_range(min_date, max_date, freq='D'))
 
-    usd_rub = _fetch_cbr_currency_series(config.FX_BASE_CURRENCY, min_date, max_date)
+    usd_rub = _fetch_cbr_currency_series(config.FX_BASE_CURRENCY, min_date, max_date, session)
     if usd_rub.empty:
         return pd.Series(dtype=float)
 
@@ -487,23 +673,45 @@ def _fetch_cbr_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Time
         with np.errstate(divide='ignore', invalid='ignore'):
             return 1.0 / usd_rub
 
-    currency_rub = _fetch_cbr_currency_series(currency, min_date, max_date)
+    currency_rub = _fetch_cbr_currency_series(currency, min_date, max_date, session)
     if currency_rub.empty:
         return pd.Series(dtype=float)
     return currency_rub / usd_rub
 
 
+def _fetch_replay_yfinance_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
+    return _fetch_yfinance_usd_rate(
+        currency, min_date, max_date,
+        close=lambda ticker, start, end: _yf_close_many([ticker], start, end, download=replay.yf_download)[ticker],
+    )
+
+
+def _fetch_replay_cbr_usd_rate(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
+    return _fetch_cbr_usd_rate(currency, min_date, max_date, session=replay.session())
+
+
 _PROVIDERS = {
     'yfinance': _fetch_yfinance_usd_rate,
     'cbr': _fetch_cbr_usd_rate,
+    # Recorded responses from config.REPLAY_PATH, for offline tests and benchmarks.
+    'replay-yfinance': _fetch_replay_yfinance_usd_rate,
+    'replay-cbr': _fetch_replay_cbr_usd_rate,
 }
 
 
-def _fetch_cbr_currency_series(currency, min_date, max_date):
+def register_fx_provider(name: str, fetch):
     """
-    Fetch RUB-per-currency series from CBR.
+    Make `fetch(currency, min_date, max_date)`, returning USD per currency unit by date,
+    selectable by `name` in config.FX_PROVIDER_ORDER.
     """
-    if not _FX_NETWORK_ENABLED.get():
+    _PROVIDERS[name] = fetch
+
+
+def _fetch_cbr_currency_series(currency, min_date, max_date, session=None):
+    """
+    Fetch RUB-per-currency series from CBR, or through `session` (e.g. a replay session).
+    """
+    if session is None and not _FX_NETWORK_ENABLED.get():
         return pd.Series(dtype=float)
 
     currency = currency.upper()
@@ -514,10 +722,10 @@ def _fetch_cbr_currency_series(currency, min_date, max_date):
     start = _to_timestamp(min_date)
     end = _to_timestamp(max_date)
     cache_key = (currency, start.date().isoformat(), end.date().isoformat())
-    if cache_key in _CBR_SERIES_CACHE:
+    if session is None and cache_key in _CBR_SERIES_CACHE:
         return _CBR_SERIES_CACHE[cache_key]
 
-    response = _HTTP_SESSION.get(
+    response = (session or _http_session()).get(
         "https://www.cbr.ru/scripts/XML_dynamic.asp",
         params={
             'date_req1': start.strftime('%d/%m/%Y'),
@@ -541,7 +749,8 @@ def _fetch_cbr_currency_series(currency, min_date, max_date):
             values[pd.Timestamp(datetime.strptime(date_text, '%d.%m.%Y').date())] = value / nominal
 
     series = pd.Series(values, dtype=float).sort_index()
-    _CBR_SERIES_CACHE[cache_key] = series
+    if session is None:
+        _CBR_SERIES_CACHE[cache_key] = series
     return series
 
 
@@ -550,53 +759,45 @@ def _series_from_cache(currency: str, min_date: pd.Timestamp, max_date: pd.Times
     if currency == config.FX_BASE_CURRENCY:
         return pd.Series(1.0, index=full_index, dtype=float)
 
-    cache = _read_cache()
-    if cache.empty:
+    currency_rates = _rate_store().get(currency)
+    if currency_rates is None:
         return pd.Series(np.nan, index=full_index, dtype=float)
+    return pd.Series(currency_rates.daily(full_index, max_date), index=full_index, dtype=float)
 
-    currency_cache = cache[cache['currency'] == currency].sort_values('date')
-    if currency_cache.empty:
-        return pd.Series(np.nan, index=full_index, dtype=float)
 
-    values = currency_cache.set_index('date')['usd_rate'].sort_index()
-    seed = values[values.index <= min_date]
-    in_range = values[(values.index >= min_date) & (values.index <= max_date)]
-    if not seed.empty:
-        in_range = pd.concat([seed.tail(1), in_range])
-    if in_range.empty:
-        return pd.Series(np.nan, index=full_index, dtype=float)
-    values_for_fill = in_range[~in_range.index.duplicated(keep='last')]
-    fill_index = values_for_fill.index.union(full_index).sort_values()
-    return values_for_fill.reindex(fill_index).ffill().bfill().reindex(full_index)
-
-
-def _missing_dates(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> list[pd.Timestamp]:
+def _missing_fx_spans(currency: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    (start, end) spans of fetchable days in the window without an exact cached rate.
+    Weekends and the currency's FX holidays never count as missing.
+    """
     currency = str(currency).upper()
     if currency == config.FX_BASE_CURRENCY:
         return []
+    calendar = _fx_calendar(currency)
+    first = np.busday_offset(_to_day(min_date), 0, roll='forward', busdaycal=calendar)
+    last = np.busday_offset(_to_day(max_date), 0, roll='backward', busdaycal=calendar)
+    if first > last:
+        return []
 
-    full_index = pd.date_range(min_date.normalize(), max_date.normalize(), freq='D')
-    cache = _read_cache()
-    if cache.empty:
-        return list(full_index)
-
-    currency_cache = cache[cache['currency'] == currency]
-    if currency_cache.empty:
-        return list(full_index)
-
-    cached_dates = set(pd.to_datetime(currency_cache['date'], errors='coerce').dropna().dt.normalize())
-    return [date for date in full_index if date.normalize() not in cached_dates]
+    currency_rates = _rate_store().get(currency)
+    if currency_rates is None:
+        starts, ends = np.array([first]), np.array([last])
+    else:
+        starts, ends = currency_rates.missing_spans(first, last, calendar)
+    return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in zip(starts, ends)]
 
 
-def _fetchable_missing_dates(currency: str, missing_dates: list[pd.Timestamp]) -> list[pd.Timestamp]:
-    return [date for date in missing_dates if _is_fx_fetchable_date(currency, date)]
+def _to_day(date) -> np.datetime64:
+    return pd.Timestamp(date).to_datetime64().astype('datetime64[D]')
 
 
-def _is_fx_fetchable_date(currency: str, date: pd.Timestamp) -> bool:
-    date = pd.Timestamp(date).normalize()
-    if date.weekday() >= 5:
-        return False
-    return date.strftime('%m-%d') not in _fx_holiday_mmdd(str(currency).upper())
+@lru_cache(maxsize=None)
+def _fx_calendar(currency: str) -> np.busdaycalendar:
+    """
+    Business-day calendar of the days providers publish `currency` rates for.
+    """
+    holidays = [f'{year}-{mmdd}' for year in _FX_CALENDAR_YEARS for mmdd in _fx_holiday_mmdd(currency)]
+    return np.busdaycalendar(holidays=np.array(holidays, dtype='datetime64[D]'))
 
 
 def _fx_holiday_mmdd(currency: str) -> set[str]:
@@ -611,14 +812,10 @@ def _fx_holiday_mmdd(currency: str) -> set[str]:
 
 
 def _latest_cached_usd_rate(currency: str):
-    cache = _read_cache()
-    if cache.empty:
-        return None
-    currency_cache = cache[cache['currency'] == currency].sort_values('date')
-    if currency_cache.empty:
+    currency_rates = _rate_store().get(currency)
+    if currency_rates is None:
         return None
-    values = pd.to_numeric(currency_cache['usd_rate'], errors='coerce').dropna()
-    return float(values.iloc[-1]) if not values.empty else None
+    return float(currency_rates.rates[-1])
 
 
 def _usd_rate_metadata(currency: str, as_of_date: pd.Timestamp) -> dict:
@@ -633,18 +830,9 @@ def _usd_rate_metadata(currency: str, as_of_date: pd.Timestamp) -> dict:
             'fetched_at': '',
         }
 
-    cache = _read_cache()
-    if cache.empty:
-        return {
-            'currency': currency,
-            'usd_rate': None,
-            'rate_date': None,
-            'source': 'missing',
-            'fetched_at': '',
-        }
-
-    currency_cache = cache[(cache['currency'] == currency) & (cache['date'] <= as_of)].sort_values('date')
-    if currency_cache.empty:
+    currency_rates = _rate_store().get(currency)
+    position = currency_rates.position_as_of(as_of) if currency_rates is not None else -1
+    if position < 0:
         return {
             'currency': currency,
             'usd_rate': None,
@@ -653,13 +841,13 @@ def _usd_rate_metadata(currency: str, as_of_date: pd.Timestamp) -> dict:
             'fetched_at': '',
         }
 
-    row = currency_cache.iloc[-1]
+    fetched_at = currency_rates.fetched_at[position]
     return {
         'currency': currency,
-        'usd_rate': float(row['usd_rate']),
-        'rate_date': pd.Timestamp(row['date']).normalize(),
-        'source': str(row['source']),
-        'fetched_at': str(row['fetched_at']) if pd.notna(row['fetched_at']) else '',
+        'usd_rate': float(currency_rates.rates[position]),
+        'rate_date': pd.Timestamp(currency_rates.dates[position]).normalize(),
+        'source': str(currency_rates.sources[position]),
+        'fetched_at': str(fetched_at) if pd.notna(fetched_at) else '',
     }
 
 
@@ -676,61 +864,286 @@ def _format_fx_source(legs: list[dict]) -> str:
     return "; ".join(parts)
 
 
-def _read_cache() -> pd.DataFrame:
-    cache_path = config.active_data_path("rates", "fx_rates.csv")
+@dataclass(frozen=True)
+class _CurrencyRates:
+    """
+    Cached USD rates of one currency as date-sorted arrays without duplicate dates.
+    """
+    dates: np.ndarray
+    rates: np.ndarray
+    sources: np.ndarray
+    fetched_at: np.ndarray
+    # Runs of consecutive fetchable days with a cached rate, as sorted datetime64[D] bounds.
+    covered_starts: np.ndarray
+    covered_ends: np.ndarray
+
+    def position_as_of(self, as_of) -> int:
+        """
+        Index of the last cached rate on or before `as_of`, -1 when there is none.
+        """
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(as_of), 'ns'), side='right')) - 1
+
+    def daily(self, index: pd.DatetimeIndex, max_date: pd.Timestamp) -> np.ndarray:
+        """
+        As-of rates for `index`; days before the first cached rate take that rate
+        when it falls within `max_date`.
+        """
+        positions = np.searchsorted(self.dates, index.values, side='right') - 1
+        values = self.rates[np.maximum(positions, 0)]
+        if self.dates[0] > np.datetime64(pd.Timestamp(max_date), 'ns'):
+            values = np.where(positions >= 0, values, np.nan)
+        return values
+
+    def missing_spans(self, first: np.datetime64, last: np.datetime64, calendar: np.busdaycalendar):
+        """
+        Start and end arrays of the uncovered spans between the fetchable days `first`
+        and `last`. A window inside one covered run is answered by two binary searches.
+        """
+        lo = np.searchsorted(self.covered_ends, first)
+        hi = np.searchsorted(self.covered_starts, last, side='right')
+        if lo < hi and self.covered_starts[lo] <= first and self.covered_ends[lo] >= last:
+            return np.array([], dtype='datetime64[D]'), np.array([], dtype='datetime64[D]')
+        starts = np.concatenate([[first], np.busday_offset(self.covered_ends[lo:hi], 1, busdaycal=calendar)])
+        ends = np.concatenate([np.busday_offset(self.covered_starts[lo:hi], -1, busdaycal=calendar), [last]])
+        keep = starts <= ends
+        return starts[keep], ends[keep]
+
+
+def _rate_store() -> dict[str, _CurrencyRates]:
+    """
+    Per-currency rate arrays for the active FX cache, rebuilt only after the cache changes.
+    """
+    signature, cache = _cache_entry()
+    cache_key = str(_fx_cache_paths()[0])
+    memo = _FX_RATE_STORE.get(cache_key)
+    if memo is None or memo[0] != signature:
+        memo = (signature, _build_rate_store(cache))
+        _FX_RATE_STORE[cache_key] = memo
+    return memo[1]
+
+
+def _build_rate_store(cache: pd.DataFrame) -> dict[str, _CurrencyRates]:
+    store = {}
+    for currency, currency_cache in cache.groupby('currency', sort=False):
+        currency_cache = currency_cache.sort_values('date', kind='stable')
+        dates = currency_cache['date'].to_numpy(dtype='datetime64[ns]')
+        covered_starts, covered_ends = _covered_runs(dates, _fx_calendar(currency))
+        store[currency] = _CurrencyRates(
+            dates=dates,
+            rates=currency_cache['usd_rate'].to_numpy(dtype=float),
+            sources=currency_cache['source'].to_numpy(dtype=object),
+            fetched_at=currency_cache['fetched_at'].to_numpy(dtype=object),
+            covered_starts=covered_starts,
+            covered_ends=covered_ends,
+        )
+    return store
+
+
+def _covered_runs(dates: np.ndarray, calendar: np.busdaycalendar) -> tuple[np.ndarray, np.ndarray]:
+    days = np.unique(dates.astype('datetime64[D]'))
+    days = days[np.is_busday(days, busdaycal=calendar)]
+    if not len(days):
+        return days, days
+    breaks = np.busday_count(days[:-1], days[1:], busdaycal=calendar) > 1
+    return days[np.concatenate([[True], breaks])], days[np.concatenate([breaks, [True]])]
+
+
+def _cache_frame() -> pd.DataFrame:
+    """
+    The sorted base file merged with the journal of rates appended since the last compaction.
+    """
+    return _cache_entry()[1]
+
+
+def _cache_entry() -> tuple[tuple, pd.DataFrame]:
+    """
+    The FX cache frame with the signature of the files it was read from; read again once
+    either file changed, in this worker or another.
+    """
+    cache_path, journal_path = _fx_cache_paths()
     cache_key = str(cache_path)
-    if cache_key in _FX_CACHE_DF:
-        return _FX_CACHE_DF[cache_key].copy()
+    memo = _FX_CACHE_DF.get(cache_key)
+    if memo is not None and memo[0] == _fx_files_signature(cache_path, journal_path):
+        return memo
+
+    with _fx_store_lock(shared=True):
+        # Taken under the lock, so that no write lands between the signature and the read.
+        signature = _fx_files_signature(cache_path, journal_path)
+        if cache_path.exists():
+            base = snapshot.cached_frame('fx_rates', cache_key, [cache_key], lambda: _parse_cache_file(cache_path))
+        else:
+            base = pd.DataFrame(columns=FX_CACHE_COLUMNS)
+        journal = _read_journal(journal_path)
+        cache = base if journal.empty else _normalize_cache_frame(pd.concat([base, journal], ignore_index=True))
+    memo = (signature, cache)
+    _FX_CACHE_DF[cache_key] = memo
+    return memo
+
+
+def _fx_files_signature(cache_path: Path, journal_path: Path) -> tuple:
+    signature = []
+    for path in (cache_path, journal_path):
+        try:
+            stat = path.stat()
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _parse_cache_file(cache_path: Path) -> pd.DataFrame:
+    return _normalize_cache_frame(pd.read_csv(cache_path, sep=';', dtype={'currency': str, 'source': str, 'fetched_at': str}))
+
+
+def _read_journal(journal_path: Path) -> pd.DataFrame:
+    if not journal_path.exists():
+        return pd.DataFrame(columns=FX_CACHE_COLUMNS)
+    content = _committed_journal(journal_path.read_bytes())
+    if not content.strip():
+        return pd.DataFrame(columns=FX_CACHE_COLUMNS)
+    return _normalize_cache_frame(
+        pd.read_csv(BytesIO(content), sep=';', dtype={'currency': str, 'source': str, 'fetched_at': str})
+    )
+
+
+def _committed_journal(content: bytes) -> bytes:
+    # An append interrupted by a crash leaves a last line without a newline; it is ignored.
+    return content[:content.rfind(b'\n') + 1]
 
-    if not cache_path.exists():
-        _FX_CACHE_DF[cache_key] = pd.DataFrame(columns=FX_CACHE_COLUMNS)
-        return _FX_CACHE_DF[cache_key].copy()
 
-    cache = pd.read_csv(cache_path, sep=';', dtype={'currency': str, 'source': str, 'fetched_at': str})
+def _normalize_cache_frame(cache: pd.DataFrame) -> pd.DataFrame:
     for column in FX_CACHE_COLUMNS:
         if column not in cache.columns:
             cache[column] = np.nan
-    cache = cache[FX_CACHE_COLUMNS]
+    cache = cache[FX_CACHE_COLUMNS].copy()
     cache['date'] = pd.to_datetime(cache['date'], errors='coerce')
     cache['currency'] = cache['currency'].astype(str).str.upper()
     cache['usd_rate'] = pd.to_numeric(cache['usd_rate'], errors='coerce')
     cache = cache.dropna(subset=['date', 'currency', 'usd_rate'])
     cache = cache.sort_values(['currency', 'date', 'fetched_at']).drop_duplicates(['date', 'currency'], keep='last')
-    _FX_CACHE_DF[cache_key] = cache.reset_index(drop=True)
-    return _FX_CACHE_DF[cache_key].copy()
+    return cache.reset_index(drop=True)
 
 
-def _write_cache(cache: pd.DataFrame):
+def compact_fx_cache():
+    """
+    Merge the journal into the sorted base file.
+    """
     config.require_writable_mode()
-    cache_path = config.active_data_path("rates", "fx_rates.csv")
+    cache_path, journal_path = _fx_cache_paths()
+    with _fx_store_lock():
+        if not journal_path.exists():
+            return
+        base = _parse_cache_file(cache_path) if cache_path.exists() else pd.DataFrame(columns=FX_CACHE_COLUMNS)
+        merged = pd.concat([base, _read_journal(journal_path)], ignore_index=True)
+        _replace_cache_file(_normalize_cache_frame(merged))
+
+
+def _replace_cache_file(cache: pd.DataFrame):
+    cache_path, journal_path = _fx_cache_paths()
     cache_path.parent.mkdir(parents=True, exist_ok=True)
-    cache = cache.copy()
+    cache = cache[FX_CACHE_COLUMNS].copy()
     cache['date'] = pd.to_datetime(cache['date']).dt.strftime('%Y-%m-%d')
     cache = cache.sort_values(['currency', 'date'])
-    cache.to_csv(cache_path, sep=';', index=False)
-    _FX_CACHE_DF.pop(str(cache_path), None)
+    temp_path = cache_path.with_name(f'.{cache_path.name}.{os.getpid()}.tmp')
+    with open(temp_path, 'w', encoding='utf-8', newline='') as temp_file:
+        cache.to_csv(temp_file, sep=';', index=False, lineterminator='\n')
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, cache_path)
+    journal_path.unlink(missing_ok=True)
 
 
 def _append_cache_rows(currency: str, rates: pd.Series, source: str):
-    rates = _clean_rate_series(rates)
-    if rates.empty:
-        return
+    _append_cache_batches([(currency, rates, source)])
+
 
+def _append_cache_batches(batches: list[tuple[str, pd.Series, str]]):
+    """
+    Store the (currency, rates, source) batches of one refresh with a single journal append.
+    """
     now = datetime.now().isoformat(timespec='seconds')
-    new_rows = pd.DataFrame({
-        'date': rates.index,
-        'currency': currency.upper(),
-        'usd_rate': rates.astype(float).values,
-        'source': source,
-        'fetched_at': now,
-    })
-    cache = pd.concat([_read_cache(), new_rows], ignore_index=True)
-    cache['date'] = pd.to_datetime(cache['date'], errors='coerce')
-    cache['currency'] = cache['currency'].astype(str).str.upper()
-    cache['usd_rate'] = pd.to_numeric(cache['usd_rate'], errors='coerce')
-    cache = cache.dropna(subset=['date', 'currency', 'usd_rate'])
-    cache = cache.sort_values(['currency', 'date', 'fetched_at']).drop_duplicates(['date', 'currency'], keep='last')
-    _write_cache(cache[FX_CACHE_COLUMNS])
+    frames = []
+    for currency, rates, source in batches:
+        rates = _clean_rate_series(rates)
+        if rates.empty:
+            continue
+        frames.append(pd.DataFrame({
+            'date': rates.index.strftime('%Y-%m-%d'),
+            'currency': currency.upper(),
+            'usd_rate': rates.astype(float).values,
+            'source': source,
+            'fetched_at': now,
+        }))
+    if not frames:
+        return
+
+    if _append_journal(pd.concat(frames, ignore_index=True)[FX_CACHE_COLUMNS]) >= FX_JOURNAL_COMPACT_BYTES:
+        compact_fx_cache()
+
+
+def _append_journal(rows: pd.DataFrame) -> int:
+    """
+    Append rows to the journal with one synced write; returns the journal size in bytes.
+    Only the tail of the journal is read, to cut off a line torn by an earlier crash.
+    """
+    config.require_writable_mode()
+    journal_path = _fx_cache_paths()[1]
+    journal_path.parent.mkdir(parents=True, exist_ok=True)
+    with _fx_store_lock():
+        with open(journal_path, 'a+b') as journal:
+            size = _committed_journal_size(journal)
+            if size != journal.seek(0, os.SEEK_END):
+                journal.truncate(size)
+            text = rows.to_csv(sep=';', index=False, header=size == 0, lineterminator='\n').encode('utf-8')
+            journal.write(text)
+            journal.flush()
+            os.fsync(journal.fileno())
+    return size + len(text)
+
+
+def _committed_journal_size(journal) -> int:
+    end = journal.seek(0, os.SEEK_END)
+    position = end
+    while position > 0:
+        start = max(position - _JOURNAL_TAIL_BYTES, 0)
+        journal.seek(start)
+        newline = journal.read(position - start).rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        position = start
+    return 0
+
+
+def _fx_cache_paths() -> tuple[Path, Path]:
+    cache_path = config.active_data_path("rates", "fx_rates.csv")
+    return cache_path, cache_path.with_name('fx_rates.journal.csv')
+
+
+@contextmanager
+def _fx_store_lock(shared: bool = False):
+    """
+    Host-wide lock of the active FX cache: writers exclusive, readers of base + journal shared.
+    The lock file sits next to fx_rates.csv. Test mode never writes its read-only sample
+    data, so it takes no lock there.
+    """
+    if fcntl is None or config.is_test_mode():
+        yield
+        return
+    cache_path, _ = _fx_cache_paths()
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(cache_path.with_name(f'{cache_path.name}.lock'), 'a+b')
+    except OSError as e:
+        logger.warning("Could not lock FX cache: %s", e)
+        yield
+        return
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
 
 
 def _ensure_cache_file():
@@ -756,41 +1169,72 @@ def _clean_rate_series(series: pd.Series) -> pd.Series:
 def _yf_close(ticker: str, min_date: pd.Timestamp, max_date: pd.Timestamp) -> pd.Series:
     if not _FX_NETWORK_ENABLED.get():
         return pd.Series(dtype=float)
-    data = yf.download(
-        ticker,
-        start=min_date,
-        end=max_date + timedelta(days=1),
-        progress=False,
-        auto_adjust=False,
-    )
-    if data is None or data.empty:
-        return pd.Series(dtype=float)
-    if isinstance(data.columns, pd.MultiIndex):
-        if ('Close', ticker) in data.columns:
-            close = data[('Close', ticker)]
-        else:
-            close = data.xs('Close', axis=1, level=0).iloc[:, 0]
-    elif 'Close' in data.columns:
-        close = data['Close']
-    else:
-        close = data.iloc[:, -1]
-    return _clean_rate_series(close)
+    prefetched = _YF_PREFETCHED.get()
+    if prefetched is not None and ticker in prefetched:
+        series = prefetched[ticker]
+        if series.empty:
+            return series
+        return series.loc[(series.index >= min_date) & (series.index <= max_date)]
+    return _yf_close_many([ticker], min_date, max_date)[ticker]
 
 
-def _download_latest_market_price(ticker: str):
-    if not _FX_NETWORK_ENABLED.get():
-        return None
-    data = yf.download(ticker, period='5d', progress=False, auto_adjust=False)
+def _yf_close_many(tickers: list[str], min_date: pd.Timestamp, max_date: pd.Timestamp, download=None) -> dict[str, pd.Series]:
+    """
+    Daily closes of several tickers from one yfinance download.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if download is None:
+        import yfinance as yf
+
+        download = yf.download
+    with _YF_LOCK:
+        data = download(
+            tickers if len(tickers) > 1 else tickers[0],
+            start=min_date,
+            end=max_date + timedelta(days=1),
+            progress=False,
+            auto_adjust=False,
+        )
+    return {ticker: _clean_rate_series(_close_column(data, ticker, len(tickers) == 1)) for ticker in tickers}
+
+
+def _download_latest_market_prices(tickers: list[str]) -> dict[str, float]:
+    """
+    Latest close of each non-FX ticker from one five-day yfinance download.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers or not _FX_NETWORK_ENABLED.get():
+        return {}
+    try:
+        import yfinance as yf
+
+        with _YF_LOCK:
+            data = yf.download(tickers if len(tickers) > 1 else tickers[0], period='5d', progress=False, auto_adjust=False)
+    except Exception as e:
+        logger.warning("Could not download market prices for %s: %s", ", ".join(tickers), e)
+        return {}
+    prices = {}
+    for ticker in tickers:
+        values = pd.to_numeric(_close_column(data, ticker, len(tickers) == 1), errors='coerce').dropna()
+        if not values.empty:
+            prices[ticker] = float(values.iloc[-1])
+    return prices
+
+
+def _close_column(data: pd.DataFrame, ticker: str, single: bool) -> pd.Series:
     if data is None or data.empty:
-        return None
+        return pd.Series(dtype=float)
     if isinstance(data.columns, pd.MultiIndex):
-        close = data.xs('Close', axis=1, level=0).iloc[:, 0]
-    elif 'Close' in data.columns:
-        close = data['Close']
-    else:
-        close = data.iloc[:, -1]
-    values = pd.to_numeric(close, errors='coerce').dropna()
-    return float(values.iloc[-1]) if not values.empty else None
+        if ('Close', ticker) in data.columns:
+            return data[('Close', ticker)]
+        if single:
+            return data.xs('Close', axis=1, level=0).iloc[:, 0]
+        return pd.Series(dtype=float)
+    if not single:
+        return pd.Series(dtype=float)
+    if 'Close' in data.columns:
+        return data['Close']
+    return data.iloc[:, -1]
 
 
 def _to_timestamp(value) -> pd.Timestamp:
@@ -820,6 +1264,8 @@ def get_act_moex(mode='stocks'):
     else:
         raise ValueError('mode должен быть из [stocks, ETF, OFZ]')
 
+    from bs4 import BeautifulSoup
+
     response = requests.api.get(moex_req)
     soup = BeautifulSoup(response.text, "lxml")
     shares_df = pd.DataFrame()
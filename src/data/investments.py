@@ -134,6 +134,29 @@ def ensure_price_cache_file(path: str | Path | None = None) -> Path:
 def write_price_cache(data: pd.DataFrame, path: str | Path | None = None) -> None:
     config.require_writable_mode()
     cache_path = ensure_price_cache_file(path)
+    _normalize_price_cache(data).to_csv(cache_path, sep=";", index=False, encoding="utf-8-sig")
+
+
+def append_price_cache(data: pd.DataFrame, path: str | Path | None = None) -> None:
+    """
+    Append rows to the price cache in one write. A file with a different header is
+    rewritten instead, so the appended columns always line up.
+    """
+    config.require_writable_mode()
+    cache_path = ensure_price_cache_file(path)
+    with open(cache_path, "rb") as cache_file:
+        content = cache_file.read()
+    header = content.decode("utf-8-sig").split("\n", 1)[0].rstrip("\r").split(";")
+    if header != PRICE_CACHE_COLUMNS:
+        write_price_cache(pd.concat([read_price_cache(path), data], ignore_index=True), path)
+        return
+    with open(cache_path, "a", encoding="utf-8", newline="") as cache_file:
+        if content and not content.endswith(b"\n"):
+            cache_file.write("\n")
+        _normalize_price_cache(data).to_csv(cache_file, sep=";", index=False, header=False, lineterminator="\n")
+
+
+def _normalize_price_cache(data: pd.DataFrame) -> pd.DataFrame:
     normalized = data.copy(deep=True)
     for column in PRICE_CACHE_COLUMNS:
         if column not in normalized.columns:
@@ -141,7 +164,7 @@ def write_price_cache(data: pd.DataFrame, path: str | Path | None = None) -> Non
     normalized = normalized[PRICE_CACHE_COLUMNS].fillna("")
     normalized["ticker"] = normalized["ticker"].astype(str).str.strip().str.upper()
     normalized["currency"] = normalized["currency"].astype(str).str.strip().str.upper()
-    normalized.to_csv(cache_path, sep=";", index=False, encoding="utf-8-sig")
+    return normalized
 
 
 def seed_price_cache_from_transactions(
@@ -1,12 +1,21 @@
+import numpy as np
 import pandas as pd
 
-from src.data.get_finance import get_fallback_rate, get_rates
+from src import config
+from src.data.cache import versioned_cache
+from src.data.get import get_transactions
+from src.data.get_finance import get_fallback_rate, get_usd_rates, get_usd_rates_as_of
+from src.timing import timed
 
 
+@timed()
 def convert_transaction(df_to_convert: pd.DataFrame, to_curr: str, target_col: str, use_current_rate: bool = False):
     """
     Convert values of transactions to chosen currency with improved error handling.
 
+    USD rates of all involved currencies are loaded once for the full date span; each
+    currency then uses the cross rate over its own date span, as before.
+
     :param df_to_convert:
     :param to_curr:
     :param target_col:
@@ -15,66 +24,124 @@ def convert_transaction(df_to_convert: pd.DataFrame, to_curr: str, target_col: s
     import logging
     logger = logging.getLogger(__name__)
     df_to_convert = df_to_convert.copy()
-    
+
     currency_to_convert = set(df_to_convert['Валюта'].unique()) - {to_curr}
+    if not currency_to_convert:
+        return df_to_convert.round(2)
 
-    for curr_name in currency_to_convert:
-        curr_smpl = df_to_convert[df_to_convert['Валюта'] == curr_name]
-        smpl_index = curr_smpl.index
-        ticker = f'{curr_name}{to_curr}=X'
+    currencies = df_to_convert['Валюта'].to_numpy()
+    dates = pd.to_datetime(df_to_convert['Дата'])
+    usd_rates = None
+    try:
+        usd_rates = get_usd_rates(sorted(currency_to_convert | {to_curr}), dates.min(), dates.max())
+    except Exception as e:
+        for curr_name in currency_to_convert:
+            logger.warning(f"Failed to get FX rates for {curr_name} to {to_curr}: {e}")
 
+    row_rates = np.full(len(df_to_convert), np.nan)
+    for curr_name in currency_to_convert:
+        curr_mask = currencies == curr_name
+        curr_dates = dates[curr_mask]
         curr_rates = None
-        try:
-            curr_rates = get_rates(tickers=[ticker],
-                                   min_date=curr_smpl['Дата'].min(),
-                                   max_date=curr_smpl['Дата'].max())
-        except Exception as e:
-            logger.warning(f"Failed to get FX rates for {curr_name} to {to_curr}: {e}")
+        if usd_rates is not None:
+            curr_rates = _cross_rates(usd_rates, curr_name, to_curr, curr_dates.min(), curr_dates.max())
 
         fallback_rate = get_fallback_rate(curr_name, to_curr)
         if use_current_rate:
-            latest_rate = _latest_rate(curr_rates, ticker)
+            latest_rate = _latest_rate(curr_rates)
             rate_to_apply = latest_rate if latest_rate is not None else fallback_rate
             if rate_to_apply is None:
                 logger.warning(f"No FX rate available for {curr_name} to {to_curr}, skipping conversion")
                 continue
             if latest_rate is None and fallback_rate is not None:
                 logger.warning(f"Using fallback rate for {curr_name} to {to_curr}: {fallback_rate}")
-            curr_smpl[target_col] = curr_smpl[target_col] * rate_to_apply
+            row_rates[curr_mask] = rate_to_apply
         else:
-            if curr_rates is not None and not curr_rates.empty and ticker in curr_rates.columns:
-                curr_smpl = (curr_smpl.merge(curr_rates.reset_index().rename(columns={"index": "Дата",
-                                                                                    "Date": "Дата"},
-                                                                            errors='ignore'),
-                                            on='Дата', how='left'))
+            if curr_rates is not None and not curr_rates.empty:
+                rates = curr_rates.reindex(curr_dates.dt.normalize()).to_numpy()
                 if fallback_rate is not None:
-                    curr_smpl[ticker] = curr_smpl[ticker].fillna(fallback_rate)
-                if curr_smpl[ticker].isna().any():
+                    rates = np.where(np.isnan(rates), fallback_rate, rates)
+                if np.isnan(rates).any():
                     logger.warning(f"No FX rate available for {curr_name} to {to_curr}, skipping conversion")
                     continue
-                curr_smpl[target_col] = curr_smpl[target_col] * curr_smpl[ticker]
-                curr_smpl.drop(ticker, axis=1, inplace=True)
+                row_rates[curr_mask] = rates
             elif fallback_rate is not None:
                 logger.warning(f"Using fallback rate for {curr_name} to {to_curr}: {fallback_rate}")
-                curr_smpl[target_col] = curr_smpl[target_col] * fallback_rate
+                row_rates[curr_mask] = fallback_rate
             else:
                 logger.warning(f"No FX rate available for {curr_name} to {to_curr}, skipping conversion")
                 continue
-        
-        curr_smpl['Валюта'] = to_curr
-        curr_smpl.index = smpl_index
-        df_to_convert.loc[df_to_convert['Валюта'] == curr_name] = curr_smpl
-            
+
+    converted = ~np.isnan(row_rates)
+    if converted.any():
+        df_to_convert.loc[converted, target_col] = df_to_convert.loc[converted, target_col].to_numpy() * row_rates[converted]
+        df_to_convert.loc[converted, 'Валюта'] = to_curr
     return df_to_convert.round(2)
 
 
-def _latest_rate(rates: pd.DataFrame | None, ticker: str):
+def _cross_rates(usd_rates: pd.DataFrame, from_curr: str, to_curr: str, min_date, max_date) -> pd.Series:
+    """
+    Daily from/to cross rate over [min_date, max_date] taken from a wider USD rate matrix.
+    A leg without any cached rate up to `max_date` stays empty, as a window-only lookup would.
+    """
+    window = usd_rates.loc[pd.Timestamp(min_date).normalize():pd.Timestamp(max_date).normalize()]
+    from_usd, to_usd = window[from_curr], window[to_curr]
+    known_from, known_to = ~np.isnan(get_usd_rates_as_of([from_curr, to_curr], [max_date, max_date]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = (from_usd * (1.0 if known_from else np.nan)) / (to_usd * (1.0 if known_to else np.nan))
+    return rates.replace([np.inf, -np.inf], np.nan).ffill().bfill()
+
+
+@timed()
+def get_transactions_in_currency(currency: str) -> pd.DataFrame:
+    """
+    Return the ledger with `Значение` converted to `currency` at each operation's date.
+    Values come from the materialized ledger, so switching currencies does not re-convert.
+    """
+    currency = str(currency).upper()
+    ledger, unconverted = _get_converted_ledger_cached(str(config.active_data_path()))
+    transactions_df = ledger.drop(columns=[converted_value_column(curr) for curr in config.UNIQUE_TICKERS])
+    if config.DEBUG or ledger.empty:
+        return transactions_df
+
+    transactions_df['Значение'] = ledger[converted_value_column(currency)]
+    transactions_df['Валюта'] = transactions_df['Валюта'].where(
+        transactions_df['Валюта'].isin(unconverted[currency]), currency)
+    return transactions_df
+
+
+def converted_value_column(currency: str) -> str:
+    return f'Значение_{currency}'
+
+
+@versioned_cache('transactions_info', 'rates', node='ledger')
+def _get_converted_ledger_cached(data_root: str) -> tuple[pd.DataFrame, dict[str, set]]:
+    """
+    Ledger with one converted-value column per report currency, plus the source
+    currencies each report currency had no rate for and so left unconverted.
+    """
+    transactions_df = get_transactions()
+    unconverted = {currency: set() for currency in config.UNIQUE_TICKERS}
+    if transactions_df.empty or config.DEBUG:
+        ledger = transactions_df.assign(**{converted_value_column(curr): np.nan for curr in config.UNIQUE_TICKERS})
+        return ledger, unconverted
+
+    ledger = transactions_df.round(2)
+    for currency in config.UNIQUE_TICKERS:
+        converted = convert_transaction(transactions_df, to_curr=currency, target_col='Значение')
+        ledger[converted_value_column(currency)] = converted['Значение']
+        unconverted[currency] = set(converted['Валюта'].unique()) - {currency}
+    return ledger, unconverted
+
+
+def clear_ledger_cache():
+    _get_converted_ledger_cached.cache_clear()
+
+
+def _latest_rate(rates: pd.Series | None):
     if rates is None or rates.empty:
         return None
-    if ticker in rates.columns:
-        values = pd.to_numeric(rates[ticker], errors='coerce').dropna()
-    else:
-        values = pd.to_numeric(rates.stack(), errors='coerce').dropna()
+    values = pd.to_numeric(rates, errors='coerce').dropna()
     if values.empty:
         return None
     return float(values.iloc[-1])
@@ -0,0 +1,212 @@
+"""
+Recorded provider responses for offline tests and benchmarks.
+
+The FX providers (yfinance, CBR XML) and the crypto JSON-RPC endpoints only answer on
+the live network, so their latency, concurrency and retry paths cannot be measured here.
+This module serves recorded responses from a fixture directory (FINREP_REPLAY_DIR)
+instead, with a configurable latency per response and a failure rate:
+
+    cbr/<VAL_NM_RQ>.xml    CBR XML_dynamic answer, trimmed to the requested dates
+    yfinance/<ticker>.csv  Date and Close columns, served as a yf.download frame
+    rpc/<chain>.json       {"balances": {address: hex}, "tokens": {contract: {address: hex}},
+                            "errors": {address: message}} for EVM JSON-RPC batches
+
+The FX providers `replay-yfinance` and `replay-cbr` run the normal provider code on these
+responses and are selected through config.FX_PROVIDER_ORDER. Crypto refreshes use them
+through `replay://<chain>` URLs in crypto.EVM_RPC_URLS.
+"""
+
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from xml.etree import ElementTree as ET
+
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from src import config
+
+SCHEME = "replay://"
+
+
+class ReplayFailure(requests.ConnectionError):
+    """
+    Injected failure of a replayed request; callers see it as a connection error.
+    """
+
+
+@dataclass(frozen=True)
+class ReplaySettings:
+    path: Path
+    latency: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 0
+
+
+_LOCK = threading.Lock()
+_SETTINGS = ReplaySettings(Path(config.REPLAY_PATH), config.REPLAY_LATENCY_MS / 1000, config.REPLAY_FAILURE_RATE)
+_RANDOM = random.Random(_SETTINGS.seed)
+_STATS = {"requests": 0, "failures": 0}
+
+
+def configure(**changes) -> ReplaySettings:
+    """
+    Replace fields of the replay settings, reseed failure injection and reset the stats.
+    Returns the previous settings.
+    """
+    global _SETTINGS, _RANDOM
+    with _LOCK:
+        previous = _SETTINGS
+        if "path" in changes:
+            changes["path"] = Path(changes["path"])
+        _SETTINGS = replace(previous, **changes)
+        _RANDOM = random.Random(_SETTINGS.seed)
+        _STATS.update(requests=0, failures=0)
+    return previous
+
+
+def settings() -> ReplaySettings:
+    return _SETTINGS
+
+
+def stats() -> dict[str, int]:
+    """
+    Replayed requests and injected failures since the last `configure`.
+    """
+    with _LOCK:
+        return dict(_STATS)
+
+
+def session() -> requests.Session:
+    """
+    A requests session whose HTTP(S) and replay:// requests are answered from fixtures.
+    """
+    replay_session = requests.Session()
+    adapter = ReplayAdapter()
+    for prefix in ("https://", "http://", SCHEME):
+        replay_session.mount(prefix, adapter)
+    return replay_session
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter for recorded CBR XML and EVM JSON-RPC responses.
+    """
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        _simulate_network()
+        url = urlsplit(request.url)
+        if url.netloc == "www.cbr.ru" and url.path.endswith("XML_dynamic.asp"):
+            body = _cbr_response(parse_qs(url.query))
+            return _response(request, 200 if body is not None else 404, body or b"", "application/xml")
+        if request.url.startswith(SCHEME):
+            body = _rpc_response(url.netloc, json.loads(request.body))
+            return _response(request, 200 if body is not None else 404, body or b"", "application/json")
+        return _response(request, 404, b"", "text/plain")
+
+    def close(self):
+        pass
+
+
+def yf_download(tickers, start=None, end=None, period=None, **kwargs) -> pd.DataFrame:
+    """
+    Stand-in for yf.download: recorded closes of `tickers` in [start, end), or the last
+    rows for `period`, as a (Price, Ticker) column frame. Unknown tickers are NaN columns.
+    """
+    _simulate_network()
+    names = [tickers] if isinstance(tickers, str) else list(tickers)
+    closes = {}
+    for ticker in names:
+        path = _SETTINGS.path / "yfinance" / f"{ticker}.csv"
+        if path.exists():
+            recorded = pd.read_csv(path, parse_dates=["Date"]).set_index("Date")["Close"]
+            closes[ticker] = recorded.sort_index()
+        else:
+            closes[ticker] = pd.Series(dtype=float)
+
+    frame = pd.DataFrame(closes)
+    frame.index = pd.DatetimeIndex(frame.index, name="Date")
+    if period:
+        frame = frame.tail(int(str(period).rstrip("d")))
+    else:
+        if start is not None:
+            frame = frame[frame.index >= pd.Timestamp(start)]
+        if end is not None:
+            frame = frame[frame.index < pd.Timestamp(end)]
+    frame.columns = pd.MultiIndex.from_product([["Close"], names], names=["Price", "Ticker"])
+    return frame
+
+
+def _simulate_network():
+    with _LOCK:
+        _STATS["requests"] += 1
+        failed = _RANDOM.random() < _SETTINGS.failure_rate
+        if failed:
+            _STATS["failures"] += 1
+        latency = _SETTINGS.latency
+    if latency > 0:
+        time.sleep(latency)
+    if failed:
+        raise ReplayFailure("replay: injected failure")
+
+
+def _cbr_response(query: dict) -> bytes | None:
+    val_id = query.get("VAL_NM_RQ", [""])[0]
+    path = _SETTINGS.path / "cbr" / f"{val_id}.xml"
+    if not val_id or not path.exists():
+        return None
+    start = pd.to_datetime(query.get("date_req1", [""])[0], format="%d/%m/%Y", errors="coerce")
+    end = pd.to_datetime(query.get("date_req2", [""])[0], format="%d/%m/%Y", errors="coerce")
+    root = ET.parse(path).getroot()
+    for record in list(root.findall("Record")):
+        date = pd.to_datetime(record.get("Date"), format="%d.%m.%Y", errors="coerce")
+        if pd.isna(date) or (pd.notna(start) and date < start) or (pd.notna(end) and date > end):
+            root.remove(record)
+    return ET.tostring(root, encoding="windows-1251")
+
+
+def _rpc_response(chain: str, payload) -> bytes | None:
+    path = _SETTINGS.path / "rpc" / f"{chain}.json"
+    if not path.exists():
+        return None
+    recorded = json.loads(path.read_text(encoding="utf-8"))
+    calls = payload if isinstance(payload, list) else [payload]
+    replies = [_rpc_reply(recorded, call) for call in calls]
+    return json.dumps(replies if isinstance(payload, list) else replies[0]).encode("utf-8")
+
+
+def _rpc_reply(recorded: dict, call: dict) -> dict:
+    method, params = call.get("method"), call.get("params") or []
+    if method == "eth_getBalance":
+        address, values = str(params[0]).lower(), recorded.get("balances", {})
+    elif method == "eth_call":
+        address = "0x" + str(params[0].get("data", ""))[-40:].lower()
+        values = _lower_keys(recorded.get("tokens", {})).get(str(params[0].get("to", "")).lower(), {})
+    else:
+        return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": f"method {method} not recorded"}}
+
+    errors = _lower_keys(recorded.get("errors", {}))
+    if address in errors:
+        return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32000, "message": errors[address]}}
+    return {"jsonrpc": "2.0", "id": call.get("id"), "result": _lower_keys(values).get(address, "0x0")}
+
+
+def _lower_keys(values: dict) -> dict:
+    return {str(key).lower(): value for key, value in values.items()}
+
+
+def _response(request, status: int, body: bytes, content_type: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers = CaseInsensitiveDict({"Content-Type": content_type, "Content-Length": str(len(body))})
+    response.url = request.url
+    response.request = request
+    response.reason = "OK" if status == 200 else "Not Found"
+    return response
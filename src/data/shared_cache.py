@@ -0,0 +1,164 @@
+"""
+Host-wide second level for the table cache.
+
+Gunicorn workers are separate processes, so each used to parse and convert the same
+tables. With FINREP_SHARED_CACHE=1 computed tables are also stored in a SQLite file
+under the cache directory, keyed by call and stamped with the source version token.
+A worker that misses its in-process cache reads the shared entry for the current
+version, or computes it while holding a file lock for its key so the other workers
+wait for the result instead of repeating the work. Keys share LOCK_STRIPES lock files
+next to the database, so the number of lock files stays fixed. A thread holds at most
+one stripe: cached tables built inside another build run without a lock of their own,
+since a second stripe could be the one already held or be taken in the opposite order
+by another worker.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Builds of keys in different stripes run in parallel; a collision only makes one wait.
+LOCK_STRIPES = 16
+
+_LOCAL = threading.local()
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL
+)
+"""
+
+
+def load_or_build(function: str, call_key: tuple, version: tuple, build: Callable):
+    """
+    Return the shared value of `call_key` at `version`, building and storing it on a miss.
+    Returns (value, hit).
+    """
+    if not config.SHARED_CACHE_ENABLED:
+        return build(), False
+
+    key = _digest(call_key)
+    version_key = _digest(version)
+    value, hit = _get(key, version_key)
+    if hit:
+        return value, True
+
+    with _key_lock(key):
+        # Another worker may have built it while this one waited for the lock.
+        value, hit = _get(key, version_key)
+        if hit:
+            return value, True
+        value = build()
+        _put(key, function, version_key, value)
+    return value, False
+
+
+def delete(functions: list[str]) -> None:
+    """
+    Drop shared entries of `functions` (module.qualname) for every worker.
+    """
+    if not config.SHARED_CACHE_ENABLED or not functions:
+        return
+    try:
+        _connection().executemany("DELETE FROM tables WHERE function = ?", [(name,) for name in functions])
+    except (sqlite3.Error, OSError) as exc:
+        logger.warning("Could not invalidate shared table cache: %s", exc)
+
+
+def clear() -> None:
+    if not config.SHARED_CACHE_ENABLED:
+        return
+    try:
+        _connection().execute("DELETE FROM tables")
+    except (sqlite3.Error, OSError) as exc:
+        logger.warning("Could not clear shared table cache: %s", exc)
+
+
+def database_path() -> Path:
+    return config.cache_path("tables.sqlite")
+
+
+def _get(key: str, version_key: str):
+    try:
+        row = _connection().execute("SELECT version, value FROM tables WHERE key = ?", (key,)).fetchone()
+    except (sqlite3.Error, OSError) as exc:
+        logger.warning("Could not read shared table cache: %s", exc)
+        return None, False
+    if row is None or row[0] != version_key:
+        return None, False
+    try:
+        return pickle.loads(row[1]), True
+    except Exception as exc:
+        logger.warning("Could not load shared table cache entry: %s", exc)
+        return None, False
+
+
+def _put(key: str, function: str, version_key: str, value) -> None:
+    try:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        _connection().execute(
+            "INSERT OR REPLACE INTO tables (key, function, version, value) VALUES (?, ?, ?, ?)",
+            (key, function, version_key, payload),
+        )
+    except (sqlite3.Error, OSError, pickle.PicklingError, TypeError) as exc:
+        logger.warning("Could not write shared table cache: %s", exc)
+
+
+def _connection() -> sqlite3.Connection:
+    # One connection per thread and process; gunicorn forks workers after import.
+    path = database_path()
+    cached = getattr(_LOCAL, "connection", None)
+    if cached is not None and cached[0] == (os.getpid(), path):
+        return cached[1]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(_SCHEMA)
+    _LOCAL.connection = ((os.getpid(), path), connection)
+    return connection
+
+
+@contextmanager
+def _key_lock(key: str):
+    if fcntl is None or getattr(_LOCAL, "locked", False):
+        yield
+        return
+    path = database_path()
+    stripe = int(key[:8], 16) % LOCK_STRIPES
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(path.with_name(f"{path.name}.{stripe}.lock"), "a+b")
+    except OSError as exc:
+        logger.warning("Could not lock shared table cache entry: %s", exc)
+        yield
+        return
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _LOCAL.locked = True
+        yield
+    finally:
+        _LOCAL.locked = False
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
@@ -0,0 +1,220 @@
+"""
+Optional on-disk snapshots of parsed source frames.
+
+CSV files stay the source of truth: a snapshot is reused only while the manifest of
+source file hashes still matches, otherwise it is rebuilt from the CSVs. The hashes are
+taken before the rebuild, and a snapshot whose sources changed while it was built is
+not written. Snapshot and manifest are replaced together under an exclusive file lock
+and read under a shared one, so a reader never pairs one worker's snapshot with
+another worker's manifest.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+try:
+    from pyarrow import feather as _feather
+except ImportError:  # pragma: no cover - depends on the environment
+    _feather = None
+
+SNAPSHOT_FORMAT = "feather" if _feather is not None else "pickle"
+
+
+def cached_frame(kind: str, source_root: str, source_paths: list[str], build: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Return the snapshot of `kind` built from `source_paths`, rebuilding it when stale.
+    """
+    if not config.SNAPSHOT_CACHE_ENABLED:
+        return build()
+
+    snapshot_path, manifest_path = _snapshot_paths(kind, source_root)
+    with _snapshot_lock(snapshot_path, shared=True):
+        data = _read_current_snapshot(kind, snapshot_path, manifest_path, source_paths)
+    if data is not None:
+        return data
+
+    try:
+        files = {path: _file_entry(path) for path in source_paths}
+    except OSError:
+        files = None
+    data = build()
+    if files is None or _sources_changed(files):
+        logger.info("Sources of the %s snapshot changed while it was built; not writing it", kind)
+        return data
+    try:
+        with _snapshot_lock(snapshot_path):
+            _write_snapshot(snapshot_path, manifest_path, data, files)
+    except Exception as exc:
+        logger.warning("Could not write %s snapshot %s: %s", kind, snapshot_path, exc)
+    return data
+
+
+def _read_current_snapshot(kind: str, snapshot_path: Path, manifest_path: Path,
+                           source_paths: list[str]) -> pd.DataFrame | None:
+    manifest = _read_manifest(manifest_path)
+    if manifest is None or not snapshot_path.exists():
+        return None
+    current_files = _current_manifest_files(source_paths, manifest.get("files", {}))
+    if current_files is None:
+        return None
+    try:
+        data = _read_snapshot(snapshot_path, manifest)
+    except Exception as exc:
+        logger.warning("Could not read %s snapshot %s: %s", kind, snapshot_path, exc)
+        return None
+    if current_files != manifest["files"]:
+        _write_manifest(manifest_path, {**manifest, "files": current_files})
+    return data
+
+
+def _snapshot_paths(kind: str, source_root: str) -> tuple[Path, Path]:
+    root_key = hashlib.sha1(str(source_root).encode("utf-8")).hexdigest()[:12]
+    cache_dir = config.cache_path()
+    extension = "feather" if SNAPSHOT_FORMAT == "feather" else "pkl"
+    return cache_dir / f"{kind}-{root_key}.{extension}", cache_dir / f"{kind}-{root_key}.manifest.json"
+
+
+def _file_entry(path: str, with_hash: bool = True) -> dict:
+    stat = os.stat(path)
+    entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if with_hash:
+        entry["sha1"] = _file_hash(path)
+    return entry
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sources_changed(files: dict) -> bool:
+    for path, known in files.items():
+        try:
+            entry = _file_entry(path, with_hash=False)
+        except OSError:
+            return True
+        if (entry["mtime_ns"], entry["size"]) != (known["mtime_ns"], known["size"]):
+            return True
+    return False
+
+
+def _current_manifest_files(source_paths: list[str], manifest_files: dict) -> dict | None:
+    """
+    Return refreshed manifest entries when every source still matches, otherwise None.
+    Files are hashed only when their (mtime, size) changed.
+    """
+    if set(source_paths) != set(manifest_files):
+        return None
+    current = {}
+    for path in source_paths:
+        try:
+            entry = _file_entry(path, with_hash=False)
+        except OSError:
+            return None
+        known = manifest_files[path]
+        if entry["mtime_ns"] == known.get("mtime_ns") and entry["size"] == known.get("size"):
+            current[path] = known
+            continue
+        if entry["size"] != known.get("size") or _file_hash(path) != known.get("sha1"):
+            return None
+        current[path] = {**entry, "sha1": known.get("sha1")}
+    return current
+
+
+def _read_manifest(manifest_path: Path) -> dict | None:
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+
+def _write_manifest(manifest_path: Path, manifest: dict) -> None:
+    _replace_file(manifest_path, lambda tmp_path: tmp_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8"))
+
+
+def _read_snapshot(snapshot_path: Path, manifest: dict) -> pd.DataFrame:
+    if SNAPSHOT_FORMAT == "feather":
+        data = _feather.read_table(snapshot_path, memory_map=True).to_pandas()
+        # Arrow stores missing strings as None; the CSV loaders produce NaN.
+        for column in manifest.get("object_columns", []):
+            data[column] = data[column].where(data[column].notna(), np.nan)
+        return data
+    return pd.read_pickle(snapshot_path)
+
+
+def _write_snapshot(snapshot_path: Path, manifest_path: Path, data: pd.DataFrame, files: dict) -> None:
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "files": files,
+        "object_columns": [str(column) for column in data.columns if data[column].dtype == object],
+    }
+    if SNAPSHOT_FORMAT == "feather":
+        _replace_file(snapshot_path, lambda tmp_path: _feather.write_feather(data.reset_index(drop=True), tmp_path))
+    else:
+        _replace_file(snapshot_path, data.to_pickle)
+    _write_manifest(manifest_path, manifest)
+
+
+def _replace_file(path: Path, write: Callable[[Path], None]) -> None:
+    """
+    Write `path` through a temporary file of its own in the same directory and rename it
+    into place, so workers writing the same snapshot never share a temporary file.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(Path(tmp_name))
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def _snapshot_lock(snapshot_path: Path, shared: bool = False):
+    """
+    Host-wide lock of one snapshot and its manifest: writers exclusive, readers shared.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(snapshot_path.with_name(f"{snapshot_path.name}.lock"), "a+b")
+    except OSError as exc:
+        logger.warning("Could not lock snapshot %s: %s", snapshot_path, exc)
+        yield
+        return
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
@@ -0,0 +1,222 @@
+"""
+Process metrics in the Prometheus text format, served at /metrics by the dashboard.
+
+Counters and histograms are kept in this process; table cache statistics and process
+memory are read when the endpoint is scraped. With several
+gunicorn workers every worker reports its own values, so scrape them per worker or sum
+them in Prometheus.
+"""
+
+import inspect
+import os
+import resource
+import sys
+import threading
+import time
+from functools import wraps
+
+# Seconds; dashboard renders range from cache hits to multi-second cold builds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_LOCK = threading.Lock()
+_METRICS: list = []
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name, self.documentation, self.labels = name, documentation, labels
+        self._values: dict[tuple, float] = {}
+        _METRICS.append(self)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with _LOCK:
+            return self._values.get(tuple(str(labels[label]) for label in self.labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with _LOCK:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labels, self.buckets = name, documentation, labels, tuple(buckets)
+        # labels -> (count per bucket, sum, count)
+        self._values: dict[tuple, list] = {}
+        _METRICS.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        with _LOCK:
+            counts = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][index] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    def count(self, **labels) -> int:
+        with _LOCK:
+            counts = self._values.get(tuple(str(labels[label]) for label in self.labels))
+            return counts[2] if counts else 0
+
+    def samples(self) -> list[str]:
+        with _LOCK:
+            values = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._values.items()}
+        lines = []
+        for key, (buckets, total, count) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, buckets):
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (_number(bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+CALLBACK_SECONDS = Histogram(
+    "finrep_callback_duration_seconds", "Duration of dashboard callbacks by report tab.", ("callback", "tab"))
+PROVIDER_REQUESTS = Counter(
+    "finrep_provider_requests_total", "Requests to FX and crypto providers.", ("kind", "provider"))
+PROVIDER_ERRORS = Counter(
+    "finrep_provider_errors_total", "Failed requests to FX and crypto providers.", ("kind", "provider"))
+PROVIDER_SECONDS = Histogram(
+    "finrep_provider_request_duration_seconds", "Duration of requests to FX and crypto providers.", ("kind", "provider"))
+
+
+def observe_tab_callback(func):
+    """
+    Record the duration of every call of a Dash callback with an `active_tab` argument
+    in CALLBACK_SECONDS.
+    """
+    tab_index = list(inspect.signature(func).parameters).index("active_tab")
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        tab = kwargs["active_tab"] if "active_tab" in kwargs else args[tab_index] if len(args) > tab_index else None
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            CALLBACK_SECONDS.observe(time.perf_counter() - started, callback=func.__name__, tab=tab or "main")
+
+    return wrapper
+
+
+def provider_request(kind: str, provider: str):
+    """
+    Context manager counting and timing one provider request; an exception leaving the
+    block, or calling `failed()` on the entered value, counts as an error.
+    """
+    return _ProviderRequest(kind, provider)
+
+
+class _ProviderRequest:
+    __slots__ = ("kind", "provider", "started", "error")
+
+    def __init__(self, kind: str, provider: str):
+        self.kind, self.provider, self.error = kind, provider, False
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def failed(self) -> None:
+        self.error = True
+
+    def __exit__(self, exc_type, exc, traceback):
+        labels = {"kind": self.kind, "provider": self.provider}
+        PROVIDER_SECONDS.observe(time.perf_counter() - self.started, **labels)
+        PROVIDER_REQUESTS.inc(**labels)
+        if exc_type is not None or self.error:
+            PROVIDER_ERRORS.inc(**labels)
+        return False
+
+
+def render() -> str:
+    """
+    Every metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in _METRICS:
+        lines += [f"# HELP {metric.name} {metric.documentation}", f"# TYPE {metric.name} {metric.kind}"]
+        lines += metric.samples()
+    lines += _cache_samples()
+    lines += _process_samples()
+    return "\n".join(lines) + "\n"
+
+
+def _cache_samples() -> list[str]:
+    from src.data import cache
+
+    totals = cache.cache_stats()
+    functions = cache.function_stats()
+    lines = []
+    for name, kind, documentation in (
+        ("hits", "counter", "Table cache hits in this process."),
+        ("shared_hits", "counter", "Table cache misses served from the shared cache."),
+        ("misses", "counter", "Table cache misses that rebuilt the value."),
+        ("entries", "gauge", "Entries in the table cache."),
+        ("bytes", "gauge", "Estimated size of the table cache entries."),
+    ):
+        metric = f"finrep_cache_{name}_total" if kind == "counter" else f"finrep_cache_{name}"
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        lines += [f"{metric}{_labels(('function',), (function,))} {stats[name]}"
+                  for function, stats in sorted(functions.items())]
+    lines += [
+        "# HELP finrep_cache_evictions_total Table cache entries evicted over the byte budget.",
+        "# TYPE finrep_cache_evictions_total counter",
+        f"finrep_cache_evictions_total {totals['evictions']}",
+        "# HELP finrep_cache_max_bytes Byte budget of the table cache.",
+        "# TYPE finrep_cache_max_bytes gauge",
+        f"finrep_cache_max_bytes {totals['max_bytes']}",
+    ]
+    return lines
+
+
+def _process_samples() -> list[str]:
+    lines = []
+    rss = resident_memory_bytes()
+    if rss is not None:
+        lines += ["# HELP process_resident_memory_bytes Resident memory size in bytes.",
+                  "# TYPE process_resident_memory_bytes gauge",
+                  f"process_resident_memory_bytes {rss}"]
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lines += ["# HELP process_max_resident_memory_bytes Peak resident memory size in bytes.",
+              "# TYPE process_max_resident_memory_bytes gauge",
+              f"process_max_resident_memory_bytes {max_rss if sys.platform == 'darwin' else max_rss * 1024}"]
+    return lines
+
+
+def resident_memory_bytes() -> int | None:
+    """
+    Current resident set size from /proc; None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
@@ -1,15 +1,17 @@
 import numpy as np
 import pandas as pd
-from functools import lru_cache
 
 from src import config
+from src.data.cache import versioned_cache
 from src.data.get import get_investments, get_transactions, get_assets
 from src.data.debts import active_debt_balances
 from src.data.investment_calculations import current_investment_value
-from src.data.get_finance import get_actual_rates, get_act_moex, get_fallback_rate, get_fx_rates
-from src.data.proccess import convert_transaction
+from src.data.get_finance import convert_as_of, get_actual_rates, get_act_moex
+from src.data.proccess import clear_ledger_cache, get_transactions_in_currency
+from src.timing import timed
 
 
+@timed()
 def create_invest_tbl() -> (pd.DataFrame, pd.DataFrame):
     """
     Create PNL of investments
@@ -91,31 +93,26 @@ def create_invest_tbl() -> (pd.DataFrame, pd.DataFrame):
     return buy_df, sell_df
 
 
+@timed()
 def get_balance_by_month(currency: str) -> pd.DataFrame:
-    return _get_balance_by_month_cached(str(config.active_data_path()), str(currency).upper()).copy(deep=True)
+    data_root, currency = str(config.active_data_path()), str(currency).upper()
+    return _with_investment_value(_get_balance_by_month_cached(data_root, currency), data_root, currency,
+                                  ['Капитал по активам', 'Валютная переоценка', 'Расхождение с активами'])
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('transactions_info', 'rates', 'assets_info', node='balance')
 def _get_balance_by_month_cached(data_root: str, currency: str) -> pd.DataFrame:
     """
     Get PNL of all transactions
     :param currency: ticker of currency
     :return:
     """
-    transactions_df = get_transactions()
-    # buy_df, sell_df = create_invest_tbl()и
-
-    # Convert every transaction at its own historical date. This keeps past reports
+    # Every transaction is converted at its own historical date. This keeps past reports
     # stable when current FX rates move.
-    if not config.DEBUG:
-        transactions_df = convert_transaction(
-            df_to_convert=transactions_df,
-            to_curr=currency,
-            target_col='Значение',
-            use_current_rate=False,
-        )
-        # buy_df = convert_transaction(buy_df, to_curr=currency, target_col='Сумма')
-        # sell_df = convert_transaction(sell_df, to_curr=currency, target_col='Прибыль/убыток')
+    transactions_df = get_transactions_in_currency(currency)
+    # buy_df, sell_df = create_invest_tbl()и
+    # buy_df = convert_transaction(buy_df, to_curr=currency, target_col='Сумма')
+    # sell_df = convert_transaction(sell_df, to_curr=currency, target_col='Прибыль/убыток')
 
     all_stats_df = (transactions_df[transactions_df.Категория.isin(config.NOT_COST_COLS)]
                     .pivot_table(values='Значение', index=['Дата'], columns=['Категория'], aggfunc=np.sum)
@@ -157,20 +154,22 @@ def _get_balance_by_month_cached(data_root: str, currency: str) -> pd.DataFrame:
     return all_stats_df
 
 
+@timed()
 def get_act_receivables(currency: str | None = None):
-    return _get_act_receivables_cached(str(config.active_data_path()), _normalize_currency_arg(currency)).copy(deep=True)
+    return _get_act_receivables_cached(str(config.active_data_path()), _normalize_currency_arg(currency))
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('debts', 'rates', node='debts')
 def _get_act_receivables_cached(data_root: str, currency: str | None):
     return _ledger_debt_balance("receivable", "Дебиторская задолженность", currency)
 
 
+@timed()
 def get_act_liabilities(currency: str | None = None):
-    return _get_act_liabilities_cached(str(config.active_data_path()), _normalize_currency_arg(currency)).copy(deep=True)
+    return _get_act_liabilities_cached(str(config.active_data_path()), _normalize_currency_arg(currency))
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('debts', 'rates', node='debts')
 def _get_act_liabilities_cached(data_root: str, currency: str | None):
     return _ledger_debt_balance("liability", "Кредиторская задолженность", currency)
 
@@ -243,7 +242,7 @@ def _get_active_debt_balance(
     payment_column: str,
     currency: str | None,
 ) -> pd.DataFrame:
-    transactions_df = get_transactions()
+    transactions_df = get_transactions() if currency is None else get_transactions_in_currency(currency)
     columns = ['Дата', 'Значение', 'Валюта', 'Комментарий']
 
     debt_df = (transactions_df[(transactions_df['Категория'] == debt_category) &
@@ -255,10 +254,6 @@ def _get_active_debt_balance(
                   [columns]
                   .sort_values('Дата'))
 
-    if currency is not None:
-        debt_df = _convert_debt_transactions(debt_df, currency)
-        payment_df = _convert_debt_transactions(payment_df, currency)
-
     result = pd.concat(
         [
             debt_df.groupby('Комментарий')['Значение'].sum().rename(result_column),
@@ -275,22 +270,14 @@ def _get_active_debt_balance(
     return result.reset_index()
 
 
-def _convert_debt_transactions(data: pd.DataFrame, currency: str) -> pd.DataFrame:
-    if data.empty:
-        return data.copy(deep=True)
-    return convert_transaction(
-        df_to_convert=data.copy(deep=True),
-        to_curr=currency,
-        target_col='Значение',
-        use_current_rate=False,
-    )
-
-
+@timed()
 def get_asset_capital_by_month(currency: str) -> pd.DataFrame:
-    return _get_asset_capital_by_month_cached(str(config.active_data_path()), str(currency).upper()).copy(deep=True)
+    data_root, currency = str(config.active_data_path()), str(currency).upper()
+    return _with_investment_value(_get_asset_capital_by_month_cached(data_root, currency), data_root, currency,
+                                  ['Капитал по активам'])
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('assets_info', 'rates', node='asset_capital')
 def _get_asset_capital_by_month_cached(data_root: str, currency: str) -> pd.DataFrame:
     assets_df = get_assets()
     if assets_df.empty:
@@ -307,22 +294,46 @@ def _get_asset_capital_by_month_cached(data_root: str, currency: str) -> pd.Data
         .rename('Капитал по активам')
         .to_frame()
     )
-    if not result.empty:
-        investment_value = current_investment_value(currency)
-        if investment_value:
-            result.loc[result.index.max(), 'Капитал по активам'] += investment_value
     return result.round(2)
 
 
+@versioned_cache('investments', 'rates', node='portfolio')
+def _get_investment_value_cached(data_root: str, currency: str) -> float:
+    return current_investment_value(currency)
+
+
+def _with_investment_value(table: pd.DataFrame, data_root: str, currency: str, columns: list[str]) -> pd.DataFrame:
+    """
+    Add the current portfolio value to the latest asset snapshot row. It is applied on
+    read so a crypto or price refresh does not invalidate the cached tables.
+    """
+    investment_value = _get_investment_value_cached(data_root, currency)
+    asset_capital = _get_asset_capital_by_month_cached(data_root, currency)
+    if not investment_value or asset_capital.empty or asset_capital.index.max() not in table.index:
+        return table
+
+    row = table.index.get_loc(asset_capital.index.max())
+    latest_capital = table['Капитал по активам'].iloc[row]
+    delta = round(latest_capital + investment_value, 2) - latest_capital
+    table = table.copy(deep=False)
+    for column in columns:
+        values = table[column].to_numpy(dtype=float, copy=True)
+        values[row] += delta
+        table[column] = values
+    return table
+
+
+@timed()
 def get_cost_distribution(currency, year, month=None):
     year_key = _as_tuple(year)
     month_key = None if month is None else _as_month_tuple(month)
-    return _get_cost_distribution_cached(str(config.active_data_path()), str(currency).upper(), year_key, month_key).copy(deep=True)
+    return _get_cost_distribution_cached(str(config.active_data_path()), str(currency).upper(), year_key, month_key)
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('transactions_info', 'rates', node='cost_distribution')
 def _get_cost_distribution_cached(data_root, currency, year_key, month_key=None):
-    transactions_df = get_transactions()
+    # Transactions are already in the chosen currency
+    transactions_df = get_transactions_in_currency(currency)
 
     # Get transaction sample by chosen year
     if month_key is None:
@@ -332,10 +343,6 @@ def _get_cost_distribution_cached(data_root, currency, year_key, month_key=None)
                                      (transactions_df['Месяц'].isin(list(month_key)))
                                      ].reset_index(drop=True)
 
-    # Convert transactions to chosen currency
-    if not config.DEBUG:
-        smpl_tr_df = convert_transaction(df_to_convert=smpl_tr_df, to_curr=currency, target_col='Значение')
-
     # Find cost categories
     cost_categories = [x for x in smpl_tr_df.Категория.unique() if x not in config.NOT_COST_COLS]
 
@@ -364,6 +371,7 @@ def _get_cost_distribution_cached(data_root, currency, year_key, month_key=None)
     return cost_stats_df
 
 
+@timed()
 def get_assets_by_currencies(year, month) -> pd.DataFrame:
     """
     function to create table with assets distribution by currencies
@@ -433,32 +441,24 @@ def get_assets_by_currencies(year, month) -> pd.DataFrame:
     return gr_asset_df_.reset_index().round(2)
 
 
+@timed()
 def get_month_transactions(currency, year, month):
     return _get_month_transactions_cached(
         str(config.active_data_path()),
         str(currency).upper(),
         str(year),
         str(int(month)) if str(month).isdigit() else str(month),
-    ).copy(deep=True)
+    )
 
 
-@lru_cache(maxsize=None)
+@versioned_cache('transactions_info', 'rates', node='month_transactions')
 def _get_month_transactions_cached(data_root, currency, year, month):
-    transactions_df = get_transactions()
+    # Приводим валюты по историческому курсу даты операции.
+    transactions_df = get_transactions_in_currency(currency)
     smpl_tr_df = transactions_df[(transactions_df['Год'].isin(list(np.array(year).flat))) &
                                  (transactions_df['Месяц'].isin(list(np.array(month).astype(int).astype(str).flat)))
                                  ].reset_index(drop=True)
 
-    # Приводим валюты по историческому курсу даты операции.
-    if not config.DEBUG:
-        smpl_tr_df = convert_transaction(
-            df_to_convert=smpl_tr_df,
-            to_curr=currency,
-            target_col='Значение',
-            use_current_rate=False,
-        )
-    
-
     month_tr_df = (smpl_tr_df
                     .pivot_table(values='Значение', index=['Дата'], columns=['Категория'], aggfunc=np.sum)
                     .fillna(0)
@@ -488,8 +488,10 @@ def _get_month_transactions_cached(data_root, currency, year, month):
 
 
 def clear_table_cache():
+    clear_ledger_cache()
     _get_balance_by_month_cached.cache_clear()
     _get_asset_capital_by_month_cached.cache_clear()
+    _get_investment_value_cached.cache_clear()
     _get_act_receivables_cached.cache_clear()
     _get_act_liabilities_cached.cache_clear()
     _get_cost_distribution_cached.cache_clear()
@@ -515,38 +517,19 @@ def _asset_snapshot_dates(assets_df: pd.DataFrame) -> pd.Series:
 
 def _convert_asset_values_as_of_snapshot(assets_df: pd.DataFrame, currency: str) -> pd.Series:
     values = pd.to_numeric(assets_df['Значение'], errors='coerce').copy()
-    for (from_curr, snapshot_date), index in assets_df.groupby(['Валюта', 'Дата']).groups.items():
-        from_curr = str(from_curr).upper()
-        if from_curr == currency:
-            continue
-        rate = _get_fx_rate_as_of(from_curr, currency, snapshot_date)
-        if rate is None:
-            print(f"Warning: No rate available for {from_curr}/{currency} as of {snapshot_date}, leaving asset value unconverted")
-            continue
-        values.loc[index] = values.loc[index] * rate
-    return values
+    converted = convert_as_of(values, assets_df['Валюта'], assets_df['Дата'], currency)
+    unconverted = converted.isna() & values.notna()
+    missing_pairs = assets_df.loc[unconverted, ['Валюта', 'Дата']].drop_duplicates().sort_values(['Валюта', 'Дата'])
+    for from_curr, snapshot_date in missing_pairs.itertuples(index=False):
+        print(f"Warning: No rate available for {str(from_curr).upper()}/{currency} as of {snapshot_date}, leaving asset value unconverted")
+    return converted.where(~unconverted, values)
 
 
 def _get_fx_rate_as_of(from_curr: str, to_curr: str, as_of_date) -> float | None:
-    from_curr = str(from_curr).upper()
-    to_curr = str(to_curr).upper()
-    if from_curr == to_curr:
+    if str(from_curr).upper() == str(to_curr).upper():
         return 1.0
-    if as_of_date is None or pd.isna(as_of_date):
-        return None
-
-    as_of = pd.Timestamp(as_of_date).normalize()
-    lookback_start = as_of - pd.Timedelta(days=7)
-    rates = get_fx_rates(from_curr, to_curr, lookback_start, as_of)
-    if rates.empty:
-        return get_fallback_rate(from_curr, to_curr)
-    values = pd.to_numeric(rates.iloc[:, 0], errors='coerce').dropna()
-    if values.empty:
-        return get_fallback_rate(from_curr, to_curr)
-    values = values[values.index <= as_of]
-    if values.empty:
-        return get_fallback_rate(from_curr, to_curr)
-    return float(values.iloc[-1])
+    rate = convert_as_of([1.0], [from_curr], [as_of_date], to_curr).iloc[0]
+    return None if pd.isna(rate) else float(rate)
 
 
 def _is_latest_asset_snapshot(year, month) -> bool:
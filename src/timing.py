@@ -0,0 +1,197 @@
+"""
+Opt-in timing spans for the dashboard render pipeline.
+
+With FINREP_TIMING=1 every dashboard HTTP request records a tree of spans: loaders,
+FX conversion, table builders, dataset builders and the layout of each tab. The tree
+is logged when the request ends and summed per span name into a `Server-Timing`
+header, so the browser's network panel shows where a slow render spent its time.
+
+Outside a traced request `span` and `timed` only look up one context variable.
+Threads started with `contextvars.copy_context()` add their spans to the tree of the
+request that started them.
+"""
+
+import functools
+import logging
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_LIMIT = 20
+
+_CURRENT: ContextVar["Span | None"] = ContextVar("finrep_timing_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    duration: float | None = None
+    children: list = field(default_factory=list)
+
+
+class _SpanContext:
+    __slots__ = ("parent", "span", "token")
+
+    def __init__(self, parent: Span, name: str):
+        self.parent = parent
+        self.span = Span(name)
+
+    def __enter__(self) -> Span:
+        self.parent.children.append(self.span)
+        self.token = _CURRENT.set(self.span)
+        self.span.started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.duration = time.perf_counter() - self.span.started
+        _CURRENT.reset(self.token)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """
+    Context manager timing its block as a child of the current span; a no-op outside a trace.
+    """
+    parent = _CURRENT.get()
+    if parent is None:
+        return _NO_SPAN
+    return _SpanContext(parent, name)
+
+
+def timed(name: str | None = None):
+    """
+    Decorator timing every call as a span named `name` (the function's qualified name by default).
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _CURRENT.get()
+            if parent is None:
+                return func(*args, **kwargs)
+            with _SpanContext(parent, span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_trace(name: str):
+    """
+    Make a new root span current; returns (root, token) for `finish_trace`.
+    """
+    root = Span(name)
+    return root, _CURRENT.set(root)
+
+
+def finish_trace(root: Span, token) -> Span:
+    root.duration = time.perf_counter() - root.started
+    _CURRENT.reset(token)
+    return root
+
+
+def format_tree(root: Span) -> str:
+    """
+    The span tree as indented lines; sibling spans of the same name are merged with a call count.
+    """
+    lines = []
+    _format_spans([root], 0, lines)
+    return "\n".join(lines)
+
+
+def _format_spans(spans: list[Span], depth: int, lines: list[str]) -> None:
+    for name, group in _group_by_name(spans).items():
+        total = sum(item.duration or 0.0 for item in group)
+        count = f" x{len(group)}" if len(group) > 1 else ""
+        lines.append(f"{'  ' * depth}{name} {total * 1000:.1f} ms{count}")
+        _format_spans([child for item in group for child in item.children], depth + 1, lines)
+
+
+def _group_by_name(spans: list[Span]) -> dict[str, list[Span]]:
+    groups: dict[str, list[Span]] = {}
+    for item in spans:
+        groups.setdefault(item.name, []).append(item)
+    return groups
+
+
+def server_timing(root: Span, limit: int = SERVER_TIMING_LIMIT) -> str:
+    """
+    `Server-Timing` header value: the request total and the `limit` slowest span names,
+    with durations summed over their calls. Nested spans of one name are counted once.
+    """
+    totals: dict[str, list] = {}
+    _collect_totals(root.children, totals, set())
+    slowest = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    entries = [f"total;dur={(root.duration or 0.0) * 1000:.1f}"]
+    for name, (duration, count) in slowest:
+        entry = f"{_metric_name(name)};dur={duration * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="x{count}"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+def _collect_totals(spans: list[Span], totals: dict[str, list], open_names: set[str]) -> None:
+    for item in spans:
+        total = totals.setdefault(item.name, [0.0, 0])
+        total[1] += 1
+        if item.name not in open_names:
+            total[0] += item.duration or 0.0
+        _collect_totals(item.children, totals, open_names | {item.name})
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def install_request_timing(server) -> None:
+    """
+    Trace every request of the Flask `server` when FINREP_TIMING=1.
+    """
+    if not config.TIMING_ENABLED:
+        return
+    from flask import g, request
+
+    @server.before_request
+    def _start_request_trace():
+        name = f"{request.method} {request.path}"
+        if request.path.endswith("_dash-update-component"):
+            payload = request.get_json(silent=True) or {}
+            name = f"{name} {payload.get('output', '')}".strip()
+        g.finrep_trace = start_trace(name)
+
+    @server.after_request
+    def _finish_request_trace(response):
+        trace = g.pop("finrep_trace", None)
+        if trace is not None:
+            root = finish_trace(*trace)
+            response.headers["Server-Timing"] = server_timing(root)
+            logger.info("timing %s", format_tree(root))
+        return response
+
+    @server.teardown_request
+    def _drop_request_trace(exc):
+        trace = g.pop("finrep_trace", None)
+        if trace is not None:
+            finish_trace(*trace)
@@ -0,0 +1,20 @@
+import pytest
+
+from src import config
+from src.data import get_finance
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # Job queue, shared table cache and snapshots stay out of the repository's data/.cache.
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+
+
+@pytest.fixture(autouse=True)
+def fresh_fx_cache():
+    # Parsed FX cache frames and rate stores are per process and keyed by file path.
+    get_finance._FX_CACHE_DF.clear()
+    get_finance._FX_RATE_STORE.clear()
+    yield
+    get_finance._FX_CACHE_DF.clear()
+    get_finance._FX_RATE_STORE.clear()
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("FINREP_DASH_PASSWORD", "test-password")
+os.environ.setdefault("FINREP_DASH_SECRET_KEY", "test-session-secret")
+
+from src import config
+from src.dashboard import export
+from src.dashboard.app import create_app
+from src.dashboard.jobs import LocalJobManager
+
+EXPORT_REQUEST = {
+    "output": "page-export-download.data",
+    "outputs": {"id": "page-export-download", "property": "data"},
+    "inputs": [
+        {"id": "export-png", "property": "n_clicks", "value": 1},
+        {"id": "export-pdf", "property": "n_clicks", "value": None},
+    ],
+    "state": [
+        {"id": "dashboard-currency", "property": "value", "value": "RUB"},
+        {"id": "dashboard-year", "property": "value", "value": "2025"},
+        {"id": "dashboard-month", "property": "value", "value": "01"},
+        {"id": "dashboard-tabs", "property": "active_tab", "value": "year"},
+        {"id": "dashboard-location", "property": "href", "value": "http://localhost/"},
+    ],
+    "changedPropIds": ["export-png.n_clicks"],
+}
+CANCEL_REQUEST = {
+    "output": "cancel-background-job.id",
+    "outputs": {"id": "cancel-background-job", "property": "id"},
+    "inputs": [{"id": "cancel-background-job", "property": "n_clicks", "value": 1}],
+    "state": [],
+    "changedPropIds": ["cancel-background-job.n_clicks"],
+}
+
+
+def _wait_for(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError("background job did not reach the expected state")
+
+
+def _logged_in_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+    client = create_app().server.test_client()
+    assert client.post("/login", data={"data_mode": "test"}).status_code == 302
+    return client
+
+
+def _poll_export(client, handles: dict):
+    response = client.post("/_dash-update-component", json=EXPORT_REQUEST,
+                           query_string={"cacheKey": handles["cacheKey"], "job": handles["job"]})
+    assert response.status_code in {200, 204}
+    return response.get_json() if response.status_code == 200 else None
+
+
+def test_job_reports_progress_and_runs_in_the_data_mode_of_its_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+    manager = LocalJobManager(max_workers=1)
+    release = threading.Event()
+
+    def callback(set_progress, label):
+        set_progress(f"{label}: step 1")
+        release.wait(10)
+        return label, config.get_data_mode()
+
+    job_fn = manager.make_job_fn(callback, progress=True)
+    with config.data_mode("test"):
+        job = manager.call_job_fn("export", job_fn, ["png"], {})
+
+    assert _wait_for(lambda: manager.get_progress("export")) == ["png: step 1"]
+    assert manager.job_running(job)
+    assert manager.get_result("export", job) is manager.UNDEFINED
+
+    release.set()
+    assert _wait_for(lambda: manager.result_ready("export"))
+    assert manager.get_result("export", job) == ("png", "test")
+    assert not manager.job_running(job)
+    assert not manager.result_ready("export")
+
+
+def test_cancelled_job_stops_at_next_progress_report_and_drops_its_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+    manager = LocalJobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    steps = []
+
+    def callback(set_progress):
+        started.set()
+        release.wait(10)
+        set_progress("step 2")
+        steps.append("step 2")
+        return "done"
+
+    job = manager.call_job_fn("refresh", manager.make_job_fn(callback, progress=True), [], {})
+    assert started.wait(10)
+    manager.terminate_job(job)
+    release.set()
+
+    manager._pool().submit(lambda: None).result(10)
+    assert steps == []
+    assert not manager.job_running(job)
+    assert manager.get_result("refresh", job) is manager.UNDEFINED
+
+
+def test_export_callback_runs_as_background_job_with_the_session_cookie(tmp_path, monkeypatch):
+    client = _logged_in_client(tmp_path, monkeypatch)
+    calls = []
+
+    def export_dashboard_page(href, currency, tab, export_format, year=None, month=None,
+                              session_cookie=None, session_cookie_name="session", on_step=None):
+        for step in ("browser", "page", "render"):
+            on_step(step)
+        calls.append((href, currency, tab, export_format, year, month, session_cookie, session_cookie_name))
+        path = tmp_path / f"dashboard.{export_format}"
+        path.write_bytes(b"image")
+        return path
+
+    monkeypatch.setattr(export, "export_dashboard_page", export_dashboard_page)
+
+    handles = client.post("/_dash-update-component", json=EXPORT_REQUEST).get_json()
+    assert {"cacheKey", "job"} <= set(handles)
+    result = _wait_for(lambda: (_poll_export(client, handles) or {}).get("response"))
+
+    assert result["page-export-download"]["data"]["filename"] == "dashboard.png"
+    assert calls == [("http://localhost/", "RUB", "year", "png", "2025", None,
+                      client.get_cookie("session").value, "session")]
+
+
+def test_cancel_stops_the_export_between_playwright_steps(tmp_path, monkeypatch):
+    client = _logged_in_client(tmp_path, monkeypatch)
+    loading, release, stopped = threading.Event(), threading.Event(), threading.Event()
+    steps = []
+
+    def export_dashboard_page(*args, on_step=None, **kwargs):
+        try:
+            on_step("browser")
+            on_step("page")
+            loading.set()
+            release.wait(10)
+            on_step("render")
+            steps.append("render")
+            return tmp_path / "dashboard.png"
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(export, "export_dashboard_page", export_dashboard_page)
+
+    handles = client.post("/_dash-update-component", json=EXPORT_REQUEST).get_json()
+    assert loading.wait(10)
+    response = client.post("/_dash-update-component", json=CANCEL_REQUEST, query_string={"cancelJob": handles["job"]})
+    assert response.status_code in {200, 204}
+    release.set()
+
+    assert stopped.wait(10)
+    assert steps == []
+    assert "response" not in (_poll_export(client, handles) or {})
@@ -0,0 +1,45 @@
+import json
+import pstats
+import time
+
+from src import config
+from src.dashboard import profiling
+
+
+def _render(currency: str, year: str, month: str, active_tab: str, comment: str):
+    time.sleep(0.02)
+    return f"{currency}-{active_tab}"
+
+
+def test_slow_callback_writes_profile_with_selection_inputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REPORTS_PATH", str(tmp_path))
+    profiled = profiling.profile_slow_calls(_render, threshold=0.01)
+
+    assert profiled("RUB", "2026", "05", active_tab="month", comment="private note") == "RUB-month"
+
+    profile = next((tmp_path / "profiles").glob("_render_*.prof"))
+    details = json.loads(profile.with_suffix(".json").read_text(encoding="utf-8"))
+    assert details["callback"] == "_render"
+    assert details["duration_seconds"] >= 0.02
+    assert details["inputs"] == {"currency": "RUB", "year": "2026", "month": "05", "active_tab": "month"}
+    assert "_render" in profile.with_suffix(".txt").read_text(encoding="utf-8")
+    assert any(name == "_render" for _, _, name in pstats.Stats(str(profile)).stats)
+
+
+def test_fast_callbacks_and_disabled_mode_write_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REPORTS_PATH", str(tmp_path))
+    profiling.profile_slow_calls(_render, threshold=10)("RUB", "2026", "05", "year", "")
+
+    class FakeApp:
+        def callback(self, *args, **kwargs):
+            return lambda func: func
+
+    app = FakeApp()
+    monkeypatch.setattr(config, "PROFILE_CALLBACKS_MS", 0)
+    profiling.install_callback_profiler(app)
+    assert app.callback()(_render) is _render
+    monkeypatch.setattr(config, "PROFILE_CALLBACKS_MS", 10_000)
+    profiling.install_callback_profiler(app)
+    assert app.callback()(_render).__wrapped__ is _render
+
+    assert not (tmp_path / "profiles").exists()
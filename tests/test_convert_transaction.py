@@ -0,0 +1,115 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.data.get import clear_data_cache, get_transactions
+from src.data.get_finance import get_fallback_rate, get_rates
+from src.data.proccess import convert_transaction
+
+
+def _legacy_convert_transaction(df_to_convert, to_curr, target_col, use_current_rate=False):
+    """Per-currency converter the single-pass engine must stay equivalent to."""
+    df_to_convert = df_to_convert.copy()
+    for curr_name in set(df_to_convert['Валюта'].unique()) - {to_curr}:
+        curr_smpl = df_to_convert[df_to_convert['Валюта'] == curr_name]
+        smpl_index = curr_smpl.index
+        ticker = f'{curr_name}{to_curr}=X'
+        curr_rates = get_rates(tickers=[ticker], min_date=curr_smpl['Дата'].min(), max_date=curr_smpl['Дата'].max())
+        fallback_rate = get_fallback_rate(curr_name, to_curr)
+        if use_current_rate:
+            values = pd.to_numeric(curr_rates[ticker], errors='coerce').dropna()
+            latest_rate = float(values.iloc[-1]) if not values.empty else None
+            rate_to_apply = latest_rate if latest_rate is not None else fallback_rate
+            if rate_to_apply is None:
+                continue
+            curr_smpl[target_col] = curr_smpl[target_col] * rate_to_apply
+        else:
+            curr_smpl = curr_smpl.merge(curr_rates.reset_index(), on='Дата', how='left')
+            if fallback_rate is not None:
+                curr_smpl[ticker] = curr_smpl[ticker].fillna(fallback_rate)
+            if curr_smpl[ticker].isna().any():
+                continue
+            curr_smpl[target_col] = curr_smpl[target_col] * curr_smpl[ticker]
+            curr_smpl.drop(ticker, axis=1, inplace=True)
+        curr_smpl['Валюта'] = to_curr
+        curr_smpl.index = smpl_index
+        df_to_convert.loc[df_to_convert['Валюта'] == curr_name] = curr_smpl
+    return df_to_convert.round(2)
+
+
+@pytest.fixture
+def sample_mode():
+    with config.data_mode('test'):
+        yield
+
+
+def test_single_pass_conversion_matches_per_currency_conversion_on_sample_data(sample_mode):
+    clear_data_cache()
+    transactions = get_transactions()
+
+    for to_curr in config.UNIQUE_TICKERS:
+        for use_current_rate in [False, True]:
+            pd.testing.assert_frame_equal(
+                convert_transaction(transactions, to_curr, 'Значение', use_current_rate=use_current_rate),
+                _legacy_convert_transaction(transactions, to_curr, 'Значение', use_current_rate=use_current_rate),
+            )
+    clear_data_cache()
+
+
+def test_single_pass_conversion_keeps_window_and_fallback_semantics(tmp_path, monkeypatch, caplog):
+    (tmp_path / 'rates').mkdir()
+    pd.DataFrame({
+        'date': ['2024-03-01', '2024-03-05', '2024-06-03', '2024-06-10'],
+        'currency': ['EUR', 'EUR', 'KZT', 'KZT'],
+        'usd_rate': [1.1, 1.2, 0.0021, 0.0022],
+        'source': 'manual',
+        'fetched_at': '2024-07-01T00:00:00',
+    }).to_csv(tmp_path / 'rates' / 'fx_rates.csv', sep=';', index=False)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    transactions = pd.DataFrame({
+        'Дата': pd.to_datetime(['2024-01-10', '2024-03-03', '2024-03-20', '2024-02-01', '2024-02-15',
+                                '2024-06-05', '2024-04-01']),
+        'Категория': 'Пища',
+        'Валюта': ['EUR', 'EUR', 'EUR', 'KZT', 'KZT', 'KZT', 'GBP'],
+        'Значение': [10.0, 20.0, 30.0, 1000.0, 2000.0, 3000.0, 40.0],
+    })
+
+    with caplog.at_level(logging.WARNING):
+        for to_curr in ['USD', 'EUR', 'KZT', 'RUB']:
+            for use_current_rate in [False, True]:
+                pd.testing.assert_frame_equal(
+                    convert_transaction(transactions, to_curr, 'Значение', use_current_rate=use_current_rate),
+                    _legacy_convert_transaction(transactions, to_curr, 'Значение', use_current_rate=use_current_rate),
+                )
+
+    converted = convert_transaction(transactions, 'USD', 'Значение')
+    assert converted.loc[converted['Валюта'] == 'GBP', 'Значение'].tolist() == [40.0]
+    assert np.isclose(converted.loc[1, 'Значение'], 22.0)
+    assert any('No FX rate available for GBP to USD' in message for message in caplog.messages)
+
+
+def test_materialized_ledger_matches_full_ledger_conversion_and_converts_once(sample_mode, monkeypatch):
+    from src.data import proccess
+
+    clear_data_cache()
+    proccess.clear_ledger_cache()
+    transactions = get_transactions()
+    expected = {currency: convert_transaction(transactions, currency, 'Значение') for currency in config.UNIQUE_TICKERS}
+    calls = []
+    original_convert = proccess.convert_transaction
+
+    def counting_convert(*args, **kwargs):
+        calls.append(kwargs.get('to_curr'))
+        return original_convert(*args, **kwargs)
+
+    monkeypatch.setattr(proccess, 'convert_transaction', counting_convert)
+    for _ in range(2):
+        for currency in config.UNIQUE_TICKERS:
+            pd.testing.assert_frame_equal(proccess.get_transactions_in_currency(currency), expected[currency])
+
+    assert sorted(calls) == sorted(config.UNIQUE_TICKERS)
+    proccess.clear_ledger_cache()
+    clear_data_cache()
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from src import config
+from src.data import crypto
+from src.data.investments import append_price_cache
+
+ADDRESSES = [f"0x{index:040x}" for index in range(1, 5)]
+SLOW_ADDRESS = f"0x{99:040x}"
+FAILING_ADDRESS = f"0x{77:040x}"
+
+
+def _call_address(call) -> str:
+    if call["method"] == "eth_getBalance":
+        return call["params"][0]
+    return "0x" + call["params"][0]["data"][-40:]
+
+
+class _RpcHandler(BaseHTTPRequestHandler):
+    requests_seen: list = []
+    delays: dict = {}
+    failing: set = set()
+    no_batch_paths: set = set()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests_seen.append(payload)
+        if isinstance(payload, list) and self.path in self.no_batch_paths:
+            payload = {"jsonrpc": "2.0", "id": None, "method": "batch", "params": []}
+        calls = payload if isinstance(payload, list) else [payload]
+        time.sleep(max(self.delays.get(_call_address(call), 0.3) if call["method"] != "batch" else 0 for call in calls))
+        replies = [self._reply(call) for call in calls]
+        body = json.dumps(replies if isinstance(payload, list) else replies[0]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply(self, call):
+        if call["method"] == "batch":
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch requests are not supported"}}
+        address = _call_address(call)
+        if address in self.failing:
+            return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32000, "message": "header not found"}}
+        decimals = 18 if call["method"] == "eth_getBalance" else 6
+        return {"jsonrpc": "2.0", "id": call["id"], "result": hex(int(address, 16) * 10**decimals)}
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def rpc_server(tmp_path, monkeypatch):
+    _RpcHandler.requests_seen = []
+    _RpcHandler.delays = {SLOW_ADDRESS: 3.0}
+    _RpcHandler.failing = set()
+    _RpcHandler.no_batch_paths = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RpcHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(crypto, "EVM_RPC_URLS", {"ethereum": [url], "base": [f"{url}/base"]})
+    monkeypatch.setattr(config, "DATA_PATH", str(tmp_path))
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def _write_wallets(tmp_path, wallets):
+    path = tmp_path / "wallets.csv"
+    rows = [
+        {"account": f"Wallet {index}", "chain": chain, "asset": asset, "address": address, "token_contract": "", "enabled": "1", "label": ""}
+        for index, (chain, asset, address) in enumerate(wallets, start=1)
+    ]
+    pd.DataFrame(rows, columns=crypto.WALLET_COLUMNS).to_csv(path, sep=";", index=False, encoding="utf-8-sig")
+    return path
+
+
+def test_each_chain_is_fetched_in_one_concurrent_batch(tmp_path, rpc_server):
+    wallets_path = _write_wallets(
+        tmp_path,
+        [
+            ("ethereum", "ETH", ADDRESSES[0]),
+            ("base", "ETH", ADDRESSES[1]),
+            ("ethereum", "USDT", ADDRESSES[2]),
+            ("ethereum", "ETH", ADDRESSES[3]),
+        ],
+    )
+
+    started = time.perf_counter()
+    balances = crypto.refresh_crypto_balances(wallets_path, tmp_path / "balances.csv", timeout=5)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.55
+    assert balances["balance"].astype(float).tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert balances.attrs["errors"] == []
+    assert sorted(len(batch) for batch in _RpcHandler.requests_seen) == [1, 3]
+    assert all(isinstance(batch, list) for batch in _RpcHandler.requests_seen)
+
+
+def test_failed_batch_items_are_retried_on_the_next_provider(tmp_path, rpc_server, monkeypatch):
+    monkeypatch.setattr(crypto, "EVM_RPC_URLS", {"ethereum": [rpc_server, f"{rpc_server}/fallback"], "base": [rpc_server]})
+    _RpcHandler.failing = {FAILING_ADDRESS}
+    wallets_path = _write_wallets(tmp_path, [("ethereum", "ETH", ADDRESSES[0]), ("ethereum", "ETH", FAILING_ADDRESS)])
+
+    balances = crypto.refresh_crypto_balances(wallets_path, tmp_path / "balances.csv", timeout=5)
+
+    assert balances["address"].tolist() == [ADDRESSES[0]]
+    assert [len(batch) for batch in _RpcHandler.requests_seen] == [2, 1]
+    assert "header not found" in balances.attrs["errors"][0]
+
+
+def test_provider_refusing_batches_gets_single_calls(tmp_path, rpc_server, monkeypatch):
+    monkeypatch.setattr(crypto, "EVM_RPC_URLS", {"ethereum": [f"{rpc_server}/single"], "base": [rpc_server]})
+    _RpcHandler.no_batch_paths = {"/single"}
+    wallets_path = _write_wallets(tmp_path, [("ethereum", "ETH", ADDRESSES[0]), ("ethereum", "USDT", ADDRESSES[2])])
+
+    balances = crypto.refresh_crypto_balances(wallets_path, tmp_path / "balances.csv", timeout=5)
+
+    assert balances["balance"].astype(float).tolist() == [1.0, 3.0]
+    assert balances.attrs["errors"] == []
+    assert isinstance(_RpcHandler.requests_seen[0], list)
+    assert sorted(request["id"] for request in _RpcHandler.requests_seen[1:]) == [0, 1]
+
+
+def test_refresh_deadline_keeps_partial_results(tmp_path, rpc_server):
+    wallets_path = _write_wallets(tmp_path, [("ethereum", "ETH", ADDRESSES[0]), ("base", "ETH", SLOW_ADDRESS)])
+
+    started = time.perf_counter()
+    balances = crypto.refresh_crypto_balances(wallets_path, tmp_path / "balances.csv", timeout=5, deadline=1)
+
+    assert time.perf_counter() - started < 2.5
+    assert balances["address"].tolist() == [ADDRESSES[0]]
+    status = crypto.read_crypto_refresh_status()
+    assert status["status"].tolist() == ["ok", "error"]
+    assert "timed out" in status["message"].iloc[1]
+    assert crypto.read_crypto_balances(tmp_path / "balances.csv")["address"].tolist() == [ADDRESSES[0]]
+
+
+class _FakeResponse:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise ValueError(f"HTTP {self.status}")
+
+    def json(self):
+        return self.payload
+
+
+def test_prices_are_fetched_in_bulk_and_appended_in_one_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATA_PATH", str(tmp_path))
+    cache_path = tmp_path / "price_cache.csv"
+    append_price_cache(pd.DataFrame([{"date": "2026-01-01", "ticker": "BTC", "price": "1", "currency": "USD", "source": "seed", "fetched_at": ""}]), cache_path)
+    calls = []
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append((url, params))
+        if "coingecko" in url:
+            return _FakeResponse({"bitcoin": {"usd": 65000}, "ethereum": {"usd": 3000}})
+        return _FakeResponse([{"symbol": "LINKUSDT", "price": "15.5"}])
+
+    monkeypatch.setattr(crypto, "_http_get", fake_get)
+    cache = crypto.refresh_crypto_price_cache(["BTC", "ETH", "LINK", "USDT"], price_cache_path=cache_path)
+
+    assert [url.rsplit("/", 1)[-1] for url, _ in calls] == ["price", "price"]
+    assert calls[0][1]["ids"] == "bitcoin,chainlink,ethereum,tether"
+    assert calls[1][1] == {"symbols": '["LINKUSDT"]'}
+    latest = cache.iloc[1:].set_index("ticker")
+    assert latest["price"].astype(float).to_dict() == {"BTC": 65000.0, "ETH": 3000.0, "LINK": 15.5, "USDT": 1.0}
+    assert latest["source"].to_dict() == {"BTC": "coingecko", "ETH": "coingecko", "LINK": "binance", "USDT": "binance"}
+    assert cache["ticker"].iloc[0] == "BTC" and cache["source"].iloc[0] == "seed"
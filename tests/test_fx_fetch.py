@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+import yfinance
+
+from src import config
+from src.data import get_finance
+
+
+@pytest.fixture
+def fx_root(tmp_path, monkeypatch):
+    (tmp_path / 'rates').mkdir()
+    pd.DataFrame(
+        [{'date': '2024-05-01', 'currency': 'EUR', 'usd_rate': 1.07, 'source': 'seed', 'fetched_at': '2024-05-01T00:00:00'}]
+    ).to_csv(tmp_path / 'rates' / 'fx_rates.csv', sep=';', index=False)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    previous = get_finance.set_fx_network_enabled(True)
+    yield tmp_path
+    get_finance.set_fx_network_enabled(previous)
+
+
+def _fake_provider(name, calls, rates):
+    def fetch(currency, min_date, max_date):
+        calls.append((name, currency, min_date, max_date, time.perf_counter(), threading.current_thread().name))
+        time.sleep(0.2)
+        if currency not in rates:
+            return pd.Series(dtype=float)
+        return pd.Series(rates[currency], index=pd.bdate_range(min_date, max_date))
+    return fetch
+
+
+def test_fx_gaps_are_fetched_concurrently_and_stored_with_one_write(fx_root, monkeypatch):
+    calls = []
+    monkeypatch.setattr(get_finance, '_PROVIDERS', {
+        'yfinance': _fake_provider('yfinance', calls, {'EUR': 1.08, 'GBP': 1.25}),
+        'cbr': _fake_provider('cbr', calls, {'EUR': 1.5, 'KZT': 0.002}),
+    })
+    monkeypatch.setattr(get_finance, '_prefetch_yfinance', lambda ranges: None)
+    writes = []
+    append_journal = get_finance._append_journal
+    monkeypatch.setattr(get_finance, '_append_journal', lambda rows: writes.append(len(rows)) or append_journal(rows))
+
+    rates = get_finance.get_usd_rates(['EUR', 'GBP', 'KZT', 'USD'], '2024-05-01', '2024-05-10')
+
+    # Each fake request takes 0.2 s: the yfinance ranges all start before the first one
+    # ends, and cbr is asked only for the gap yfinance left empty, after yfinance finished.
+    stages = [(name, currency) for name, currency, *_ in calls]
+    started = [call[4] for call in calls]
+    assert sorted(stages[:3]) == [('yfinance', 'EUR'), ('yfinance', 'GBP'), ('yfinance', 'KZT')]
+    assert stages[3:] == [('cbr', 'KZT')]
+    assert max(started[:3]) - min(started[:3]) < 0.2
+    assert started[3] - max(started[:3]) >= 0.2
+    assert all(name.startswith('fx-fetch') for *_, name in calls)
+    assert len(writes) == 1
+    assert rates.loc['2024-05-01', 'EUR'] == 1.07
+    assert rates.loc['2024-05-02', 'EUR'] == 1.08
+    assert rates.loc['2024-05-10', 'GBP'] == 1.25
+    assert rates.loc['2024-05-10', 'KZT'] == 0.002
+    sources = get_finance._cache_frame().groupby('currency')['source'].agg(set).to_dict()
+    assert sources == {'EUR': {'seed', 'yfinance'}, 'GBP': {'yfinance'}, 'KZT': {'cbr'}}
+
+
+def test_nearby_as_of_windows_are_planned_as_one_gap(fx_root):
+    windows = [('KZT', pd.Timestamp(date) - pd.Timedelta(days=7), pd.Timestamp(date))
+               for date in ['2024-03-04', '2024-03-11', '2024-06-03']]
+
+    gaps = get_finance._plan_fx_gaps(windows)
+
+    assert [(gap.currency, gap.start.date().isoformat(), gap.end.date().isoformat()) for gap in gaps] == [
+        ('KZT', '2024-02-26', '2024-03-11'),
+        ('KZT', '2024-05-27', '2024-06-03'),
+    ]
+
+
+def _fake_yf_download(calls, prices):
+    def download(tickers, start=None, end=None, period=None, **kwargs):
+        calls.append(tickers)
+        names = [tickers] if isinstance(tickers, str) else list(tickers)
+        if period:
+            index = pd.bdate_range(end=pd.Timestamp('2024-05-10'), periods=5)
+        else:
+            index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+        columns = pd.MultiIndex.from_product([['Close', 'Open'], names], names=['Price', 'Ticker'])
+        data = pd.DataFrame(float('nan'), index=index, columns=columns)
+        for ticker in names:
+            if ticker in prices:
+                data[('Close', ticker)] = prices[ticker]
+                data[('Open', ticker)] = -1.0
+        return data
+    return download
+
+
+def test_yfinance_gap_tickers_are_downloaded_in_one_call(fx_root, monkeypatch):
+    calls = []
+    monkeypatch.setattr(yfinance, 'download', _fake_yf_download(calls, {'EURUSD=X': 1.08, 'KZT=X': 500.0}))
+    monkeypatch.setattr(config, 'FX_PROVIDER_ORDER', ['yfinance'])
+
+    rates = get_finance.get_usd_rates(['EUR', 'KZT', 'GBP'], '2024-05-01', '2024-05-10')
+
+    assert calls[0] == ['EURUSD=X', 'EUR=X', 'GBPUSD=X', 'GBP=X', 'KZTUSD=X', 'KZT=X']
+    assert calls[1:] == ['USDGBP=X']
+    assert rates.loc['2024-05-10', 'EUR'] == 1.08
+    assert rates.loc['2024-05-10', 'KZT'] == pytest.approx(0.002)
+    assert rates['GBP'].isna().all()
+
+
+def test_actual_market_prices_come_from_one_download(fx_root, monkeypatch):
+    calls = []
+    monkeypatch.setattr(yfinance, 'download', _fake_yf_download(calls, {'AAPL': 190.0, 'MSFT': 410.0}))
+
+    actual = get_finance.get_actual_rates(['AAPL', 'EURUSD=X', 'MSFT', 'MISSING'])
+
+    assert calls == [['AAPL', 'MSFT', 'MISSING']]
+    assert actual.set_index('ticker_').iloc[:, 0].to_dict() == {'AAPL': 190.0, 'EURUSD=X': 1.07, 'MSFT': 410.0}
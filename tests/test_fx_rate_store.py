@@ -0,0 +1,221 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.data import get_finance
+
+
+def _legacy_series_from_cache(cache, currency, min_date, max_date):
+    """DataFrame scan the indexed store must stay equivalent to."""
+    full_index = pd.date_range(min_date, max_date, freq='D')
+    currency_cache = cache[cache['currency'] == currency].sort_values('date')
+    if currency_cache.empty:
+        return pd.Series(np.nan, index=full_index, dtype=float)
+
+    values = currency_cache.set_index('date')['usd_rate'].sort_index()
+    seed = values[values.index <= min_date]
+    in_range = values[(values.index >= min_date) & (values.index <= max_date)]
+    if not seed.empty:
+        in_range = pd.concat([seed.tail(1), in_range])
+    if in_range.empty:
+        return pd.Series(np.nan, index=full_index, dtype=float)
+    values_for_fill = in_range[~in_range.index.duplicated(keep='last')]
+    fill_index = values_for_fill.index.union(full_index).sort_values()
+    return values_for_fill.reindex(fill_index).ffill().bfill().reindex(full_index)
+
+
+def _legacy_missing_dates(cache, currency, min_date, max_date):
+    full_index = pd.date_range(min_date.normalize(), max_date.normalize(), freq='D')
+    currency_cache = cache[cache['currency'] == currency]
+    if currency_cache.empty:
+        return list(full_index)
+    cached_dates = set(pd.to_datetime(currency_cache['date'], errors='coerce').dropna().dt.normalize())
+    return [date for date in full_index if date.normalize() not in cached_dates]
+
+
+def _legacy_fetchable_missing_dates(cache, currency, min_date, max_date):
+    holidays = get_finance._fx_holiday_mmdd(currency)
+    return [date for date in _legacy_missing_dates(cache, currency, min_date, max_date)
+            if date.weekday() < 5 and date.strftime('%m-%d') not in holidays]
+
+
+def _write_fx_cache(root, seed: int = 3) -> None:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for currency, start in [('RUB', '2020-01-01'), ('EUR', '2021-06-15'), ('KZT', '2023-03-01')]:
+        dates = pd.bdate_range(start, '2024-12-31')
+        dates = dates[rng.random(len(dates)) > 0.2]
+        for date, rate in zip(dates, rng.uniform(0.001, 1.5, len(dates))):
+            rows.append({'date': date.strftime('%Y-%m-%d'), 'currency': currency, 'usd_rate': rate,
+                         'source': rng.choice(['yfinance', 'cbr']), 'fetched_at': '2025-01-01T00:00:00'})
+    rows.append({'date': '2022-02-01', 'currency': 'RUB', 'usd_rate': 0.5, 'source': 'manual',
+                 'fetched_at': '2026-01-01T00:00:00'})
+    (root / 'rates').mkdir(parents=True)
+    pd.DataFrame(rows).to_csv(root / 'rates' / 'fx_rates.csv', sep=';', index=False)
+
+
+def test_rate_store_matches_dataframe_scans(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    cache = get_finance._cache_frame()
+    windows = [('2019-06-01', '2019-12-31'), ('2019-12-20', '2020-01-10'), ('2021-06-10', '2021-06-20'),
+               ('2022-01-29', '2022-02-03'), ('2024-12-25', '2025-02-01'), ('2020-01-01', '2024-12-31')]
+
+    for currency in ['RUB', 'EUR', 'KZT', 'GBP']:
+        for start, end in windows:
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            pd.testing.assert_series_equal(get_finance._series_from_cache(currency, start, end),
+                                           _legacy_series_from_cache(cache, currency, start, end),
+                                           check_freq=False, check_names=False)
+
+    for currency in ['RUB', 'EUR', 'KZT', 'GBP']:
+        for start, end in windows + [('2022-01-01', '2022-01-10'), ('2024-03-08', '2024-03-10')]:
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            spans = get_finance._missing_fx_spans(currency, start, end)
+            expected = _legacy_fetchable_missing_dates(cache, currency, start, end)
+            assert [date for span_start, span_end in spans
+                    for date in _legacy_fetchable_missing_dates(cache, currency, span_start, span_end)] == expected
+            assert all(span_end < next_start for (_, span_end), (next_start, _) in zip(spans, spans[1:]))
+            assert all(start in expected and end in expected for start, end in spans)
+            assert [span for gap in get_finance._plan_fx_gaps([(currency, start, end)]) for span in gap.spans] == spans
+
+    manual = get_finance._usd_rate_metadata('RUB', pd.Timestamp('2022-02-01'))
+    assert (manual['usd_rate'], manual['source']) == (0.5, 'manual')
+    assert get_finance._usd_rate_metadata('KZT', pd.Timestamp('2022-01-01'))['source'] == 'missing'
+    latest_rub = cache[cache['currency'] == 'RUB'].sort_values('date')['usd_rate'].iloc[-1]
+    assert get_finance._latest_cached_usd_rate('RUB') == latest_rub
+    assert get_finance.get_fallback_rate('RUB', 'RUB') == 1.0
+
+
+def test_rate_store_is_rebuilt_after_cache_write(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    assert get_finance._latest_cached_usd_rate('GBP') is None
+
+    get_finance._append_cache_rows('GBP', pd.Series([1.25], index=[pd.Timestamp('2024-05-02')]), 'manual')
+
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.25
+    rates = get_finance.get_fx_rates('GBP', 'USD', '2024-05-01', '2024-05-03')
+    assert rates.iloc[:, 0].tolist() == [1.25, 1.25, 1.25]
+
+
+def _legacy_rate_as_of(from_curr, to_curr, as_of):
+    if from_curr == to_curr:
+        return 1.0
+    as_of = pd.Timestamp(as_of).normalize()
+    rates = get_finance.get_fx_rates(from_curr, to_curr, as_of - pd.Timedelta(days=7), as_of)
+    values = pd.to_numeric(rates.iloc[:, 0], errors='coerce').dropna()
+    values = values[values.index <= as_of]
+    if values.empty:
+        return get_finance.get_fallback_rate(from_curr, to_curr)
+    return float(values.iloc[-1])
+
+
+def test_convert_as_of_matches_per_pair_rate_lookups(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    snapshot_dates = pd.date_range('2019-01-31', '2025-06-30', freq='M')
+    pairs = pd.MultiIndex.from_product([['RUB', 'EUR', 'KZT', 'USD', 'GBP'], snapshot_dates]).to_frame(index=False)
+    pairs.columns = ['currency', 'date']
+    pairs['value'] = np.arange(len(pairs), dtype=float) + 1
+
+    for to_currency in ['RUB', 'USD', 'KZT']:
+        converted = get_finance.convert_as_of(pairs['value'], pairs['currency'], pairs['date'], to_currency)
+        expected = [
+            np.nan if rate is None else value * rate
+            for value, rate in zip(pairs['value'],
+                                   (_legacy_rate_as_of(currency, to_currency, date)
+                                    for currency, date in zip(pairs['currency'], pairs['date'])))
+        ]
+        np.testing.assert_allclose(converted.to_numpy(), np.array(expected, dtype=float), rtol=1e-12)
+        assert converted.index.equals(pairs.index)
+
+
+def test_appends_go_to_the_journal_until_compaction(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    base_path = tmp_path / 'rates' / 'fx_rates.csv'
+    journal_path = tmp_path / 'rates' / 'fx_rates.journal.csv'
+    base = base_path.read_bytes()
+
+    get_finance._append_cache_rows('GBP', pd.Series([1.25, 1.26], index=pd.bdate_range('2024-05-02', periods=2)), 'cbr')
+    get_finance._append_cache_rows('RUB', pd.Series([0.4], index=[pd.Timestamp('2022-02-01')]), 'manual')
+
+    assert base_path.read_bytes() == base
+    assert len(journal_path.read_text().splitlines()) == 4
+    merged = get_finance._cache_frame()
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.26
+    assert merged.loc[(merged['currency'] == 'RUB') & (merged['date'] == '2022-02-01'), 'usd_rate'].tolist() == [0.4]
+
+    monkeypatch.setattr(get_finance, 'FX_JOURNAL_COMPACT_BYTES', 1)
+    get_finance._append_cache_rows('GBP', pd.Series([1.27], index=[pd.Timestamp('2024-05-06')]), 'cbr')
+
+    assert not journal_path.exists()
+    compacted = pd.read_csv(base_path, sep=';')
+    assert compacted[['currency', 'date']].equals(compacted[['currency', 'date']].sort_values(['currency', 'date']))
+    assert len(compacted) == len(merged) + 1
+    pd.testing.assert_frame_equal(get_finance._cache_frame(), get_finance._parse_cache_file(base_path))
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.27
+
+    monkeypatch.setattr(get_finance, 'FX_JOURNAL_COMPACT_BYTES', 1 << 20)
+    get_finance._append_cache_rows('GBP', pd.Series([1.28], index=[pd.Timestamp('2024-05-07')]), 'cbr')
+    assert journal_path.exists()
+    get_finance.compact_fx_cache()
+    assert not journal_path.exists()
+    assert get_finance._parse_cache_file(base_path).query("currency == 'GBP'")['usd_rate'].iloc[-1] == 1.28
+
+
+def test_torn_journal_line_is_ignored_and_repaired(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    journal_path = tmp_path / 'rates' / 'fx_rates.journal.csv'
+    get_finance._append_cache_rows('GBP', pd.Series([1.25], index=[pd.Timestamp('2024-05-02')]), 'cbr')
+    with open(journal_path, 'ab') as journal:
+        journal.write(b'2024-05-03;GBP;9')
+
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.25
+
+    get_finance._append_cache_rows('GBP', pd.Series([1.26], index=[pd.Timestamp('2024-05-06')]), 'cbr')
+
+    lines = journal_path.read_text().splitlines()
+    assert len(lines) == 3 and all(line.count(';') == 4 for line in lines)
+    assert get_finance._cache_frame().query("currency == 'GBP'")['usd_rate'].tolist() == [1.25, 1.26]
+
+
+def test_cache_read_racing_a_journal_append_is_not_kept(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    read_journal = get_finance._read_journal
+    writer = threading.Thread(target=get_finance._append_cache_rows,
+                              args=('GBP', pd.Series([1.25], index=[pd.Timestamp('2024-05-02')]), 'cbr'))
+
+    def read_journal_while_appending(journal_path):
+        # The writer blocks on the exclusive lock until this read has stored its frame.
+        writer.start()
+        time.sleep(0.1)
+        return read_journal(journal_path)
+
+    monkeypatch.setattr(get_finance, '_read_journal', read_journal_while_appending)
+    stale = get_finance._cache_frame()
+    writer.join(10)
+    monkeypatch.setattr(get_finance, '_read_journal', read_journal)
+
+    assert 'GBP' not in set(stale['currency'])
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.25
+
+
+def test_rates_appended_by_another_worker_are_picked_up(tmp_path, monkeypatch):
+    _write_fx_cache(tmp_path)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    get_finance._append_cache_rows('GBP', pd.Series([1.25], index=[pd.Timestamp('2024-05-02')]), 'cbr')
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.25
+
+    # Another worker appends to the same journal; this process keeps its parsed cache.
+    with open(tmp_path / 'rates' / 'fx_rates.journal.csv', 'ab') as journal:
+        journal.write(b'2024-05-03;GBP;1.3;cbr;2024-05-03T00:00:00\n')
+
+    assert get_finance._latest_cached_usd_rate('GBP') == 1.3
+    assert get_finance._cache_frame().query("currency == 'GBP'")['usd_rate'].tolist() == [1.25, 1.3]
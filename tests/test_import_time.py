@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src import config
+
+# Loaded only by the code paths that use them: market data and FX refreshes, MOEX
+# quotes, statement imports and page exports.
+LAZY_MODULES = {"yfinance", "bs4", "lxml", "playwright", "pdfplumber"}
+# Third-party libraries both entry points need; timed in the same run as the entry
+# points, so the budgets scale with the speed of the machine.
+BASELINE = "import pandas, plotly.graph_objects"
+# Entry point import time as a multiple of BASELINE: about 2.3 and 1.2 today.
+BUDGET_RATIO = {
+    "from src.dashboard.app import create_app": 4.0,
+    "from src.reports.main_report import create_main_report": 2.5,
+}
+
+
+def _import_times(statement: str) -> tuple[dict[str, int], float]:
+    """
+    Cumulative import time in microseconds of every module loaded by `statement`,
+    and the total of the top-level imports in milliseconds.
+    """
+    env = {**os.environ, "FINREP_DASH_PASSWORD": "test-password", "FINREP_DASH_SECRET_KEY": "test-session-secret"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=config.PROJECT_PATH,
+                            env=env, capture_output=True, text=True, check=True)
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("| imported package"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total / 1000
+
+
+@pytest.mark.parametrize("statement", sorted(BUDGET_RATIO))
+def test_entry_points_import_within_budget_and_without_lazy_modules(statement):
+    modules, total_ms = _import_times(statement)
+    _, baseline_ms = _import_times(BASELINE)
+
+    assert not {name.split(".")[0] for name in modules} & LAZY_MODULES
+    assert total_ms < baseline_ms * BUDGET_RATIO[statement], f"{statement}: {total_ms:.0f} ms, {BASELINE}: {baseline_ms:.0f} ms"
+
+
+def test_report_entry_point_does_not_load_the_dashboard():
+    modules, _ = _import_times("from src.reports.main_report import create_main_report")
+
+    assert "dash" not in modules
+    assert "src.data.get_finance" in modules
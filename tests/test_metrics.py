@@ -0,0 +1,77 @@
+import os
+
+os.environ.setdefault("FINREP_DASH_PASSWORD", "test-password")
+os.environ.setdefault("FINREP_DASH_SECRET_KEY", "test-session-secret")
+
+from src import config, metrics
+from src.dashboard.app import create_app
+from src.data import get_finance, replay
+from src.data.cache import versioned_cache
+
+
+@versioned_cache()
+def _cached_total(data_root: str, value: int) -> int:
+    return value * 2
+
+
+def test_metrics_endpoint_exports_cache_callback_and_process_metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv("FINREP_METRICS_TOKEN", "scrape-token")
+    _cached_total(str(tmp_path), 1)
+    _cached_total(str(tmp_path), 1)
+    _cached_total(str(tmp_path), 2)
+
+    @metrics.observe_tab_callback
+    def render(currency: str, active_tab: str):
+        return currency
+
+    render("RUB", "month")
+    render("RUB", active_tab=None)
+
+    response = create_app().server.test_client().get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    function = f'function="{_cached_total.__module__}._cached_total"'
+    assert f"finrep_cache_hits_total{{{function}}} 1" in text
+    assert f"finrep_cache_misses_total{{{function}}} 2" in text
+    assert f"finrep_cache_entries{{{function}}} 2" in text
+    assert 'finrep_callback_duration_seconds_count{callback="render",tab="month"} 1' in text
+    assert 'finrep_callback_duration_seconds_bucket{callback="render",tab="main",le="+Inf"} 1' in text
+    assert "process_resident_memory_bytes " in text
+
+
+def test_metrics_and_prewarm_status_require_a_session_or_the_metrics_token(monkeypatch):
+    monkeypatch.setenv("FINREP_METRICS_TOKEN", "scrape-token")
+    client = create_app().server.test_client()
+
+    assert client.get("/healthz").status_code == 200
+    for path in ("/metrics", "/healthz/prewarm"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer wrong-token"}).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer scrape-token"}).status_code == 200
+
+    client.post("/login", data={"data_mode": "test"})
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/healthz/prewarm").status_code == 200
+
+
+def test_provider_requests_and_errors_are_counted(tmp_path, monkeypatch):
+    (tmp_path / "rates").mkdir()
+    monkeypatch.setattr(config, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(config, "FX_PROVIDER_ORDER", ["replay-cbr"])
+    previous_mode = get_finance.set_fx_network_enabled(True)
+    previous_settings = replay.configure(path=config.PROJECT_PATH / "tests" / "fixtures" / "replay", failure_rate=1.0)
+    labels = {"kind": "fx", "provider": "replay-cbr"}
+    requests_before = metrics.PROVIDER_REQUESTS.value(**labels)
+    errors_before = metrics.PROVIDER_ERRORS.value(**labels)
+    latency_before = metrics.PROVIDER_SECONDS.count(**labels)
+    try:
+        get_finance.get_usd_rates(["KZT"], "2024-05-06", "2024-05-10")
+    finally:
+        replay.configure(**vars(previous_settings))
+        get_finance.set_fx_network_enabled(previous_mode)
+
+    assert metrics.PROVIDER_REQUESTS.value(**labels) == requests_before + 1
+    assert metrics.PROVIDER_ERRORS.value(**labels) == errors_before + 1
+    assert metrics.PROVIDER_SECONDS.count(**labels) == latency_before + 1
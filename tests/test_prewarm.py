@@ -0,0 +1,67 @@
+import time
+
+from src import config
+from src.dashboard import prewarm
+from src.dashboard.app import create_app, start_dashboard_prewarm
+from src.data import cache
+
+
+def _wait_until_ready(timeout: float = 120.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = prewarm.prewarm_status()
+        if status["state"] == "ready":
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f"prewarm did not finish: {prewarm.prewarm_status()}")
+
+
+def test_prewarm_builds_default_datasets_and_reports_progress(monkeypatch):
+    monkeypatch.setattr(prewarm, "_EXECUTOR", None)
+    monkeypatch.setattr(prewarm, "_JOBS", {})
+    monkeypatch.setattr(config, "SHARED_CACHE_ENABLED", False)
+    cache.clear()
+    app = create_app()
+    client = app.server.test_client()
+    client.post("/login", data={"data_mode": "test"})
+    assert client.get("/healthz/prewarm").get_json()["state"] == "idle"
+
+    with config.data_mode("test"):
+        from src.dashboard.app import _default_dashboard_period
+
+        year, month = _default_dashboard_period()
+    start_dashboard_prewarm(app)
+    status = _wait_until_ready()
+
+    assert (status["done"], status["failed"]) == (4, 0)
+    assert {job["tab"] for job in status["jobs"]} == set(prewarm.WARM_TABS)
+    assert client.get("/healthz/prewarm").get_json()["state"] == "ready"
+
+    misses = cache.cache_stats()["misses"]
+    with config.data_mode("test"):
+        for tab in prewarm.WARM_TABS:
+            datasets = prewarm.dashboard_datasets(tab, "RUB", year, month, "dark")
+            assert datasets
+    assert cache.cache_stats()["misses"] == misses
+    cache.clear()
+
+
+def test_schedule_deduplicates_selections_and_keeps_a_bounded_job_history(monkeypatch):
+    built = []
+    monkeypatch.setattr(prewarm, "_EXECUTOR", None)
+    monkeypatch.setattr(prewarm, "_JOBS", {})
+    monkeypatch.setattr(prewarm, "MAX_FINISHED_JOBS", 6)
+    monkeypatch.setattr(prewarm, "dashboard_datasets", lambda tab, *selection: built.append((tab, *selection)))
+
+    prewarm.start_prewarm([])
+    prewarm.schedule_prewarm("test", [("rub", "2026", "05"), ("RUB", "2026", "05")])
+    _wait_until_ready()
+    assert len(built) == len(prewarm.WARM_TABS)
+
+    prewarm.schedule_prewarm("test", [("RUB", "2026", "04"), ("USD", "2026", "05")])
+    status = _wait_until_ready()
+
+    assert len(built) == 3 * len(prewarm.WARM_TABS)
+    assert status["total"] == status["done"] == 6
+    assert {(job["currency"], job["month"]) for job in status["jobs"]} <= {("RUB", "04"), ("USD", "05")}
+    prewarm._EXECUTOR.shutdown(wait=True)
@@ -0,0 +1,70 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src import config
+from src.data import crypto, get_finance, replay
+
+ADDRESSES = [f"0x{index:040x}" for index in range(1, 4)]
+
+
+@pytest.fixture
+def replay_root(tmp_path, monkeypatch):
+    (tmp_path / 'rates').mkdir()
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path))
+    monkeypatch.setattr(config, 'FX_PROVIDER_ORDER', ['replay-yfinance', 'replay-cbr'])
+    previous_mode = get_finance.set_fx_network_enabled(True)
+    previous_settings = replay.configure(path=config.PROJECT_PATH / 'tests' / 'fixtures' / 'replay')
+    yield tmp_path
+    replay.configure(**vars(previous_settings))
+    get_finance.set_fx_network_enabled(previous_mode)
+
+
+def test_fx_gaps_are_filled_from_recorded_responses(replay_root):
+    replay.configure(latency=0.1)
+
+    started = time.perf_counter()
+    rates = get_finance.get_usd_rates(['EUR', 'KZT', 'RUB'], '2024-05-06', '2024-05-10')
+    elapsed = time.perf_counter() - started
+
+    assert rates.loc['2024-05-06', 'EUR'] == 1.0725
+    assert rates.loc['2024-05-06', 'KZT'] == pytest.approx(0.2069 / 92.4)
+    assert rates.loc['2024-05-10', 'RUB'] == pytest.approx(1 / 92.7)
+    sources = get_finance._cache_frame().groupby('currency')['source'].agg(set).to_dict()
+    assert sources == {'EUR': {'replay-yfinance'}, 'KZT': {'replay-cbr'}, 'RUB': {'replay-cbr'}}
+    # yfinance: EURUSD=X, then KZT and RUB each through all three tickers; CBR, asked only
+    # for the gaps yfinance left empty: USD/RUB for KZT and RUB plus the KZT series.
+    assert replay.stats() == {'requests': 7 + 3, 'failures': 0}
+    # yfinance downloads share one lock; the CBR stage then fetches its two gaps in parallel.
+    assert elapsed < 0.1 * (7 + 2) + 0.5
+
+
+def test_injected_failures_leave_the_gaps_unfilled(replay_root):
+    replay.configure(failure_rate=1.0)
+
+    rates = get_finance.get_usd_rates(['EUR', 'KZT'], '2024-05-06', '2024-05-10')
+
+    assert rates[['EUR', 'KZT']].isna().all().all()
+    assert replay.stats()['failures'] == replay.stats()['requests'] > 0
+    assert get_finance._cache_frame().empty
+
+
+def test_evm_balances_are_replayed_through_replay_urls(replay_root, monkeypatch):
+    monkeypatch.setattr(crypto, 'EVM_RPC_URLS', {'ethereum': ['replay://ethereum']})
+    wallets = pd.DataFrame(
+        [
+            {'account': f'Wallet {index}', 'chain': 'ethereum', 'asset': asset, 'address': address,
+             'token_contract': '', 'enabled': '1', 'label': ''}
+            for index, (asset, address) in enumerate(
+                [('ETH', ADDRESSES[0]), ('USDT', ADDRESSES[0]), ('ETH', ADDRESSES[1]), ('ETH', ADDRESSES[2])], start=1)
+        ],
+        columns=crypto.WALLET_COLUMNS,
+    )
+    wallets.to_csv(replay_root / 'wallets.csv', sep=';', index=False, encoding='utf-8-sig')
+
+    balances = crypto.refresh_crypto_balances(replay_root / 'wallets.csv', replay_root / 'balances.csv', timeout=5)
+
+    assert balances['balance'].astype(float).tolist() == [1.5, 250.0, 2.0]
+    assert 'header not found' in balances.attrs['errors'][0]
+    assert replay.stats() == {'requests': 1, 'failures': 0}
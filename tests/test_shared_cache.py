@@ -0,0 +1,114 @@
+import multiprocessing
+import threading
+import time
+
+import pandas as pd
+
+from src import config
+from src.data import cache, shared_cache
+
+
+@cache.versioned_cache("transactions_info")
+def _slow_table(root, builds_path):
+    with open(builds_path, "a", encoding="utf-8") as builds:
+        builds.write("build\n")
+    time.sleep(0.3)
+    return pd.DataFrame({"value": [1.0, 2.0, 3.0]})
+
+
+@cache.versioned_cache("transactions_info")
+def _inner_table(root):
+    return pd.DataFrame({"value": [1.0, 2.0]})
+
+
+@cache.versioned_cache("transactions_info")
+def _outer_table(root):
+    return _inner_table(root) * 2
+
+
+def _worker(root, builds_path, results):
+    results.put(float(_slow_table(root, builds_path)["value"].sum()))
+
+
+def _enable_shared_cache(tmp_path, monkeypatch):
+    (tmp_path / "transactions_info").mkdir()
+    (tmp_path / "transactions_info" / "2025_01_.csv").write_text("a", encoding="utf-8")
+    monkeypatch.setattr(cache, "VERSION_TTL_SECONDS", 0)
+    monkeypatch.setattr(config, "SHARED_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+    monkeypatch.setenv("FINREP_SHARED_CACHE", "1")
+    monkeypatch.setenv("FINREP_DATA_DIR", str(tmp_path))
+    cache.clear()
+
+
+def _builds(path):
+    return path.read_text(encoding="utf-8").count("build") if path.exists() else 0
+
+
+def test_fresh_worker_reads_tables_built_by_another_worker(tmp_path, monkeypatch):
+    _enable_shared_cache(tmp_path, monkeypatch)
+    builds_path = tmp_path / "builds.txt"
+    root = str(tmp_path)
+
+    built = _slow_table(root, str(builds_path))
+    cache._ENTRIES.clear()
+    pd.testing.assert_frame_equal(_slow_table(root, str(builds_path)), built)
+    assert _builds(builds_path) == 1
+    assert cache.cache_stats()["shared_hits"] >= 1
+
+    (tmp_path / "transactions_info" / "2025_02_.csv").write_text("b", encoding="utf-8")
+    cache._ENTRIES.clear()
+    _slow_table(root, str(builds_path))
+    assert _builds(builds_path) == 2
+
+    cache.clear(_slow_table.__wrapped__)
+    _slow_table(root, str(builds_path))
+    assert _builds(builds_path) == 3
+    cache.clear()
+
+
+def test_concurrent_workers_build_a_table_once(tmp_path, monkeypatch):
+    _enable_shared_cache(tmp_path, monkeypatch)
+    builds_path = tmp_path / "builds.txt"
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=_worker, args=(str(tmp_path), str(builds_path), results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert [results.get(timeout=5) for _ in workers] == [6.0, 6.0, 6.0]
+    assert _builds(builds_path) == 1
+    assert shared_cache.database_path().exists()
+    cache.clear()
+
+
+def test_lock_files_are_striped_next_to_the_database_of_the_data_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SHARED_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "DATA_PATH", str(tmp_path))
+
+    for index in range(100):
+        assert shared_cache.load_or_build("tests.table", ("table", index), ("v1",), lambda: index) == (index, False)
+
+    assert shared_cache.database_path() == tmp_path / ".cache" / "tables.sqlite"
+    lock_files = list((tmp_path / ".cache").glob("tables.sqlite.*.lock"))
+    assert 0 < len(lock_files) <= shared_cache.LOCK_STRIPES
+    assert not (tmp_path / ".cache" / "locks").exists()
+
+
+def test_nested_build_on_the_same_lock_stripe_does_not_deadlock(tmp_path, monkeypatch):
+    _enable_shared_cache(tmp_path, monkeypatch)
+    monkeypatch.setattr(shared_cache, "LOCK_STRIPES", 1)
+    results = []
+    builder = threading.Thread(target=lambda: results.append(_outer_table(str(tmp_path))), daemon=True)
+
+    builder.start()
+    builder.join(10)
+
+    assert not builder.is_alive()
+    assert results[0]["value"].tolist() == [2.0, 4.0]
+    cache._ENTRIES.clear()
+    pd.testing.assert_frame_equal(_inner_table(str(tmp_path)), pd.DataFrame({"value": [1.0, 2.0]}))
+    assert cache.cache_stats()["shared_hits"] >= 1
+    cache.clear()
@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src import config
+from src.data import get, snapshot
+from tests.test_transactions_loader import _write_synthetic_history
+
+
+def _enable_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SNAPSHOT_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+
+
+def test_transactions_snapshot_is_reused_until_a_source_file_changes(tmp_path, monkeypatch):
+    _enable_snapshots(tmp_path, monkeypatch)
+    _write_synthetic_history(tmp_path / "ledger", years=2)
+    transactions_root = str(tmp_path / "ledger" / "transactions_info")
+    read_paths = []
+    read_month = get._read_transactions_month
+
+    def counting_read(path):
+        read_paths.append(path)
+        return read_month(path)
+
+    monkeypatch.setattr(get, "_read_transactions_month", counting_read)
+    get.clear_data_cache()
+    get._TRANSACTION_FILES_CACHE.clear()
+    built = get._get_transactions_cached(transactions_root)
+    assert len(read_paths) == 24
+    assert any(path.name.endswith(".manifest.json") for path in (tmp_path / ".cache").iterdir())
+
+    # Fresh worker: no in-process caches, the snapshot is loaded instead of the CSVs.
+    read_paths.clear()
+    get.clear_data_cache()
+    get._TRANSACTION_FILES_CACHE.clear()
+    pd.testing.assert_frame_equal(get._get_transactions_cached(transactions_root), built)
+    assert read_paths == []
+
+    # A touched but unchanged file keeps the snapshot current.
+    touched = tmp_path / "ledger" / "transactions_info" / "2016" / "2016_05_.csv"
+    os.utime(touched, ns=(touched.stat().st_atime_ns, touched.stat().st_mtime_ns + 10 ** 9))
+    get.clear_data_cache()
+    get._TRANSACTION_FILES_CACHE.clear()
+    get._get_transactions_cached(transactions_root)
+    assert read_paths == []
+
+    edited = tmp_path / "ledger" / "transactions_info" / "2017" / "2017_03_.csv"
+    month_df = pd.read_csv(edited, sep=";", dtype=str)
+    month_df.loc[0, "Доход"] = "777|USD|Bonus"
+    month_df.to_csv(edited, sep=";", index=False)
+    get.clear_data_cache()
+    get._TRANSACTION_FILES_CACHE.clear()
+    rebuilt = get._get_transactions_cached(transactions_root)
+
+    assert len(read_paths) == 24
+    assert ((rebuilt["Значение"] == 777) & (rebuilt["Валюта"] == "USD")).sum() == 1
+    get.clear_data_cache()
+
+
+def test_snapshot_round_trips_sample_assets_and_fx_rates(tmp_path, monkeypatch):
+    _enable_snapshots(tmp_path, monkeypatch)
+    assets_root = os.path.join(config.SAMPLE_DATA_PATH, "assets_info")
+    fx_path = os.path.join(config.SAMPLE_DATA_PATH, "rates", "fx_rates.csv")
+
+    get.clear_data_cache()
+    expected_assets = get._get_assets_cached(assets_root)
+    get.clear_data_cache()
+    pd.testing.assert_frame_equal(get._get_assets_cached(assets_root), expected_assets)
+    get.clear_data_cache()
+
+    from src.data import get_finance
+
+    expected_rates = snapshot.cached_frame("fx_rates", fx_path, [fx_path],
+                                           lambda: get_finance._parse_cache_file(fx_path))
+    cached_rates = snapshot.cached_frame("fx_rates", fx_path, [fx_path],
+                                         lambda: pd.DataFrame())
+    pd.testing.assert_frame_equal(cached_rates, expected_rates)
+
+
+def test_snapshots_are_disabled_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / ".cache"))
+    monkeypatch.setattr(config, "SNAPSHOT_CACHE_ENABLED", False)
+
+    frame = snapshot.cached_frame("assets", "root", [], lambda: pd.DataFrame({"a": [1]}))
+
+    assert frame["a"].tolist() == [1]
+    assert not (tmp_path / ".cache").exists()
+
+
+def test_concurrent_snapshot_writes_leave_one_complete_snapshot(tmp_path, monkeypatch, caplog):
+    _enable_snapshots(tmp_path, monkeypatch)
+    source = tmp_path / "source.csv"
+    source.write_text("a\n1\n", encoding="utf-8")
+    frame = pd.DataFrame({"a": range(50_000)})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        built = list(executor.map(lambda _: snapshot.cached_frame("assets", "root", [str(source)], lambda: frame),
+                                  range(8)))
+
+    assert not [record for record in caplog.records if "Could not" in record.getMessage()]
+    for result in built:
+        pd.testing.assert_frame_equal(result, frame)
+    snapshot_path, manifest_path = snapshot._snapshot_paths("assets", "root")
+    assert sorted(path.name for path in (tmp_path / ".cache").iterdir()) == sorted(
+        [snapshot_path.name, manifest_path.name, f"{snapshot_path.name}.lock"])
+    pd.testing.assert_frame_equal(snapshot.cached_frame("assets", "root", [str(source)], lambda: pd.DataFrame()), frame)
+
+
+def test_snapshot_is_not_written_when_a_source_changes_during_the_build(tmp_path, monkeypatch):
+    _enable_snapshots(tmp_path, monkeypatch)
+    source = tmp_path / "source.csv"
+    source.write_text("a\n1\n", encoding="utf-8")
+
+    def build_while_source_changes():
+        frame = pd.read_csv(source)
+        source.write_text("a\n1\n2\n", encoding="utf-8")
+        return frame
+
+    assert snapshot.cached_frame("assets", "root", [str(source)], build_while_source_changes)["a"].tolist() == [1]
+    snapshot_path, manifest_path = snapshot._snapshot_paths("assets", "root")
+    assert not snapshot_path.exists() and not manifest_path.exists()
+
+    rebuilt = snapshot.cached_frame("assets", "root", [str(source)], lambda: pd.read_csv(source))
+    assert rebuilt["a"].tolist() == [1, 2]
+    assert snapshot.cached_frame("assets", "root", [str(source)], lambda: pd.DataFrame())["a"].tolist() == [1, 2]
@@ -0,0 +1,38 @@
+from benchmarks.run import run_benchmarks
+from benchmarks.synthetic_ledger import generate_ledger
+from src import config
+from src.data import cache
+from src.data.get import get_transactions
+from src.data.validation import validate_all_data
+
+
+def test_synthetic_ledger_is_deterministic_and_valid(tmp_path, monkeypatch):
+    summary = generate_ledger(tmp_path / 'first', 'tiny', seed=7)
+    generate_ledger(tmp_path / 'second', 'tiny', seed=7)
+    monkeypatch.setattr(config, 'DATA_PATH', str(tmp_path / 'first'))
+    monkeypatch.setattr(config, 'SHARED_CACHE_ENABLED', False)
+
+    for relative_path in ['transactions_info/2026/2026_05.csv', 'rates/fx_rates.csv', 'investments/transactions.csv']:
+        assert (tmp_path / 'first' / relative_path).read_bytes() == (tmp_path / 'second' / relative_path).read_bytes()
+    assert summary['months'] == 24
+    assert validate_all_data(False) == []
+    transactions = get_transactions()
+    assert (transactions['Значение'] != 0).sum() == summary['operations']
+    assert set(transactions['Валюта']) == set(config.UNIQUE_TICKERS)
+    cache.clear()
+
+
+def test_benchmarks_time_each_stage_cold_and_warm(tmp_path):
+    generate_ledger(tmp_path, 'tiny')
+    settings = {name: getattr(config, name)
+                for name in ['DATA_PATH', 'CACHE_PATH', 'SHARED_CACHE_ENABLED', 'SNAPSHOT_CACHE_ENABLED']}
+
+    results = run_benchmarks(tmp_path, repeat=1, stages=['get_transactions', 'tab:month'])
+
+    assert {name: getattr(config, name) for name in settings} == settings
+
+    assert list(results) == ['get_transactions', 'tab:month']
+    for timings in results.values():
+        assert timings['cold']['runs'] == timings['warm']['runs'] == 1
+        assert timings['warm']['median'] < timings['cold']['median']
+    cache.clear()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from src import config
+from src.dashboard.main_data import DashboardDataset, FrozenFigure, freeze_datasets
+from src.data import cache
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "VERSION_TTL_SECONDS", 0)
+    monkeypatch.setattr(config, "SHARED_CACHE_ENABLED", False)
+    _write(tmp_path / "transactions_info" / "2025" / "2025_01_.csv", "a")
+    _write(tmp_path / "assets_info" / "2025" / "2025_01.csv", "b")
+    cache.clear()
+    yield str(tmp_path)
+    cache.clear()
+
+
+def test_entries_are_recomputed_only_when_their_sources_change(data_root, tmp_path):
+    calls = []
+
+    @cache.versioned_cache("transactions_info")
+    def transactions_table(root, currency):
+        calls.append(("transactions", currency))
+        return pd.DataFrame({"value": [1.0, 2.0]})
+
+    @cache.versioned_cache("assets_info")
+    def assets_table(root, currency):
+        calls.append(("assets", currency))
+        return pd.DataFrame({"value": [3.0]})
+
+    for _ in range(2):
+        transactions_table(data_root, "RUB")
+        transactions_table(data_root, "USD")
+        assets_table(data_root, "RUB")
+    assert len(calls) == 3
+
+    _write(tmp_path / "assets_info" / "2025" / "2025_02.csv", "c")
+    calls.clear()
+    transactions_table(data_root, "RUB")
+    transactions_table(data_root, "USD")
+    assets_table(data_root, "RUB")
+
+    assert calls == [("assets", "RUB")]
+
+
+def test_hits_are_read_only_views_without_copies(data_root):
+    @cache.versioned_cache("transactions_info")
+    def table(root):
+        return pd.DataFrame({"value": np.arange(5, dtype=float), "name": list("abcde")})
+
+    first = table(data_root)
+    second = table(data_root)
+
+    assert np.shares_memory(first["value"].to_numpy(), second["value"].to_numpy())
+    with pytest.raises(ValueError):
+        second.loc[0, "value"] = 100.0
+    second.index.name = "renamed"
+    second["extra"] = 1
+    assert table(data_root).index.name is None
+    assert list(table(data_root).columns) == ["value", "name"]
+
+
+def test_cached_object_columns_dataclasses_and_containers_are_not_shared(data_root):
+    @cache.versioned_cache("transactions_info")
+    def datasets(root):
+        frame = pd.DataFrame({"value": [1.0, 2.0], "name": ["a", "b"]})
+        dataset = DashboardDataset("balance", "Balance", frame, figure=go.Figure(go.Bar(y=[1, 2])))
+        return freeze_datasets({"balance": dataset}), [frame["name"]], {"RUB": {"USD"}}
+
+    first, names, unconverted = datasets(data_root)
+    first["balance"].dataframe.loc[0, "name"] = "changed"
+    names[0].iloc[1] = "changed"
+    names.append("extra")
+    unconverted["RUB"].add("EUR")
+    second, names, unconverted = datasets(data_root)
+
+    assert second["balance"] is not first["balance"]
+    assert second["balance"].dataframe["name"].tolist() == ["a", "b"]
+    assert np.shares_memory(first["balance"].dataframe["value"].to_numpy(), second["balance"].dataframe["value"].to_numpy())
+    assert [series.tolist() for series in names] == [["a", "b"]]
+    assert unconverted == {"RUB": {"USD"}}
+    assert isinstance(second["balance"].figure, FrozenFigure)
+    first["balance"].figure.to_plotly_json()["data"][0]["y"] = [9]
+    assert second["balance"].figure.to_figure().data[0].y == (1, 2)
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget(data_root, monkeypatch):
+    frame_bytes = int(pd.DataFrame({"value": np.zeros(1000)}).memory_usage(index=True, deep=True).sum())
+    monkeypatch.setattr(config, "TABLE_CACHE_MAX_BYTES", frame_bytes * 3)
+    calls = []
+
+    @cache.versioned_cache("transactions_info")
+    def table(root, year):
+        calls.append(year)
+        return pd.DataFrame({"value": np.zeros(1000)})
+
+    for year in ["2021", "2022", "2023"]:
+        table(data_root, year)
+    table(data_root, "2021")
+    table(data_root, "2024")
+    calls.clear()
+    table(data_root, "2021")
+    table(data_root, "2022")
+
+    stats = cache.cache_stats()
+    assert calls == ["2022"]
+    assert stats["bytes"] <= frame_bytes * 3
+    assert stats["evictions"] >= 1
+
+
+def test_writes_invalidate_only_downstream_tables(monkeypatch):
+    monkeypatch.setattr(config, "DATA_PATH", str(config.PROJECT_PATH / "sample_data"))
+    from src.model.create_tables import get_balance_by_month
+
+    cache.clear()
+    balance = get_balance_by_month("USD")
+
+    def misses_after(*nodes):
+        misses = cache.cache_stats()["misses"]
+        cache.invalidate(*nodes)
+        pd.testing.assert_frame_equal(get_balance_by_month("USD"), balance)
+        return cache.cache_stats()["misses"] - misses
+
+    assert cache.downstream("goals") == {"goals", "planning"}
+    assert misses_after("goals") == 0
+    # Crypto only feeds the portfolio value applied on top of the cached balance.
+    assert misses_after("crypto") == 1
+    assert misses_after("assets") == 3
+    assert misses_after("transactions") == 3
+    cache.clear()
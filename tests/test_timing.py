@@ -0,0 +1,55 @@
+import logging
+import os
+
+os.environ.setdefault("FINREP_DASH_PASSWORD", "test-password")
+os.environ.setdefault("FINREP_DASH_SECRET_KEY", "test-session-secret")
+
+from src import config, timing
+from src.dashboard.app import create_app
+
+
+@timing.timed("load")
+def _load(value):
+    with timing.span("parse"):
+        return value * 2
+
+
+def test_spans_are_no_ops_outside_a_trace():
+    assert _load(2) == 4
+    with timing.span("outside") as current:
+        assert current is None
+
+
+def test_trace_merges_repeated_spans_in_tree_and_server_timing():
+    root, token = timing.start_trace("GET /render")
+    with timing.span("datasets.main"):
+        for value in range(3):
+            _load(value)
+    timing.finish_trace(root, token)
+
+    tree = timing.format_tree(root).splitlines()
+    assert [line.split()[0] for line in tree] == ["GET", "datasets.main", "load", "parse"]
+    assert tree[2].startswith("    load ") and tree[2].endswith(" ms x3")
+    header = timing.server_timing(root)
+    names = [entry.split(";")[0] for entry in header.split(", ")]
+    assert names[0] == "total" and set(names[1:]) == {"datasets.main", "load", "parse"}
+    assert 'load;dur=' in header and 'desc="x3"' in header
+
+
+def test_enabled_timing_adds_server_timing_header_and_logs_tree(monkeypatch, caplog):
+    monkeypatch.setattr(config, "TIMING_ENABLED", True)
+    client = create_app().server.test_client()
+
+    with caplog.at_level(logging.INFO, logger="src.timing"):
+        response = client.get("/healthz")
+
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+    assert "GET /healthz" in caplog.text
+
+
+def test_disabled_timing_leaves_responses_untouched(monkeypatch):
+    monkeypatch.setattr(config, "TIMING_ENABLED", False)
+    response = create_app().server.test_client().get("/healthz")
+
+    assert "Server-Timing" not in response.headers
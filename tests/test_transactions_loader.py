@@ -0,0 +1,169 @@
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.data import get
+
+
+CATEGORIES = ["Доход", "Сбережения", "Пища", "Транспорт", "Долги (у меня)", "Крупные покупки/ Поездки", "Прочее"]
+CURRENCIES = ["RUB", "USD", "EUR", "KZT", "GBP", "usd"]
+
+
+def _legacy_transactions(transactions_root: str) -> pd.DataFrame:
+    """Row-by-row parser the vectorized loader must stay equivalent to."""
+    transactions_df = pd.DataFrame()
+    for folder_name in os.listdir(transactions_root):
+        if folder_name == '.DS_Store':
+            continue
+        for file_name in os.listdir(os.path.join(transactions_root, folder_name)):
+            if file_name == '.DS_Store' or '.backup_' in file_name:
+                continue
+            month_df = pd.read_csv(os.path.join(transactions_root, folder_name, file_name), sep=';',
+                                   decimal=',',
+                                   parse_dates=True,
+                                   dayfirst=True,
+                                   index_col='Дата',
+                                   infer_datetime_format=True)
+            month_df = month_df.rename(columns={'Долги (у меня)': 'Дебиторская задолженность',
+                                                'Крупные покупки/ Поездки': 'Поездки'},
+                                       errors='ignore')
+            month_df = month_df.reset_index().melt(id_vars='Дата', var_name='Категория')
+
+            month_df['value'] = month_df['value'].astype(str).apply(lambda x: x.split('#'))
+            month_df = month_df.explode('value')
+            month_df['value'] = (month_df['value'].astype(str)
+                                 .str.replace(',', '.')
+                                 .str.replace('\\xa0', '')
+                                 .str.replace('\xa0', '')
+                                 .str.replace(' ₽', '')
+                                 .apply(lambda x: x.split('|') if len(x.split('|')) == 3 else [x, 'RUB', np.nan])
+                                 .apply(lambda x: {'Значение': float(x[0]),
+                                                   'Валюта': x[1].upper(),
+                                                   'Комментарий': x[2]})
+                                 )
+
+            month_df['Валюта'] = month_df['value'].apply(lambda x: x['Валюта'])
+            month_df['Значение'] = month_df['value'].apply(lambda x: x['Значение'])
+            month_df['Комментарий'] = month_df['value'].apply(lambda x: x['Комментарий'])
+            month_df.drop('value', axis=1, inplace=True)
+
+            month_df['Год'] = month_df['Дата'].apply(lambda x: x.year).astype(str)
+            month_df['Квартал'] = month_df['Дата'].apply(lambda x: x.quarter).astype(str)
+            month_df['Месяц'] = month_df['Дата'].apply(lambda x: x.month).astype(str)
+            transactions_df = pd.concat([transactions_df, month_df], axis=0)
+    return transactions_df.reset_index().drop('index', axis=1)
+
+
+def _random_cell(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.55:
+        return "0"
+    if kind < 0.65:
+        return f"{rng.randint(1, 90000)},{rng.randint(0, 99):02d}"
+    if kind < 0.7:
+        return f"{rng.randint(1, 9)}\xa0{rng.randint(100, 999)} ₽"
+    items = []
+    for _ in range(rng.randint(1, 3)):
+        amount = f"{rng.randint(1, 50000)}.{rng.randint(0, 9)}"
+        comment = rng.choice(["", "Groceries", "Taxi, night", "Cafe 500 ₽", "Salary"])
+        items.append(f"{amount}|{rng.choice(CURRENCIES)}|{comment}")
+    return "#".join(items)
+
+
+def _write_synthetic_history(root, years: int = 10, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    for year in range(2016, 2016 + years):
+        folder = root / "transactions_info" / str(year)
+        folder.mkdir(parents=True)
+        for month in range(1, 13):
+            days = pd.date_range(f"{year}-{month:02d}-01", periods=rng.randint(3, 8), freq="3D")
+            rows = [
+                {"Дата": day.strftime("%d.%m.%Y"), **{category: _random_cell(rng) for category in CATEGORIES}}
+                for day in days
+            ]
+            pd.DataFrame(rows).to_csv(folder / f"{year}_{month:02d}_.csv", sep=";", index=False)
+
+
+def test_vectorized_parser_matches_legacy_parser_on_sample_data():
+    transactions_root = str(config.PROJECT_PATH / "sample_data" / "transactions_info")
+    get._get_transactions_cached.cache_clear()
+
+    actual = get._get_transactions_cached(transactions_root)
+    expected = _legacy_transactions(transactions_root)
+
+    assert list(actual.columns) == config.TRANSACTIONS_COLUMNS + ["Год", "Квартал", "Месяц"]
+    pd.testing.assert_frame_equal(actual, expected)
+    get._get_transactions_cached.cache_clear()
+
+
+def test_vectorized_parser_matches_legacy_parser_on_ten_year_history(tmp_path):
+    _write_synthetic_history(tmp_path)
+    transactions_root = str(tmp_path / "transactions_info")
+    get._get_transactions_cached.cache_clear()
+
+    actual = get._get_transactions_cached(transactions_root)
+    expected = _legacy_transactions(transactions_root)
+
+    assert len(actual) > 10 * 12 * 3 * len(CATEGORIES)
+    assert set(actual["Год"]) == {str(year) for year in range(2016, 2026)}
+    pd.testing.assert_frame_equal(actual, expected)
+    get._get_transactions_cached.cache_clear()
+
+
+def test_refresh_reparses_only_changed_month_files(tmp_path, monkeypatch):
+    _write_synthetic_history(tmp_path, years=2)
+    transactions_root = str(tmp_path / "transactions_info")
+    read_paths = []
+    read_month = get._read_transactions_month
+
+    def counting_read(path):
+        read_paths.append(path)
+        return read_month(path)
+
+    monkeypatch.setattr(get, "_read_transactions_month", counting_read)
+    get.clear_data_cache()
+    get._get_transactions_cached(transactions_root)
+    assert len(read_paths) == 24
+
+    edited = tmp_path / "transactions_info" / "2017" / "2017_03_.csv"
+    month_df = pd.read_csv(edited, sep=";", dtype=str)
+    month_df.loc[0, "Доход"] = "777|USD|Bonus"
+    month_df.to_csv(edited, sep=";", index=False)
+    (tmp_path / "transactions_info" / "2016" / "2016_01_.csv").unlink()
+    read_paths.clear()
+    get.clear_data_cache()
+    refreshed = get._get_transactions_cached(transactions_root)
+
+    assert read_paths == [str(edited)]
+    assert ((refreshed["Значение"] == 777) & (refreshed["Валюта"] == "USD")).sum() == 1
+    assert not refreshed["Дата"].between("2016-01-01", "2016-01-31").any()
+    pd.testing.assert_frame_equal(refreshed, _legacy_transactions(transactions_root))
+    get.clear_data_cache()
+
+
+def test_concurrent_parses_read_each_month_file_once(tmp_path, monkeypatch):
+    _write_synthetic_history(tmp_path, years=1)
+    transactions_root = str(tmp_path / "transactions_info")
+    month_paths = get._transaction_month_paths(transactions_root)
+    read_paths = []
+    read_month = get._read_transactions_month
+
+    def slow_read(path):
+        read_paths.append(path)
+        time.sleep(0.01)
+        return read_month(path)
+
+    monkeypatch.setattr(get, "_read_transactions_month", slow_read)
+    get._TRANSACTION_FILES_CACHE.clear()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        frames = list(pool.map(lambda _: get._parse_transactions(transactions_root, month_paths), range(4)))
+
+    assert sorted(read_paths) == sorted(month_paths)
+    for frame in frames[1:]:
+        pd.testing.assert_frame_equal(frame, frames[0])
+    get._TRANSACTION_FILES_CACHE.clear()